@@ -57,6 +57,10 @@
 # as integers directly (for int types).  Strings and BCD arrays
 # behave as expected.
 
+import bisect
+import hashlib
+import itertools
+import json
 import struct
 import os
 import logging
@@ -66,7 +70,9 @@ import warnings
 import six
 from builtins import bytes
 
+from chirp import CHIRP_VERSION
 from chirp import bitwise_grammar
+from chirp import pyPEG
 from chirp.memmap import MemoryMap
 
 LOG = logging.getLogger(__name__)
@@ -191,6 +197,12 @@ def set_string(char_array, string):
     array_copy(char_array, list(string))
 
 
+# Value of each packed BCD byte (using the same arithmetic as
+# bcdDataElement for invalid digits), and the byte for each two-digit value
+_BCD_DECODE = [((b >> 4) * 10) + (b & 0x0F) for b in range(256)]
+_BCD_ENCODE = bytes(((v // 10) << 4) | (v % 10) for v in range(100))
+
+
 class DataElement:
     _size = 1
 
@@ -213,6 +225,13 @@ class DataElement:
     def get_offset(self):
         return int(self._offset)
 
+    def _clone(self, delta):
+        """Return a copy of this element, @delta bytes further along"""
+        clone = object.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+        clone.__dict__['_offset'] = self._offset + delta
+        return clone
+
     def _get_value(self, data):
         raise Exception("Not implemented")
 
@@ -280,6 +299,43 @@ class DataElement:
                                          self._offset)
 
 
+class _LazyItems(object):
+    """A list-like container that creates its items on first access.
+
+    Used for arrays of structs in lazy mode, where @factory(index) builds
+    the element at @index. Materialized items are kept, so repeated access
+    returns the same object.
+    """
+    def __init__(self, count, factory):
+        self._items = [None] * count
+        self._factory = factory
+
+    def _get(self, index):
+        item = self._items[index]
+        if item is None:
+            if index < 0:
+                index += len(self._items)
+            item = self._items[index] = self._factory(index)
+        return item
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get(i)
+                    for i in range(*index.indices(len(self._items)))]
+        return self._get(index)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        for i in range(len(self._items)):
+            yield self._get(i)
+
+    def __reversed__(self):
+        for i in reversed(range(len(self._items))):
+            yield self._get(i)
+
+
 class arrayDataElement(DataElement):
     def __repr__(self):
         if isinstance(self.__items[0], bcdDataElement):
@@ -296,15 +352,46 @@ class arrayDataElement(DataElement):
     def __init__(self, offset):
         self.__items = []
         self._offset = offset
+        self._stride = None
 
     def append(self, item):
         self.__items.append(item)
 
+    def set_lazy(self, count, stride, factory):
+        """Make this array create its @count elements on demand.
+
+        Each element is @stride bytes after the previous one and is built by
+        calling @factory(index) the first time it is accessed.
+        """
+        self.__items = _LazyItems(count, factory)
+        self._stride = stride
+
+    def _clone(self, delta):
+        clone = DataElement._clone(self, delta)
+        if self._stride is not None:
+            first = self.__items[0]
+            clone.set_lazy(len(self), self._stride,
+                           lambda index: first._clone(
+                               delta + index * self._stride))
+        else:
+            clone.__items = [item._clone(delta) for item in self.__items]
+        return clone
+
     def get_value(self):
         return list(self.__items)
 
     def get_raw(self, asbytes=True):
-        raw = [item.get_raw(asbytes=True) for item in self.__items]
+        if self._stride is not None:
+            # All elements share a layout, so we can read them straight
+            # from the map without creating them
+            data = self.__items[0]._data
+            size = self.__items[0].size() // 8
+            raw = [data[offset:offset + size]
+                   for offset in range(self._offset,
+                                       self._offset + len(self) * self._stride,
+                                       self._stride)]
+        else:
+            raw = [item.get_raw(asbytes=True) for item in self.__items]
         return self._compat_bytes(bytes(b''.join(raw)), asbytes)
 
     def __setitem__(self, index, val):
@@ -319,48 +406,61 @@ class arrayDataElement(DataElement):
     def __len__(self):
         return len(self.__items)
 
+    def _get_raw_items(self):
+        # Arrays of char and bcd are contiguous single bytes, so we can
+        # read and write them all at once
+        first = self.__items[0]
+        return first._data[first._offset:first._offset + len(self.__items)]
+
+    def _set_raw_items(self, raw):
+        first = self.__items[0]
+        first._data[first._offset] = raw
+
     def __str__(self):
         if isinstance(self.__items[0], charDataElement):
-            # NOTE: All the values should be strings coming out of py3.
-            # and on py2 they could be a mix of unicode and str, the latter
-            # for non-ASCII values. On py2 we can just coerce all of these
-            # types to a string for compatibility.
-            return "".join([str(x.get_value()) for x in self.__items])
+            # Same as string_straight_decode() of each item
+            return bytes(self._get_raw_items()).decode('latin-1')
         else:
             return str(self.__items)
 
     def __int__(self):
         if isinstance(self.__items[0], bcdDataElement):
+            raw = self._get_raw_items()
+            if not isinstance(self.__items[0], bbcdDataElement):
+                raw = reversed(raw)
             val = 0
-            if isinstance(self.__items[0], bbcdDataElement):
-                items = self.__items
-            else:
-                items = reversed(self.__items)
-            for i in items:
-                tens, ones = i.get_value()
-                val = (val * 100) + (tens * 10) + ones
+            for byte in raw:
+                val = (val * 100) + _BCD_DECODE[byte]
             return val
         else:
             raise ValueError("Cannot coerce this to int")
 
     def __set_value_bbcd(self, value):
-        for i in reversed(self.__items):
-            twodigits = value % 100
-            value /= 100
-            i.set_value(twodigits)
+        raw = bytearray(len(self.__items))
+        for i in reversed(range(len(raw))):
+            value, twodigits = divmod(value, 100)
+            raw[i] = _BCD_ENCODE[twodigits]
+        self._set_raw_items(raw)
 
     def __set_value_lbcd(self, value):
-        for i in self.__items:
-            twodigits = value % 100
-            value /= 100
-            i.set_value(twodigits)
+        raw = bytearray(len(self.__items))
+        for i in range(len(raw)):
+            value, twodigits = divmod(value, 100)
+            raw[i] = _BCD_ENCODE[twodigits]
+        self._set_raw_items(raw)
 
     def __set_value_char(self, value):
         if len(value) != len(self.__items):
             raise ValueError("String expects exactly %i characters, not %i" % (
                              len(self.__items), len(value)))
-        for i in range(0, len(self.__items)):
-            self.__items[i].set_value(value[i])
+        if isinstance(value, str):
+            # Same as string_straight_encode()
+            self._set_raw_items(value.encode('latin-1'))
+        elif isinstance(value, (bytes, bytearray)):
+            self._set_raw_items(value)
+        else:
+            for i in range(0, len(self.__items)):
+                self.__items[i].set_value(value[i])
 
     def set_value(self, value):
         if isinstance(self.__items[0], bbcdDataElement):
@@ -392,7 +492,106 @@ class arrayDataElement(DataElement):
             yield (str(index), item)
             index += 1
 
+    def _record_layout(self):
+        """Return the stride and columns of a struct array"""
+        first = self.__items[0]
+        if not isinstance(first, structDataElement):
+            raise TypeError('Bulk access needs an array of structs')
+        columns = _record_columns(first, first.get_offset())
+        if self._stride is not None:
+            return self._stride, columns
+        elif len(self) == 1:
+            return first.size() // 8, columns
+
+        # Not lazy, so make sure the elements really share a layout
+        second = self.__items[1]
+        stride = second.get_offset() - first.get_offset()
+        layout = [(c.name, c.offset) for c in columns]
+        if (layout != [(c.name, c.offset) for c in
+                       _record_columns(second, second.get_offset())] or
+                self.__items[-1].get_offset() !=
+                first.get_offset() + (len(self) - 1) * stride):
+            raise ValueError('Array elements do not share a layout')
+        return stride, columns
+
+    def _record_rows(self, np, stride):
+        """Return the bytes of all our elements as a count x stride matrix"""
+        first = self.__items[0]
+        start = first.get_offset()
+        raw = first._data[start:start + stride * len(self)]
+        if len(raw) != stride * len(self):
+            raise ValueError('Array extends past the end of the data')
+        return np.frombuffer(bytes(raw), dtype=np.uint8).reshape(
+            len(self), stride)
+
+    def to_records(self):
+        """Decode every element of a struct array into a numpy record array
+
+        Each field becomes a column, with nested fields named like
+        ``sub.field`` and ``sub[1].field``. Integers and bit fields decode
+        to integers, bcd arrays to their integer value and char arrays to
+        bytes. This does not create any element objects, so it is much
+        faster for scanning large arrays. Requires numpy.
+        """
+        import numpy
+
+        stride, columns = self._record_layout()
+        rows = self._record_rows(numpy, stride)
+        records = numpy.empty(len(self),
+                              dtype=[c.field(numpy) for c in columns])
+        for column in columns:
+            records[column.name] = column.decode(numpy, rows)
+        return records
+
+    def from_records(self, records):
+        """Encode @records, as returned by to_records(), back into the array
+
+        Only the columns present in @records are written, and only values
+        that differ from what is in the memory map. Values are truncated to
+        the size of their fields. Requires numpy.
+        """
+        import numpy
+
+        if len(records) != len(self):
+            raise ValueError('Expected %i records, not %i' % (
+                len(self), len(records)))
+        stride, columns = self._record_layout()
+        unknown = set(records.dtype.names) - set(c.name for c in columns)
+        if unknown:
+            raise ValueError('Unknown columns: %s' % (
+                ', '.join(sorted(unknown))))
+
+        old = self._record_rows(numpy, stride)
+        rows = old.copy()
+        for column in columns:
+            if column.name not in records.dtype.names:
+                continue
+            # Only encode values that changed, so that fields which do not
+            # round-trip (like bcd with invalid digits) are left alone
+            value = records[column.name]
+            changed = (value != column.decode(numpy, old)).reshape(
+                len(self), -1).any(axis=1)
+            if changed.any():
+                subset = rows[changed]
+                column.encode(numpy, subset, value[changed])
+                rows[changed] = subset
+
+        data = self.__items[0]._data
+        if hasattr(data, 'get_byte_compatible'):
+            data = data.get_byte_compatible()
+        start = self.__items[0].get_offset()
+        changed = numpy.flatnonzero((rows != old).any(axis=1))
+        # Write each run of consecutive changed elements at once
+        runs = numpy.split(changed,
+                           numpy.flatnonzero(numpy.diff(changed) != 1) + 1)
+        for run in runs:
+            if len(run):
+                first, last = int(run[0]), int(run[-1])
+                data[start + first * stride] = rows[first:last + 1].tobytes()
+
     def size(self):
+        if self._stride is not None:
+            return int(len(self) * self.__items[0].size())
         size = 0
         for i in self.__items:
             size += i.size()
@@ -400,10 +599,35 @@ class arrayDataElement(DataElement):
 
 
 class intDataElement(DataElement):
+    # Precompiled codec for this type, and the mask applied to values
+    # before packing (None for signed types, which must fit)
+    _struct = None
+    _mask = None
+    _byteorder = "big"
+    _signed = False
+
+    @classmethod
+    def _unpack(cls, data):
+        """Decode @data (exactly _size bytes) to an integer"""
+        return cls._struct.unpack(data)[0]
+
+    @classmethod
+    def _pack(cls, value):
+        """Encode integer @value to _size bytes"""
+        if cls._mask is not None:
+            return cls._struct.pack(int(value) & cls._mask)
+        return cls._struct.pack(int(value))
+
     def __repr__(self):
         fmt = "0x%%0%iX" % (self._size * 2)
         return fmt % int(self)
 
+    def _get_value(self, data):
+        return self._unpack(data)
+
+    def set_value(self, value):
+        self._data[self._offset] = self._pack(value)
+
     def __int__(self):
         return self.get_value()
 
@@ -538,6 +762,8 @@ class intDataElement(DataElement):
 
 class u8DataElement(intDataElement):
     _size = 1
+    _struct = struct.Struct("B")
+    _mask = 0xFF
 
     def _get_value(self, data):
         return ord(data)
@@ -548,124 +774,96 @@ class u8DataElement(intDataElement):
 
 class u16DataElement(intDataElement):
     _size = 2
-    _endianess = ">"
-
-    def _get_value(self, data):
-        return struct.unpack(self._endianess + "H", data)[0]
-
-    def set_value(self, value):
-        self._data[self._offset] = struct.pack(self._endianess + "H",
-                                               int(value) & 0xFFFF)
+    _struct = struct.Struct(">H")
+    _mask = 0xFFFF
 
 
 class ul16DataElement(u16DataElement):
-    _endianess = "<"
+    _struct = struct.Struct("<H")
+    _byteorder = "little"
 
 
 class u24DataElement(intDataElement):
     _size = 3
-    _endianess = ">"
+    _mask = 0xFFFFFF
+    _byteorder = "big"
 
-    def _get_value(self, data):
-        pre = self._endianess == ">" and b"\x00" or b""
-        post = self._endianess == "<" and b"\x00" or b""
-        return struct.unpack(self._endianess + "I", pre+data+post)[0]
+    @classmethod
+    def _unpack(cls, data):
+        return int.from_bytes(data, cls._byteorder)
 
-    def set_value(self, value):
-        if self._endianess == "<":
-            start = 0
-            end = 3
-        else:
-            start = 1
-            end = 4
-        packed = struct.pack(self._endianess + "I", int(value) & 0xFFFFFFFF)
-        self._data[self._offset] = packed[start:end]
+    @classmethod
+    def _pack(cls, value):
+        return (int(value) & cls._mask).to_bytes(3, cls._byteorder)
 
 
 class ul24DataElement(u24DataElement):
-    _endianess = "<"
+    _byteorder = "little"
 
 
 class u32DataElement(intDataElement):
     _size = 4
-    _endianess = ">"
-
-    def _get_value(self, data):
-        return struct.unpack(self._endianess + "I", data)[0]
-
-    def set_value(self, value):
-        self._data[self._offset] = struct.pack(self._endianess + "I",
-                                               int(value) & 0xFFFFFFFF)
+    _struct = struct.Struct(">I")
+    _mask = 0xFFFFFFFF
 
 
 class ul32DataElement(u32DataElement):
-    _endianess = "<"
+    _struct = struct.Struct("<I")
+    _byteorder = "little"
 
 
 class i8DataElement(u8DataElement):
     _size = 1
+    _struct = struct.Struct("b")
+    _mask = None
+    _signed = True
 
     def _get_value(self, data):
-        return struct.unpack("b", data)[0]
+        return self._unpack(data)
 
     def set_value(self, value):
-        self._data[self._offset] = struct.pack("b", int(value))
+        self._data[self._offset] = self._pack(value)
 
 
 class i16DataElement(intDataElement):
     _size = 2
-    _endianess = ">"
-
-    def _get_value(self, data):
-        return struct.unpack(self._endianess + "h", data)[0]
-
-    def set_value(self, value):
-        self._data[self._offset] = struct.pack(self._endianess + "h",
-                                               int(value))
+    _struct = struct.Struct(">h")
+    _signed = True
 
 
 class il16DataElement(i16DataElement):
-    _endianess = "<"
+    _struct = struct.Struct("<h")
+    _byteorder = "little"
 
 
 class i24DataElement(intDataElement):
     _size = 3
-    _endianess = ">"
+    _byteorder = "big"
+    _signed = True
 
-    def _get_value(self, data):
-        pre = self._endianess == ">" and "\x00" or ""
-        post = self._endianess == "<" and "\x00" or ""
-        return struct.unpack(self._endianess + "i", pre+data+post)[0]
+    @classmethod
+    def _unpack(cls, data):
+        return int.from_bytes(data, cls._byteorder, signed=True)
 
-    def set_value(self, value):
-        if self._endianess == "<":
-            start = 0
-            end = 3
-        else:
-            start = 1
-            end = 4
-        self._data[self._offset] = struct.pack(self._endianess + "i",
-                                               int(value))[start:end]
+    @classmethod
+    def _pack(cls, value):
+        # Truncate like a 32-bit pack would, keeping the low 24 bits
+        return (int(value) & 0xFFFFFF).to_bytes(3, cls._byteorder)
 
 
 class il24DataElement(i24DataElement):
-    _endianess = "<"
+    _byteorder = "little"
 
 
 class i32DataElement(intDataElement):
     _size = 4
-    _endianess = ">"
-
-    def _get_value(self, data):
-        return struct.unpack(self._endianess + "i", data)[0]
-
-    def set_value(self, value):
-        self._data[self._offset] = struct.pack(self._endianess + "i",
-                                               int(value))
+    _struct = struct.Struct(">i")
+    _signed = True
 
 
 class il32DataElement(i32DataElement):
-    _endianess = "<"
+    _struct = struct.Struct("<i")
+    _byteorder = "little"
 
 
 class charDataElement(DataElement):
@@ -737,29 +935,52 @@ class bitDataElement(intDataElement):
     _nbits = 0
     _shift = 0
     _subgen = u8DataElement  # Default to a byte
+    _subsize = 1
+    _bitmask = 0
+    _lowbit = 0
 
     def __repr__(self):
         fmt = "0x%%0%iX (%%sb)" % (self._size * 2)
         return fmt % (int(self), format_binary(self._nbits, self.get_value()))
 
     def get_value(self):
-        data = self._subgen(self._data, self._offset).get_value()
-        mask = bits_between(self._shift-self._nbits, self._shift)
-        val = (data & mask) >> int(self._shift - self._nbits)
-        return val
+        offset = self._offset
+        data = self._subgen._unpack(self._data[offset:offset + self._subsize])
+        return (data & self._bitmask) >> self._lowbit
 
     def set_value(self, value):
-        mask = bits_between(self._shift-self._nbits, self._shift)
+        offset = self._offset
+        data = self._subgen._unpack(self._data[offset:offset + self._subsize])
+        data &= ~self._bitmask
+        value = ((int(value) << self._lowbit) & self._bitmask) | data
+        self._data[offset] = self._subgen._pack(value)
+
+    def size(self):
+        return int(self._nbits)
 
-        data = self._subgen(self._data, self._offset).get_value()
-        data &= ~mask
 
-        value = ((int(value) << int(self._shift-self._nbits)) & mask) | data
+_BIT_CLASSES = {}
 
-        self._subgen(self._data, self._offset).set_value(value)
 
-    def size(self):
-        return int(self._nbits)
+def bit_class(subgen, nbits, shift):
+    """Return a bitDataElement class for @nbits ending at bit @shift of
+    @subgen. These are generated once and shared by all parsed specs."""
+    key = (subgen, nbits, shift)
+    try:
+        return _BIT_CLASSES[key]
+    except KeyError:
+        pass
+
+    cls = type('bitDE', (bitDataElement,), {
+        '_nbits': nbits,
+        '_shift': shift,
+        '_subgen': subgen,
+        '_subsize': subgen._size,
+        '_bitmask': bits_between(shift - nbits, shift),
+        '_lowbit': int(shift - nbits),
+    })
+    _BIT_CLASSES[key] = cls
+    return cls
 
 
 class structDataElement(DataElement):
@@ -802,6 +1023,13 @@ class structDataElement(DataElement):
         else:
             return result
 
+    def _clone(self, delta):
+        clone = DataElement._clone(self, delta)
+        clone.__dict__['_generators'] = {
+            name: gen._clone(delta) for name, gen in self._generators.items()}
+        clone.__dict__['_keys'] = list(self._keys)
+        return clone
+
     def __contains__(self, key):
         return key in self._generators.keys()
 
@@ -865,6 +1093,341 @@ class structDataElement(DataElement):
             yield key, self._generators[key]
 
 
+def _get_uint(np, rows, offset, size, byteorder):
+    """Decode an unsigned integer column from a matrix of element bytes"""
+    value = np.zeros(len(rows), dtype=np.uint64)
+    order = range(size) if byteorder == "big" else reversed(range(size))
+    for i in order:
+        value = (value << np.uint64(8)) | rows[:, offset + i]
+    return value
+
+
+def _put_uint(np, rows, offset, size, byteorder, value):
+    """Encode an integer column into a matrix of element bytes"""
+    value = np.asarray(value).astype(np.int64).astype(np.uint64)
+    for i in range(size):
+        shift = 8 * (size - 1 - i if byteorder == "big" else i)
+        rows[:, offset + i] = (value >> np.uint64(shift)) & np.uint64(0xFF)
+
+
+class _IntColumn:
+    def __init__(self, name, offset, gen):
+        self.name = name
+        self.offset = offset
+        self._size = gen._size
+        self._byteorder = gen._byteorder
+        self._signed = gen._signed
+
+    def field(self, np):
+        size = 4 if self._size == 3 else self._size
+        return (self.name, '%s%i' % ('i' if self._signed else 'u', size))
+
+    def decode(self, np, rows):
+        value = _get_uint(np, rows, self.offset, self._size, self._byteorder)
+        if self._signed:
+            sign = 1 << (self._size * 8 - 1)
+            value = (value.astype(np.int64) ^ sign) - sign
+        return value
+
+    def encode(self, np, rows, value):
+        _put_uint(np, rows, self.offset, self._size, self._byteorder, value)
+
+
+class _BitColumn:
+    def __init__(self, name, offset, gen):
+        self.name = name
+        self.offset = offset
+        self._size = gen._subsize
+        self._byteorder = gen._subgen._byteorder
+        self._mask = gen._bitmask
+        self._lowbit = gen._lowbit
+        self._nbits = gen._nbits
+
+    def field(self, np):
+        for size in (1, 2, 4):
+            if self._nbits <= size * 8:
+                return (self.name, 'u%i' % size)
+
+    def decode(self, np, rows):
+        value = _get_uint(np, rows, self.offset, self._size, self._byteorder)
+        return (value & np.uint64(self._mask)) >> np.uint64(self._lowbit)
+
+    def encode(self, np, rows, value):
+        value = np.asarray(value).astype(np.int64).astype(np.uint64)
+        value = (value << np.uint64(self._lowbit)) & np.uint64(self._mask)
+        old = _get_uint(np, rows, self.offset, self._size, self._byteorder)
+        _put_uint(np, rows, self.offset, self._size, self._byteorder,
+                  (old & ~np.uint64(self._mask)) | value)
+
+
+class _CharColumn:
+    def __init__(self, name, offset, count):
+        self.name = name
+        self.offset = offset
+        self._count = count
+
+    def field(self, np):
+        return (self.name, 'S%i' % self._count)
+
+    def decode(self, np, rows):
+        chars = rows[:, self.offset:self.offset + self._count]
+        return np.ascontiguousarray(chars).view(self.field(np)[1])[:, 0]
+
+    def encode(self, np, rows, value):
+        value = np.asarray(value).astype(self.field(np)[1])
+        rows[:, self.offset:self.offset + self._count] = np.frombuffer(
+            value.tobytes(), dtype=np.uint8).reshape(len(rows), self._count)
+
+
+class _BCDColumn:
+    def __init__(self, name, offset, count, little):
+        self.name = name
+        self.offset = offset
+        self._count = count
+        self._little = little
+
+    def field(self, np):
+        return (self.name, 'u8')
+
+    def _order(self):
+        if self._little:
+            return reversed(range(self._count))
+        return range(self._count)
+
+    def decode(self, np, rows):
+        # Same arithmetic as int() on a bcd array, so invalid digits
+        # decode the same way
+        value = np.zeros(len(rows), dtype=np.uint64)
+        for i in self._order():
+            byte = rows[:, self.offset + i].astype(np.uint64)
+            value = (value * np.uint64(100) +
+                     (byte >> np.uint64(4)) * np.uint64(10) +
+                     (byte & np.uint64(0xF)))
+        return value
+
+    def encode(self, np, rows, value):
+        value = np.asarray(value).astype(np.uint64)
+        for i in reversed(list(self._order())):
+            digits = value % np.uint64(100)
+            value = value // np.uint64(100)
+            rows[:, self.offset + i] = (
+                (digits // np.uint64(10)) << np.uint64(4) |
+                (digits % np.uint64(10)))
+
+
+class _ArrayColumn:
+    def __init__(self, name, offset, columns):
+        self.name = name
+        self.offset = offset
+        self._columns = columns
+
+    def field(self, np):
+        return (self.name, self._columns[0].field(np)[1],
+                (len(self._columns),))
+
+    def decode(self, np, rows):
+        return np.stack([c.decode(np, rows) for c in self._columns], axis=1)
+
+    def encode(self, np, rows, value):
+        value = np.asarray(value)
+        for i, column in enumerate(self._columns):
+            column.encode(np, rows, value[:, i])
+
+
+def _record_columns(element, base, prefix=''):
+    """Describe the fields of @element as columns for bulk access.
+
+    Offsets are relative to @base, the start of the array element that
+    contains @element.
+    """
+    columns = []
+    for name, gen in element.items():
+        name = prefix + name
+        if isinstance(gen, structDataElement):
+            columns.extend(_record_columns(gen, base, name + '.'))
+        elif isinstance(gen, arrayDataElement):
+            first = gen[0]
+            offset = gen.get_offset() - base
+            if isinstance(first, structDataElement):
+                for i, item in enumerate(gen):
+                    columns.extend(_record_columns(
+                        item, base, '%s[%i].' % (name, i)))
+            elif isinstance(first, charDataElement):
+                columns.append(_CharColumn(name, offset, len(gen)))
+            elif isinstance(first, bcdDataElement):
+                columns.append(_BCDColumn(
+                    name, offset, len(gen),
+                    isinstance(first, lbcdDataElement)))
+            else:
+                columns.append(_ArrayColumn(name, offset, [
+                    _record_column('', item, base) for item in gen]))
+        else:
+            columns.append(_record_column(name, gen, base))
+    return columns
+
+
+def _record_column(name, gen, base):
+    offset = gen.get_offset() - base
+    if isinstance(gen, bitDataElement):
+        return _BitColumn(name, offset, gen)
+    elif isinstance(gen, intDataElement):
+        return _IntColumn(name, offset, gen)
+    elif isinstance(gen, charDataElement):
+        return _CharColumn(name, offset, 1)
+    elif isinstance(gen, bcdDataElement):
+        return _BCDColumn(name, offset, 1, False)
+    else:
+        raise TypeError('Unsupported element %r for bulk access' % gen)
+
+
+class SpecCache:
+    """Cache of parsed bitwise specs, keyed by a hash of the spec text.
+
+    Parsed specs are always kept in memory. If a directory is set with
+    set_path(), they are also stored there so that later runs can skip
+    parsing entirely.
+    """
+    # Bump this if the on-disk format changes
+    FORMAT = 1
+    # Most parsed specs to keep on disk, the least recently used go first
+    MAX_FILES = 1000
+
+    def __init__(self):
+        self._cache = {}
+        self._grammar = None
+        self._path = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def set_path(self, path):
+        """Store parsed specs in directory @path (or None to disable)"""
+        if path:
+            os.makedirs(path, exist_ok=True)
+        self._path = path
+
+    def clear(self):
+        """Forget all parsed specs held in memory and reset the counters"""
+        self._cache = {}
+        self.hits = self.disk_hits = self.misses = 0
+
+    def stats(self):
+        return {'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'size': len(self._cache)}
+
+    @staticmethod
+    def _grammar_digest():
+        """Hash the source of the parser, so a change to the grammar does
+        not load specs parsed with the old one"""
+        digest = hashlib.sha1()
+        for module in (bitwise_grammar, pyPEG):
+            try:
+                with open(module.__file__, 'rb') as f:
+                    digest.update(f.read())
+            except (OSError, TypeError, AttributeError):
+                # No source (frozen builds), so the version has to do
+                digest.update(module.__name__.encode())
+        return digest.hexdigest()
+
+    def _key(self, spec):
+        if self._grammar is None:
+            self._grammar = self._grammar_digest()
+        key = '%s:%i:%s:%s' % (CHIRP_VERSION, SpecCache.FORMAT,
+                               self._grammar, spec)
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    @staticmethod
+    def _encode(node):
+        if isinstance(node, pyPEG.Symbol):
+            return {'s': str(node.__name__), 'l': node.__name__.line,
+                    'w': SpecCache._encode(node.what)}
+        elif isinstance(node, list):
+            return [SpecCache._encode(x) for x in node]
+        else:
+            return str(node)
+
+    @staticmethod
+    def _decode(node):
+        if isinstance(node, dict):
+            name = pyPEG.Name(node['s'])
+            name.line = node['l']
+            return pyPEG.Symbol(name, SpecCache._decode(node['w']))
+        elif isinstance(node, list):
+            return [SpecCache._decode(x) for x in node]
+        else:
+            return node
+
+    def _load(self, key):
+        if not self._path:
+            return None
+        fn = os.path.join(self._path, '%s.json' % key)
+        try:
+            with open(fn) as f:
+                ast = self._decode(json.load(f))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            LOG.warning('Failed to load cached spec %s: %s', fn, e)
+            return None
+        try:
+            # Recently used, as far as _prune() is concerned
+            os.utime(fn)
+        except OSError:
+            pass
+        return ast
+
+    def _save(self, key, ast):
+        if not self._path:
+            return
+        fn = os.path.join(self._path, '%s.json' % key)
+        try:
+            with open(fn + '.tmp', 'w') as f:
+                json.dump(self._encode(ast), f)
+            os.replace(fn + '.tmp', fn)
+        except Exception as e:
+            LOG.warning('Failed to store cached spec %s: %s', fn, e)
+            return
+        self._prune()
+
+    def _prune(self):
+        """Remove the least recently used specs beyond MAX_FILES"""
+        try:
+            files = [entry for entry in os.scandir(self._path)
+                     if entry.name.endswith('.json')]
+            if len(files) <= self.MAX_FILES:
+                return
+            files.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in files[:len(files) - self.MAX_FILES]:
+                os.remove(entry.path)
+        except OSError as e:
+            LOG.warning('Failed to prune spec cache %s: %s', self._path, e)
+
+    def parse(self, spec):
+        """Return the parsed form of @spec, from the cache if possible"""
+        key = self._key(spec)
+        try:
+            ast = self._cache[key]
+            self.hits += 1
+            return ast
+        except KeyError:
+            pass
+
+        ast = self._load(key)
+        if ast is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            ast = bitwise_grammar.parse(spec)
+            self._save(key, ast)
+        self._cache[key] = ast
+        return ast
+
+
+SPEC_CACHE = SpecCache()
+
+
 class Processor:
     _types = {
         "u8":    u8DataElement,
@@ -885,7 +1448,7 @@ class Processor:
         "bbcd":  bbcdDataElement,
         }
 
-    def __init__(self, data, offset, input):
+    def __init__(self, data, offset, input, lazy=True):
         if hasattr(data, 'get_byte_compatible'):
             # bitwise uses the byte-compatible interface of MemoryMap,
             # if that is what was passed in
@@ -895,6 +1458,7 @@ class Processor:
         self._obj = None
         self._user_types = {}
         self._input = input.split('\n')
+        self._lazy = lazy
 
     def do_symbol(self, symdef, gen):
         name = symdef[1]
@@ -916,7 +1480,7 @@ class Processor:
         return '%i: %s' % (num, self.get_source_line(num))
 
     def do_bitfield(self, dtype, bitfield):
-        bytes = self._types[dtype](self._data, 0).size() // 8
+        bytes = self._types[dtype]._size
         bitsleft = bytes * 8
 
         for _bitdef, defn in bitfield:
@@ -932,11 +1496,7 @@ class Processor:
             if bitsleft < 0:
                 raise ParseError("Invalid bitfield spec")
 
-            class bitDE(bitDataElement):
-                _nbits = bits
-                _shift = bitsleft
-                _subgen = self._types[dtype]
-
+            bitDE = bit_class(self._types[dtype], bits, bitsleft)
             self._generators[name] = bitDE(self._data, self._offset)
             self._lines[name] = self.get_line_from_sym(defn[0])
             bitsleft -= bits
@@ -951,10 +1511,7 @@ class Processor:
         if count % 8 != 0:
             raise ValueError("bit array must be divisible by 8.")
 
-        class bitDE(bitDataElement):
-            _nbits = 1
-            _shift = 8 - i % 8
-
+        bitDE = bit_class(u8DataElement, 1, 8 - i % 8)
         return bitDE(self._data, self._offset)
 
     def parse_defn(self, defn):
@@ -1011,23 +1568,62 @@ class Processor:
             count = 1
 
         result = arrayDataElement(self._offset)
-        for i in range(0, count):
-            element = structDataElement(self._data, self._offset, count,
-                                        name=name)
-            result.append(element)
-            tmp = self._generators
-            tmp_lines = self._lines
-            self._generators = element
-            self._lines = {}
-            self.parse_block(block)
-            self._generators = tmp
-            self._lines = tmp_lines
+        if count > 1 and not self._has_seekto(block):
+            # Parse (and validate) the first element only, and use it as a
+            # template for the rest, which share its layout
+            base = self._offset
+            element = self.parse_struct_element(block, name, count)
+            stride = self._offset - base
+
+            def factory(index):
+                if index == 0:
+                    return element
+                return element._clone(index * stride)
+
+            if self._lazy:
+                # Only build the rest when they are touched
+                result.set_lazy(count, stride, factory)
+            else:
+                for i in range(0, count):
+                    result.append(factory(i))
+            self._offset = base + (count * stride)
+        else:
+            for i in range(0, count):
+                result.append(self.parse_struct_element(block, name, count))
 
         if count == 1:
             self._generators[name] = result[0]
         else:
             self._generators[name] = result
 
+    def parse_struct_element(self, block, name, count):
+        """Parse one element of a struct declaration at the current offset"""
+        element = structDataElement(self._data, self._offset, count,
+                                    name=name)
+        tmp = self._generators
+        tmp_lines = self._lines
+        self._generators = element
+        self._lines = {}
+        try:
+            self.parse_block(block)
+        finally:
+            self._generators = tmp
+            self._lines = tmp_lines
+        return element
+
+    def _has_seekto(self, block):
+        """Return True if @block (or a struct within it) uses #seekto"""
+        for t, d in block:
+            if t == "directive" and d[0][0] == "seekto":
+                return True
+            elif t == "struct" and d[0][0] == "struct_decl":
+                inner = d[0][1][:-1]
+                if inner[0][0] == "symbol":
+                    inner = self._user_types[inner[0][1]]
+                if self._has_seekto(inner):
+                    return True
+        return False
+
     def parse_struct_defn(self, struct):
         name = struct[0][1]
         block = struct[1:]
@@ -1081,10 +1677,87 @@ class Processor:
         return self._generators
 
 
-def parse(spec, data, offset=0):
-    ast = bitwise_grammar.parse(spec)
-    p = Processor(data, offset, spec)
-    return p.parse(ast)
+class FieldIndex:
+    """An index from byte offsets in a parsed tree to the fields there.
+
+    Fields are kept sorted by offset, so finding the ones covering an
+    offset or a range is a binary search. Lazy struct arrays are indexed
+    through their first element, which keeps building the index cheap and
+    does not create the other elements.
+    """
+    def __init__(self, obj):
+        entries = []
+        self._add(obj, '', entries)
+        entries.sort(key=lambda entry: entry[0])
+        self._entries = entries
+        self._starts = [entry[0] for entry in entries]
+        # The furthest end of any entry up to each one, so that searches
+        # can stop early even if fields overlap
+        self._reach = list(itertools.accumulate(
+            (entry[1] for entry in entries), max))
+
+    def _add(self, obj, path, entries):
+        if isinstance(obj, structDataElement):
+            for name, gen in obj.items():
+                self._add(gen, '%s.%s' % (path, name) if path else name,
+                          entries)
+        elif isinstance(obj, arrayDataElement):
+            first = obj[0]
+            start = first.get_offset()
+            if isinstance(first, (charDataElement, bcdDataElement)):
+                entries.append((start, start + len(obj), path, None, 0))
+            elif obj._stride is not None:
+                entries.append((start, start + len(obj) * obj._stride, path,
+                                FieldIndex(first), obj._stride))
+            else:
+                for i, item in enumerate(obj):
+                    self._add(item, '%s[%i]' % (path, i), entries)
+        else:
+            start = obj.get_offset()
+            if isinstance(obj, bitDataElement):
+                size = obj._subsize
+            else:
+                size = obj._size
+            entries.append((start, start + size, path, None, 0))
+
+    def lookup(self, offset):
+        """Return the paths of the fields covering byte @offset"""
+        return self.lookup_range(offset, offset + 1)
+
+    def lookup_range(self, start, end):
+        """Return the paths of the fields covering any of the bytes from
+        @start up to @end, in offset order"""
+        found = []
+        i = bisect.bisect_left(self._starts, end) - 1
+        while i >= 0 and self._reach[i] > start:
+            if self._entries[i][1] > start:
+                found.append(self._entries[i])
+            i -= 1
+
+        paths = []
+        for first, last, path, template, stride in reversed(found):
+            if template is None:
+                paths.append(path)
+                continue
+            # Look up the part of the range in each element in the template,
+            # which is the first element
+            for index in range((max(start, first) - first) // stride,
+                               (min(end, last) - 1 - first) // stride + 1):
+                delta = index * stride
+                for subpath in template.lookup_range(max(start - delta, first),
+                                                     end - delta):
+                    paths.append('%s[%i].%s' % (path, index, subpath))
+        return paths
+
+
+def parse(spec, data, offset=0, lazy=True):
+    """Parse @spec and return an object tree over @data
+
+    If @lazy is True, the elements of struct arrays are only created when
+    they are first accessed.
+    """
+    p = Processor(data, offset, spec, lazy=lazy)
+    return p.parse(SPEC_CACHE.parse(spec))
 
 
 if __name__ == "__main__":
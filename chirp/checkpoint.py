@@ -0,0 +1,222 @@
+# Copyright 2026 CHIRP Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Checkpoints for resuming an interrupted download from a radio.
+
+Drivers that read the radio's memory in addressed blocks keep the blocks
+they receive in a DownloadCheckpoint, which appends them to a file in
+the user's config directory keyed by the port, the model and whatever
+the radio identified itself as. If the download fails part way through,
+the next attempt only has to read the blocks that are missing. The file
+is removed once the download completes, and ignored if it is older than
+MAX_AGE.
+
+That key names a model rather than a particular radio, so stored blocks
+are not used until CHECK_COUNT of them have been read from the radio
+again and matched. If any differ, it is another radio (or has been
+changed since) and everything stored is thrown away.
+"""
+
+import hashlib
+import logging
+import os
+import struct
+import time
+
+from chirp import platform
+
+LOG = logging.getLogger(__name__)
+
+MAGIC = b'CHIRP checkpoint 1\n'
+# A checkpoint this old may not match what is in the radio any more
+MAX_AGE = 15 * 60
+# How many stored blocks with something in them must match the radio
+# before the rest are trusted
+CHECK_COUNT = 2
+_RECORD = struct.Struct('>IH')
+
+
+def checkpoint_dir():
+    return platform.get_platform().config_file('checkpoints')
+
+
+def _is_blank(block):
+    # Erased or zeroed, so it would match any radio of the model
+    return block.strip(b'\xff') == b'' or block.strip(b'\x00') == b''
+
+
+class DownloadCheckpoint:
+    """Blocks received so far from one radio on one port.
+
+    Use as a context manager around the download and call complete() once
+    the image has been read in full. If the pipe has no port name (as with
+    network radios and tests) nothing is persisted.
+    """
+    def __init__(self, radio, ident=b''):
+        self.blocks = {}
+        self.resumed = 0
+        self.path = None
+        # Blocks loaded from the checkpoint that the radio has not
+        # confirmed yet, and how many have been
+        self._unchecked = set()
+        self._checked = 0
+        self._file = None
+        self._end = 0
+        port = getattr(radio.pipe, 'port', None)
+        if not isinstance(port, str):
+            LOG.debug('Pipe has no port name, not checkpointing download')
+            return
+        if isinstance(ident, str):
+            ident = ident.encode('latin-1')
+        self._header = MAGIC + ('%s|%s|%s|%s|' % (
+            port, radio.VENDOR, radio.MODEL,
+            radio.VARIANT)).encode() + ident.hex().encode() + b'\n'
+        self.path = os.path.join(
+            checkpoint_dir(),
+            hashlib.sha1(self._header).hexdigest() + '.ckpt')
+        self._load()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        if exc_type is not None and self.path and self.blocks:
+            LOG.info('Kept %i blocks in %s for the next attempt',
+                     len(self.blocks), self.path)
+
+    def _discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _load(self):
+        try:
+            age = time.time() - os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return
+        if age > MAX_AGE:
+            LOG.debug('Discarding stale checkpoint %s', self.path)
+            self._discard()
+            return
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        if not data.startswith(self._header):
+            self._discard()
+            return
+        pos = len(self._header)
+        while pos + _RECORD.size <= len(data):
+            addr, size = _RECORD.unpack_from(data, pos)
+            block = data[pos + _RECORD.size:pos + _RECORD.size + size]
+            if len(block) != size:
+                # Interrupted while writing this one
+                break
+            self.blocks[addr] = block
+            pos += _RECORD.size + size
+        self._end = pos
+        self._unchecked = set(self.blocks)
+        LOG.info('Resuming download with %i blocks from %s',
+                 len(self.blocks), self.path)
+
+    def _open(self):
+        # Radio images are nobody else's business
+        os.makedirs(checkpoint_dir(), mode=0o700, exist_ok=True)
+        if self._end:
+            self._file = open(self.path, 'r+b')
+            self._file.seek(self._end)
+            self._file.truncate()
+        else:
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                         0o600)
+            self._file = os.fdopen(fd, 'wb')
+            self._file.write(self._header)
+
+    @property
+    def trusted(self):
+        """Whether the radio has confirmed the stored blocks are its own"""
+        return not self._unchecked or self._checked >= CHECK_COUNT
+
+    def _check(self, addr, data):
+        self._unchecked.discard(addr)
+        if self.blocks[addr] != data:
+            LOG.info('Checkpoint %s does not match the radio, '
+                     'discarding it', self.path)
+            for unchecked in self._unchecked:
+                del self.blocks[unchecked]
+            self._unchecked = set()
+            # Start the file again with only what this radio sent
+            self.close()
+            self._end = 0
+            blocks, self.blocks = self.blocks, {}
+            for old_addr, old_data in blocks.items():
+                if old_addr != addr:
+                    self.put(old_addr, old_data)
+        elif not _is_blank(data):
+            self._checked += 1
+
+    def get(self, addr, size):
+        """Return the @size byte block at @addr, if we have it and trust
+        it"""
+        block = self.blocks.get(addr)
+        if block is None or len(block) != size:
+            return None
+        if addr in self._unchecked and not self.trusted:
+            # Read it from the radio again to check the rest
+            return None
+        self.resumed += 1
+        return block
+
+    def put(self, addr, data):
+        """Remember the block @data read from @addr"""
+        data = bytes(data)
+        if addr in self._unchecked:
+            self._check(addr, data)
+        self.blocks[addr] = data
+        if self.path is None:
+            return
+        try:
+            if self._file is None:
+                self._open()
+            self._file.write(_RECORD.pack(addr, len(data)) + data)
+            self._file.flush()
+        except OSError as e:
+            LOG.warning('Unable to write download checkpoint: %s', e)
+            self.close()
+            self.path = None
+
+    def fetch(self, addr, size, read):
+        """Return the block at @addr, calling @read() if we do not have it"""
+        block = self.get(addr, size)
+        if block is None:
+            block = read()
+            if block and len(block) == size:
+                self.put(addr, block)
+        return block
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def complete(self):
+        """The download finished, so the checkpoint is no longer needed"""
+        self.close()
+        if self.resumed:
+            LOG.info('Download resumed %i blocks from checkpoint',
+                     self.resumed)
+        if self.path:
+            self._discard()
+        self.blocks = {}
@@ -16,10 +16,14 @@
 from builtins import bytes
 
 import base64
+import bisect
+import functools
+import hashlib
 import json
 import inspect
 import logging
 import math
+import operator
 import re
 import sys
 
@@ -280,60 +284,110 @@ class ImmutableValueError(ValueError):
 
 class Memory:
     """Base class for a single radio memory"""
-    freq = 0
-    number = 0
-    extd_number = ""
-    name = ""
-    vfo = 0
-    rtone = 88.5
-    ctone = 88.5
-    dtcs = 23
-    rx_dtcs = 23
-    tmode = ""
-    cross_mode = "Tone->Tone"
-    dtcs_polarity = "NN"
-    skip = ""
-    power = None
-    duplex = ""
-    offset = 600000
-    mode = "FM"
-    tuning_step = 5.0
-
-    comment = ""
-
-    empty = False
-
-    immutable = []
-
-    # A RadioSettingGroup of additional settings supported by the radio,
-    # or an empty list if none
-    extra = []
+    # Every attribute of a memory and its default. We keep thousands of
+    # these around, so they are stored in slots instead of a __dict__.
+    _defaults = {
+        'freq': 0,
+        'number': 0,
+        'extd_number': "",
+        'name': "",
+        'vfo': 0,
+        'rtone': 88.5,
+        'ctone': 88.5,
+        'dtcs': 23,
+        'rx_dtcs': 23,
+        'tmode': "",
+        'cross_mode': "Tone->Tone",
+        'dtcs_polarity': "NN",
+        'skip': "",
+        'power': None,
+        'duplex': "",
+        'offset': 600000,
+        'mode': "FM",
+        'tuning_step': 5.0,
+
+        'comment': "",
+
+        'empty': False,
+
+        'immutable': [],
+
+        # A RadioSettingGroup of additional settings supported by the radio,
+        # or an empty list if none
+        'extra': [],
+    }
+    __slots__ = tuple(_defaults)
+    # All the slots, including those of subclasses, and whether instances
+    # also have a __dict__ (for subclasses that do not use __slots__)
+    _fields = __slots__
+    _has_dict = False
+    # The (get, set) methods of each slot descriptor, for copying
+    _slot_access = ()
+    # Fields that say where a memory is and how it may be edited, rather
+    # than what it stores, so they are not part of its fingerprint()
+    _location_fields = ('number', 'extd_number', 'immutable', 'extra')
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._init_fields()
+
+    @classmethod
+    def _init_fields(cls):
+        cls._fields = tuple(name
+                            for klass in reversed(cls.__mro__)
+                            for name in vars(klass).get('__slots__', ()))
+        cls._has_dict = any('__dict__' in vars(klass)
+                            for klass in cls.__mro__)
+        slots = [inspect.getattr_static(cls, name) for name in cls._fields]
+        cls._slot_access = tuple((slot.__get__, slot.__set__)
+                                 for slot in slots)
+        cls._get_contents = operator.attrgetter(
+            *[name for name in cls._fields
+              if name not in cls._location_fields and
+              not name.startswith('_')])
 
     def __init__(self, number=0, empty=False, name=""):
-        self.freq = 0
-        self.number = number
-        self.extd_number = ""
-        self.name = name
-        self.vfo = 0
-        self.rtone = 88.5
-        self.ctone = 88.5
-        self.dtcs = 23
-        self.rx_dtcs = 23
-        self.tmode = ""
-        self.cross_mode = "Tone->Tone"
-        self.dtcs_polarity = "NN"
-        self.skip = ""
-        self.power = None
-        self.duplex = ""
-        self.offset = 600000
-        self.mode = "FM"
-        self.tuning_step = 5.0
-
-        self.comment = ""
+        # The defaults are all valid, so skip the checks in __setattr__.
+        # Like before, extra (and the DV fields) are left to read as their
+        # defaults until set.
+        _set = object.__setattr__
+        for field, value in Memory._defaults.items():
+            if field != 'extra':
+                _set(self, field, value)
+        _set(self, 'number', number)
+        _set(self, 'name', name)
+        _set(self, 'immutable', [])
 
         self.empty = empty
 
-        self.immutable = []
+    def __getattr__(self, name):
+        # Only called for slots that have never been set, which read as
+        # their default, like a class attribute would
+        try:
+            return self._defaults[name]
+        except KeyError:
+            raise AttributeError("'%s' object has no attribute '%s'" % (
+                self.__class__.__name__, name))
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        for k, v in state.items():
+            object.__setattr__(self, k, v)
+
+    def to_dict(self):
+        """Return the attributes that have been set on this memory"""
+        values = {}
+        for field in self._fields:
+            try:
+                values[field] = object.__getattribute__(self, field)
+            except AttributeError:
+                pass
+        if self._has_dict:
+            # Subclasses without __slots__ can have others
+            values.update(self.__dict__)
+        return values
 
     _valid_map = {
         "rtone":          VALIDTONE,
@@ -373,7 +427,7 @@ class Memory:
         return ','.join(diffs)
 
     def debug_dump(self):
-        vals = [(k, v) for k, v in self.__dict__.items()
+        vals = [(k, v) for k, v in self.to_dict().items()
                 if k not in ('extra', 'number', 'extd_number')]
         for extra in self.extra:
             vals.append(('extra.%s' % extra.get_name(), str(extra.value)))
@@ -383,18 +437,44 @@ class Memory:
             ident = str(self.number)
         return ident, vals
 
+    def fingerprint(self):
+        """Return a digest of what this memory stores.
+
+        Two memories with the same fingerprint store the same values
+        (including those in mem.extra), regardless of their location or
+        immutable list. Unset fields count as their defaults. The result
+        is a short string that is stable between runs.
+        """
+        contents = [self._get_contents(self)]
+        if self._has_dict:
+            contents.append(sorted(self.__dict__.items()))
+        contents.extend((extra.get_name(), str(extra.value))
+                        for extra in self.extra)
+        return hashlib.blake2b(repr(contents).encode(),
+                               digest_size=16).hexdigest()
+
     def dupe(self):
         """Return a deep copy of @self"""
-        mem = self.__class__()
-        for k, v in list(self.__dict__.items()):
-            mem.__dict__[k] = v
-
+        mem = self.__class__.__new__(self.__class__)
+        for get, set_ in self._slot_access:
+            try:
+                set_(mem, get(self))
+            except AttributeError:
+                # Never set, so leave it to read as the default
+                pass
+        if self._has_dict:
+            mem.__dict__.update(self.__dict__)
         return mem
 
     def clone(self, source):
         """Absorb all of the properties of @source"""
-        for k, v in list(source.__dict__.items()):
-            self.__dict__[k] = v
+        for k, v in source.to_dict().items():
+            try:
+                object.__setattr__(self, k, v)
+            except AttributeError:
+                # @source is a different kind of memory with attributes
+                # we do not have
+                pass
 
     CSV_FORMAT = ["Location", "Name", "Frequency",
                   "Duplex", "Offset", "Tone",
@@ -406,7 +486,7 @@ class Memory:
                   "URCALL", "RPT1CALL", "RPT2CALL", "DVCODE"]
 
     def __setattr__(self, name, val):
-        if not hasattr(self, name):
+        if name not in self._fields and not hasattr(self, name):
             raise ValueError("No such attribute `%s'" % name)
 
         if name in self.immutable:
@@ -423,7 +503,7 @@ class Memory:
                 raise ValueError("`%s' is not in valid list: %s" %
                                  (val, self._valid_map[name]))
 
-        self.__dict__[name] = val
+        object.__setattr__(self, name, val)
 
     def format_freq(self):
         """Return a properly-formatted string of this memory's frequency"""
@@ -594,12 +674,17 @@ class Memory:
         return True
 
 
+Memory._init_fields()
+
+
 class DVMemory(Memory):
     """A Memory with D-STAR attributes"""
-    dv_urcall = "CQCQCQ"
-    dv_rpt1call = ""
-    dv_rpt2call = ""
-    dv_code = 0
+    _defaults = dict(Memory._defaults,
+                     dv_urcall="CQCQCQ",
+                     dv_rpt1call="",
+                     dv_rpt2call="",
+                     dv_code=0)
+    __slots__ = ('dv_urcall', 'dv_rpt1call', 'dv_rpt2call', 'dv_code')
 
     def __str__(self):
         string = Memory.__str__(self)
@@ -644,15 +729,20 @@ class DVMemory(Memory):
 
 
 def FrozenMemory(source):
+    unfrozen_class = getattr(source, '_unfrozen_class', source.__class__)
+
     class _FrozenMemory(source.__class__):
+        __slots__ = ('_frozen',)
+        _unfrozen_class = unfrozen_class
+
         def __init__(self, source):
-            self.__dict__['_frozen'] = False
-            for k, v in source.__dict__.items():
+            object.__setattr__(self, '_frozen', False)
+            for k, v in source.to_dict().items():
                 if k == '_frozen':
                     continue
                 setattr(self, k, v)
 
-            self.__dict__['_frozen'] = True
+            object.__setattr__(self, '_frozen', True)
             for i in self.extra:
                 i.set_frozen()
 
@@ -669,9 +759,8 @@ def FrozenMemory(source):
             super().__setattr__(k, v)
 
         def dupe(self):
-            m = Memory()
+            m = self._unfrozen_class.__new__(self._unfrozen_class)
             m.clone(self)
-            delattr(m, '_frozen')
             return m
 
     return _FrozenMemory(source)
@@ -902,6 +991,8 @@ class RadioFeatures:
                 val, name))
 
         self.__dict__[name] = val
+        # Built from the features, so it must be rebuilt when they change
+        self.__dict__.pop('_feature_index', None)
 
     def __getattr__(self, name):
         raise AttributeError("pylint is confused by RadioFeatures")
@@ -1019,79 +1110,84 @@ class RadioFeatures:
     def validate_memory(self, mem):
         """Return a list of warnings and errors that will be encountered
         if trying to set @mem on the current radio"""
+        return self.validate_memories([mem])[0]
+
+    def validate_memories(self, mems):
+        """Return a list of warnings and errors for each of @mems, exactly
+        as validate_memory() would for each one"""
+        index = self.__dict__.get('_feature_index')
+        if index is None:
+            index = self._feature_index = _FeatureIndex(self)
+        return [self._validate_memory(mem, index) for mem in mems]
+
+    def _validate_memory(self, mem, index):
         msgs = []
 
         lo, hi = self.memory_bounds
         if not self.has_infinite_number and \
                 (mem.number < lo or mem.number > hi) and \
-                mem.extd_number not in self.valid_special_chans:
+                mem.extd_number not in index.special_chans:
             msg = ValidationWarning("Location %i is out of range" % mem.number)
             msgs.append(msg)
 
-        if (self.valid_modes and
-                mem.mode not in self.valid_modes and
+        if (index.modes and
+                mem.mode not in index.modes and
                 'mode' not in mem.immutable and
                 mem.mode != "Auto"):
             msg = ValidationError("Mode %s not supported" % mem.mode)
             msgs.append(msg)
 
-        if self.valid_tmodes and mem.tmode not in self.valid_tmodes:
+        if index.tmodes and mem.tmode not in index.tmodes:
             msg = ValidationError("Tone mode %s not supported" % mem.tmode)
             msgs.append(msg)
         else:
             if mem.tmode == "Cross":
-                if self.valid_cross_modes and \
-                        mem.cross_mode not in self.valid_cross_modes:
+                if index.cross_modes and \
+                        mem.cross_mode not in index.cross_modes:
                     msg = ValidationError("Cross tone mode %s not supported" %
                                           mem.cross_mode)
                     msgs.append(msg)
 
-        if self.valid_tones and mem.rtone not in self.valid_tones:
+        if index.tones and mem.rtone not in index.tones:
             msg = ValidationError("Tone %.1f not supported" % mem.rtone)
             msgs.append(msg)
-        if self.valid_tones and mem.ctone not in self.valid_tones:
+        if index.tones and mem.ctone not in index.tones:
             msg = ValidationError("Tone %.1f not supported" % mem.ctone)
             msgs.append(msg)
 
         if self.has_dtcs_polarity and \
-                mem.dtcs_polarity not in self.valid_dtcs_pols:
+                mem.dtcs_polarity not in index.dtcs_pols:
             msg = ValidationError("DTCS Polarity %s not supported" %
                                   mem.dtcs_polarity)
             msgs.append(msg)
 
-        if self.valid_dtcs_codes and \
-                mem.dtcs not in self.valid_dtcs_codes:
+        if index.dtcs_codes and \
+                mem.dtcs not in index.dtcs_codes:
             msg = ValidationError("DTCS Code %03i not supported" % mem.dtcs)
             msgs.append(msg)
-        if self.valid_dtcs_codes and \
-                mem.rx_dtcs not in self.valid_dtcs_codes:
+        if index.dtcs_codes and \
+                mem.rx_dtcs not in index.dtcs_codes:
             msg = ValidationError("DTCS Code %03i not supported" % mem.rx_dtcs)
             msgs.append(msg)
 
-        if self.valid_duplexes and mem.duplex not in self.valid_duplexes:
+        if index.duplexes and mem.duplex not in index.duplexes:
             msg = ValidationError("Duplex %s not supported" % mem.duplex)
             msgs.append(msg)
 
         ts = mem.tuning_step
-        if self.valid_tuning_steps and ts not in self.valid_tuning_steps and \
+        if index.tuning_steps and ts not in index.tuning_steps and \
                 not self.has_nostep_tuning:
             msg = ValidationError("Tuning step %.2f not supported" % ts)
             msgs.append(msg)
 
-        if self.valid_bands:
-            valid = False
-            for lo, hi in self.valid_bands:
-                if lo <= mem.freq < hi:
-                    valid = True
-                    break
-            if not valid:
-                msg = ValidationError(
-                    ("Frequency {freq} is out "
-                     "of supported range").format(freq=format_freq(mem.freq)))
-                msgs.append(msg)
+        if self.valid_bands and not index.in_band(mem.freq):
+            msg = ValidationError(
+                ("Frequency {freq} is out "
+                 "of supported range").format(freq=format_freq(mem.freq)))
+            msgs.append(msg)
 
         if self.valid_bands and \
-                self.valid_duplexes and \
+                index.duplexes and \
                 mem.duplex in ["split", "-", "+"]:
             if mem.duplex == "split":
                 freq = mem.offset
@@ -1099,12 +1195,7 @@ class RadioFeatures:
                 freq = mem.freq - mem.offset
             elif mem.duplex == "+":
                 freq = mem.freq + mem.offset
-            valid = False
-            for lo, hi in self.valid_bands:
-                if lo <= freq < hi:
-                    valid = True
-                    break
-            if not valid:
+            if not index.in_band(freq):
                 msg = ValidationError(
                     ("Tx freq {freq} is out "
                      "of supported range").format(freq=format_freq(freq)))
@@ -1112,8 +1203,8 @@ class RadioFeatures:
 
         if mem.power and self.valid_power_levels:
             if self.has_variable_power:
-                if (mem.power < min(self.valid_power_levels) or
-                        mem.power > max(self.valid_power_levels)):
+                if (mem.power < index.min_power or
+                        mem.power > index.max_power):
                     msg = ValidationWarning(
                         "Power level %s is out of radio's range" % mem.power)
                     msgs.append(msg)
@@ -1123,23 +1214,72 @@ class RadioFeatures:
                         "Power level %s not supported" % mem.power)
                     msgs.append(msg)
 
-        if self.valid_tuning_steps and not self.has_nostep_tuning:
+        if index.tuning_steps and not self.has_nostep_tuning:
             try:
                 required_step(mem.freq, self.valid_tuning_steps)
             except errors.InvalidDataError as e:
                 msgs.append(ValidationError(e))
 
         if self.valid_characters:
-            for char in mem.name:
-                if char not in self.valid_characters:
-                    msgs.append(ValidationWarning("Name character " +
-                                                  "`%s'" % char +
-                                                  " not supported"))
-                    break
+            # Deleting all the valid characters leaves the invalid ones,
+            # in order
+            invalid = mem.name.translate(index.characters)
+            if invalid:
+                msgs.append(ValidationWarning("Name character " +
+                                              "`%s'" % invalid[0] +
+                                              " not supported"))
 
         return msgs
 
 
+def _lookup_set(values):
+    try:
+        return frozenset(values)
+    except TypeError:
+        # Not hashable, so fall back to scanning the list
+        return values
+
+
+class _FeatureIndex:
+    """Lookup tables for validating many memories against a RadioFeatures.
+
+    These are built from the feature lists once, instead of scanning each
+    list for every memory.
+    """
+    def __init__(self, rf):
+        self.special_chans = _lookup_set(rf.valid_special_chans)
+        self.modes = _lookup_set(rf.valid_modes)
+        self.tmodes = _lookup_set(rf.valid_tmodes)
+        self.cross_modes = _lookup_set(rf.valid_cross_modes)
+        self.tones = _lookup_set(rf.valid_tones)
+        self.dtcs_pols = _lookup_set(rf.valid_dtcs_pols)
+        self.dtcs_codes = _lookup_set(rf.valid_dtcs_codes)
+        self.duplexes = _lookup_set(rf.valid_duplexes)
+        self.tuning_steps = _lookup_set(rf.valid_tuning_steps)
+        self.characters = str.maketrans('', '', rf.valid_characters)
+
+        if rf.has_variable_power and rf.valid_power_levels:
+            self.min_power = min(rf.valid_power_levels)
+            self.max_power = max(rf.valid_power_levels)
+
+        # Merge the bands into sorted, non-overlapping [lo, hi) ranges
+        # so a frequency can be found with a binary search
+        self.band_starts = []
+        self.band_ends = []
+        for lo, hi in sorted(rf.valid_bands):
+            if lo >= hi:
+                continue
+            if self.band_ends and lo <= self.band_ends[-1]:
+                self.band_ends[-1] = max(hi, self.band_ends[-1])
+            else:
+                self.band_starts.append(lo)
+                self.band_ends.append(hi)
+
+    def in_band(self, freq):
+        i = bisect.bisect_right(self.band_starts, freq) - 1
+        return i >= 0 and freq < self.band_ends[i]
+
+
 class ValidationMessage(str):
     """Base class for Validation Errors and Warnings"""
     pass
@@ -1228,8 +1368,24 @@ class Radio(Alias):
         self.set_memory(mem)
 
     def get_memories(self, lo=None, hi=None):
-        """Get all the memories between @lo and @hi"""
-        pass
+        """Get all the memories between @lo and @hi, inclusive
+
+        Returns a list of Memory objects, exactly as get_memory() would for
+        each location. If not specified, @lo and @hi default to the
+        radio's memory_bounds.
+
+        The default implementation calls get_memory() for each location.
+        Drivers that can fetch a range of memories more efficiently (such
+        as by decoding a contiguous range of their memory map, or
+        pipelining commands to a live radio) should override this.
+        """
+        if lo is None or hi is None:
+            bounds = self.get_features().memory_bounds
+            if lo is None:
+                lo = bounds[0]
+            if hi is None:
+                hi = bounds[1]
+        return [self.get_memory(number) for number in range(lo, hi + 1)]
 
     def set_memory(self, memory):
         """Set the memory object @memory
@@ -1244,6 +1400,17 @@ class Radio(Alias):
         """
         pass
 
+    def set_memories(self, memories):
+        """Set each of the memory objects in @memories, in order
+
+        This must behave exactly like calling set_memory() for each one,
+        and stops at the first exception. The default implementation does
+        just that; drivers that can store several memories more efficiently
+        should override this.
+        """
+        for memory in memories:
+            self.set_memory(memory)
+
     def get_mapping_models(self):
         """Returns a list of MappingModel objects (or an empty list)"""
         if hasattr(self, "get_bank_model"):
@@ -1277,6 +1444,17 @@ class Radio(Alias):
         rf = self.get_features()
         return rf.validate_memory(mem)
 
+    def validate_memories(self, mems):
+        """Return a list of warnings and errors for each of @mems, as
+        validate_memory() would for each one.
+
+        Radios that do not add their own checks in validate_memory() get
+        all of @mems checked against a single get_features() in one pass.
+        """
+        if type(self).validate_memory is Radio.validate_memory:
+            return self.get_features().validate_memories(mems)
+        return [self.validate_memory(mem) for mem in mems]
+
     def get_settings(self):
         """Returns a RadioSettings list containing one or more
         RadioSettingGroup or RadioSetting objects. These represent general
@@ -1457,6 +1635,7 @@ class CloneModeRadio(FileBackedRadio, ExternalMemoryProperties,
 
     def save(self, filename):
         """Save the radio's memory map to @filename"""
+        self._detach_mmap()
         self.save_mmap(filename)
 
     def load(self, filename):
@@ -1468,12 +1647,16 @@ class CloneModeRadio(FileBackedRadio, ExternalMemoryProperties,
         pass
 
     @classmethod
-    def _strip_metadata(cls, raw_data):
-        try:
-            idx = raw_data.index(cls.MAGIC)
-        except ValueError:
+    def _find_metadata(cls, raw_data):
+        """Return the offset and contents of the metadata blob in @raw_data
+
+        The blob is appended to the image, so search for it from the tail.
+        The offset is None if there is no blob.
+        """
+        idx = raw_data.rfind(cls.MAGIC)
+        if idx < 0:
             LOG.debug('Image data has no metadata blob')
-            return raw_data, {}
+            return None, {}
 
         # Find the beginning of the base64 blob
         raw_metadata = raw_data[idx + len(cls.MAGIC):]
@@ -1488,6 +1671,13 @@ class CloneModeRadio(FileBackedRadio, ExternalMemoryProperties,
         if metadata:
             LOG.debug('Loaded metadata: %s' % metadata)
 
+        return idx, metadata
+
+    @classmethod
+    def _strip_metadata(cls, raw_data):
+        idx, metadata = cls._find_metadata(raw_data)
+        if idx is None:
+            return raw_data, {}
         return raw_data[:idx], metadata
 
     def _make_metadata(self):
@@ -1508,26 +1698,43 @@ class CloneModeRadio(FileBackedRadio, ExternalMemoryProperties,
 
     def load_mmap(self, filename):
         """Load the radio's memory map from @filename"""
-        mapfile = open(filename, "rb")
-        data = mapfile.read()
-        if self.MAGIC in data:
-            data, self._metadata = self._strip_metadata(data)
+        mapping = None
+        if not self.NEEDS_COMPAT_SERIAL:
+            mapping = memmap.map_file(filename)
+        if mapping is not None:
+            data = mapping
+        else:
+            with open(filename, "rb") as mapfile:
+                data = mapfile.read()
+        size, metadata = self._find_metadata(data)
+        if size is not None:
+            self._metadata = metadata
             if ('chirp_version' in self._metadata and
                     is_version_newer(self._metadata.get('chirp_version'))):
                 LOG.warning('Image is from version %s but we are %s' % (
                     self._metadata.get('chirp_version'), CHIRP_VERSION))
-        if self.NEEDS_COMPAT_SERIAL:
-            self._mmap = memmap.MemoryMap(data)
         else:
-            self._mmap = memmap.MemoryMapBytes(bytes(data))
-        mapfile.close()
+            size = len(data)
+        if mapping is not None:
+            self._mmap = memmap.MappedMemoryMap(mapping, size)
+        elif self.NEEDS_COMPAT_SERIAL:
+            self._mmap = memmap.MemoryMap(data[:size])
+        else:
+            self._mmap = memmap.MemoryMapBytes(data[:size])
         self.process_mmap()
 
+    def _detach_mmap(self):
+        # Make sure we are not about to rewrite the file that is backing
+        # our memory map
+        if isinstance(self._mmap, memmap.MappedMemoryMap):
+            self._mmap.detach()
+
     def save_mmap(self, filename):
         """
         try to open a file and write to it
         If IOError raise a File Access Error Exception
         """
+        self._detach_mmap()
         try:
             mapfile = open(filename, "wb")
             mapfile.write(self._mmap.get_byte_compatible().get_packed())
@@ -1633,6 +1840,8 @@ class Status:
     msg = "Unknown"
     max = 100
     cur = 0
+    # Achieved transfer rate in bytes per second, if known
+    rate = None
 
     def __str__(self):
         try:
@@ -1643,6 +1852,9 @@ class Status:
             pct = 0.0
             ticks = "?" * 10
 
+        if self.rate:
+            return "|%-10s| %2.1f%% %s (%i B/s)" % (
+                ticks, pct, self.msg, self.rate)
         return "|%-10s| %2.1f%% %s" % (ticks, pct, self.msg)
 
 
@@ -1697,73 +1909,95 @@ def make_is(stephz):
     return validator
 
 
-def required_step(freq, allowed=None):
-    """Returns the simplest tuning step that is required to reach @freq"""
-    if allowed is None:
-        allowed = [5.0, 10.0, 12.5, 6.25, 2.5, 8.33]
-
-    # These should be in order of most common to least common
-    steps = {
-        5.0: make_is(5000),
-        10.0: make_is(10000),
-        12.5: make_is(12500),
-        6.25: make_is(6250),
-        2.5: make_is(2500),
-        1.0: make_is(1000),
-        0.5: make_is(500),
-        0.25: make_is(250),
-        8.33: is_8_33,
-    }
+# Each tuning step and how to tell if a frequency is reachable with it:
+# (step, modulus, remainders). These should be in order of most common
+# to least common, since the first match wins.
+_STEP_TABLE = (
+    (5.0, 5000, (0,)),
+    (10.0, 10000, (0,)),
+    (12.5, 12500, (0,)),
+    (6.25, 6250, (0,)),
+    (2.5, 2500, (0,)),
+    (1.0, 1000, (0,)),
+    (0.5, 500, (0,)),
+    (0.25, 250, (0,)),
+    (8.33, 25000, (0, 8330, 16660)),
+)
+_DEFAULT_STEPS = (5.0, 10.0, 12.5, 6.25, 2.5, 8.33)
+# How many distinct (freq, allowed) results to remember
+STEP_CACHE_SIZE = 16384
 
-    for step, validate in steps.items():
-        if step in allowed and validate(freq):
-            return step
 
-    raise errors.InvalidDataError("Unable to find a supported " +
-                                  "tuning step for %s" % format_freq(freq))
+@functools.lru_cache(maxsize=None)
+def _step_table(allowed):
+    return tuple(entry for entry in _STEP_TABLE if entry[0] in allowed)
 
 
-def fix_rounded_step(freq):
-    """Some radios imply the last bit of 12.5 kHz and 6.25 kHz step
-    frequencies. Take the base @freq and return the corrected one"""
-    try:
-        required_step(freq)
-        return freq
-    except errors.InvalidDataError:
-        pass
+@functools.lru_cache(maxsize=STEP_CACHE_SIZE)
+def _required_step(freq, allowed):
+    for step, modulus, remainders in _step_table(allowed):
+        if freq % modulus in remainders:
+            return step
+    return None
 
-    try:
-        required_step(freq + 500)
-        return freq + 500
-    except errors.InvalidDataError:
-        pass
 
-    try:
-        required_step(freq + 250)
-        return freq + 250
-    except errors.InvalidDataError:
-        pass
+def required_step(freq, allowed=None):
+    """Returns the simplest tuning step that is required to reach @freq"""
+    if allowed is None:
+        allowed = _DEFAULT_STEPS
+    elif not isinstance(allowed, tuple):
+        allowed = tuple(allowed)
 
     try:
-        required_step(freq + 750)
-        return float(freq + 750)
-    except errors.InvalidDataError:
-        pass
+        step = _required_step(freq, allowed)
+    except TypeError:
+        # Not hashable, so it cannot be cached
+        step = _required_step.__wrapped__(freq, allowed)
+    if step is None:
+        raise errors.InvalidDataError("Unable to find a supported " +
+                                      "tuning step for %s" % format_freq(freq))
+    return step
+
+
+# This returns @freq itself when it needs no fixing, so int and float
+# arguments must be cached separately
+@functools.lru_cache(maxsize=STEP_CACHE_SIZE, typed=True)
+def _fix_rounded_step(freq):
+    if _required_step(freq, _DEFAULT_STEPS):
+        return freq
+    for delta in (500, 250):
+        if _required_step(freq + delta, _DEFAULT_STEPS):
+            return freq + delta
+    for delta in (750, 330, 660):
+        if _required_step(freq + delta, _DEFAULT_STEPS):
+            return float(freq + delta)
+    return None
 
-    try:
-        required_step(freq + 330)
-        return float(freq + 330)
-    except errors.InvalidDataError:
-        pass
 
+def fix_rounded_step(freq):
+    """Some radios imply the last bit of 12.5 kHz and 6.25 kHz step
+    frequencies. Take the base @freq and return the corrected one"""
     try:
-        required_step(freq + 660)
-        return float(freq + 660)
-    except errors.InvalidDataError:
-        pass
-
-    raise errors.InvalidDataError("Unable to correct rounded frequency " +
-                                  format_freq(freq))
+        fixed = _fix_rounded_step(freq)
+    except TypeError:
+        # Not hashable, so it cannot be cached
+        fixed = _fix_rounded_step.__wrapped__(freq)
+    if fixed is None:
+        raise errors.InvalidDataError("Unable to correct rounded frequency " +
+                                      format_freq(freq))
+    return fixed
+
+
+def step_cache_info():
+    """Return the hit/miss statistics of the tuning step caches"""
+    return {'required_step': _required_step.cache_info(),
+            'fix_rounded_step': _fix_rounded_step.cache_info()}
+
+
+def step_cache_clear():
+    """Empty the tuning step caches"""
+    _required_step.cache_clear()
+    _fix_rounded_step.cache_clear()
 
 
 def _name(name, len, just_upper):
@@ -22,9 +22,8 @@ import argparse
 import logging
 
 from chirp import logger
-from chirp import chirp_common, errors, directory, util
-
-directory.import_drivers()
+from chirp import chirp_common, errors, directory, startup_profile, util
+from chirp import serial_session
 
 LOG = logging.getLogger("chirpc")
 RADIOS = directory.DRV_TO_RADIO
@@ -93,11 +92,21 @@ def parse_memory_number(radio, args):
 
 
 def main(args=None):
+    # Start before loading the drivers, if asked to
+    startup_profile.start_from_argv(args)
+    startup_profile.watch_output()
+    with startup_profile.span('import_drivers'):
+        directory.import_drivers()
+
     parser = argparse.ArgumentParser()
     logger.add_version_argument(parser)
+    startup_profile.add_argument(parser)
     parser.add_argument("-s", "--serial", dest="serial",
                         default="mmap",
-                        help="Serial port (default: mmap)")
+                        help=("Serial port (default: mmap), or "
+                              "replay:FILE to replay a recorded session"))
+    parser.add_argument("--record-serial", metavar="FILE",
+                        help="Record everything sent to and from the radio")
 
     parser.add_argument("--list-settings", action="store_true",
                         help="List settings")
@@ -105,7 +114,9 @@ def main(args=None):
     parser.add_argument("-i", "--id", dest="id",
                         default=False,
                         action="store_true",
-                        help="Request radio ID string")
+                        help=("Request radio ID string (with several "
+                              "comma-separated ports for -s, probe them "
+                              "all at once)"))
 
     memarg = parser.add_argument_group("Memory/Channel Options")
     memarg.add_argument("--list-mem", action="store_true",
@@ -198,7 +209,13 @@ def main(args=None):
 
     if options.id:
         from chirp import detect
-        md = detect.detect_icom_radio(options.serial)
+        ports = options.serial.split(',')
+        if len(ports) > 1:
+            found = detect.detect_radio(ports)
+            print("Port:\n%s" % found.port)
+            md = found.rclass
+        else:
+            md = detect.detect_icom_radio(options.serial)
         print("Model:\n%s" % md.MODEL)
         sys.exit(0)
 
@@ -221,12 +238,17 @@ def main(args=None):
             sys.exit(1)
     else:
         LOG.info("opening %s at %i" % (options.serial, rclass.BAUD_RATE))
-        if '://' in options.serial:
+        if options.serial.startswith(serial_session.REPLAY_PREFIX):
+            s = serial_session.ReplaySerial(
+                options.serial[len(serial_session.REPLAY_PREFIX):])
+        elif '://' in options.serial:
             s = serial.serial_for_url(options.serial, do_not_open=True)
             s.timeout = 0.5
             s.open()
         else:
             s = serial.Serial(port=options.serial, timeout=0.5)
+        if options.record_serial:
+            s = serial_session.RecordingSerial(s, options.record_serial)
 
     radio = rclass(s)
 
@@ -237,8 +259,7 @@ def main(args=None):
     if options.list_mem:
         rf = radio.get_features()
         start, end = rf.memory_bounds
-        for i in range(start, end + 1):
-            mem = radio.get_memory(i)
+        for mem in radio.get_memories(start, end):
             if mem.empty and not logger.is_visible(logging.INFO):
                 continue
             print(mem)
@@ -13,14 +13,49 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import serial
+import collections
+import concurrent.futures
 import logging
+import sys
+import threading
+import time
+
+import serial
 
 from chirp import chirp_common, errors, directory
-from chirp.drivers import ic9x_ll, icf, kenwood_live, icomciv
+from chirp.drivers import icf, kenwood_live, icomciv
 
 LOG = logging.getLogger(__name__)
 
+# The last radio found by detect_radio(), tried first next time
+LAST_DETECTED = None
+
+DetectResult = collections.namedtuple(
+    'DetectResult', 'port vendor rclass baudrate elapsed error')
+
+
+class DetectCancelled(errors.RadioError):
+    """Another port answered, so this probe was abandoned"""
+
+
+def _check_cancel(cancel):
+    if cancel is not None and cancel.is_set():
+        raise DetectCancelled('Detection cancelled')
+
+
+def _open_port(port, baudrate=None):
+    if '://' in port:
+        ser = serial.serial_for_url(port, do_not_open=True)
+        ser.timeout = 0.5
+        if baudrate:
+            ser.baudrate = baudrate
+        ser.open()
+    elif baudrate:
+        ser = serial.Serial(port=port, baudrate=baudrate, timeout=0.5)
+    else:
+        ser = serial.Serial(port=port, timeout=0.5)
+    return ser
+
 
 class DetectorRadio(chirp_common.Radio):
     """Minimal radio for model detection"""
@@ -39,10 +74,10 @@ def _icom_model_data_to_rclass(md):
             return rclass
 
     raise errors.RadioError("Unknown radio type %02x%02x%02x%02x" %
-                            (ord(md[0]), ord(md[1]), ord(md[2]), ord(md[3])))
+                            tuple(md[:4]))
 
 
-def _detect_icom_radio(ser):
+def _detect_icom_radio(ser, baudrate=None, cancel=None):
     # ICOM VHF/UHF Clone-type radios @ 9600 baud
 
     try:
@@ -52,18 +87,15 @@ def _detect_icom_radio(ser):
     except errors.RadioError as e:
         LOG.error("_detect_icom_radio: %s", e)
 
-    # ICOM IC-91/92 Live-mode radios @ 4800/38400 baud
+    # ICOM CI/V Radios @ various bauds, starting with the one that last
+    # worked if we know it
 
-    ser.baudrate = 4800
-    try:
-        ic9x_ll.send_magic(ser)
-        return _icom_model_data_to_rclass("ic9x")
-    except errors.RadioError:
-        pass
-
-    # ICOM CI/V Radios @ various bauds
-
-    for rate in [9600, 4800, 19200]:
+    rates = [9600, 4800, 19200]
+    if baudrate in rates:
+        rates.remove(baudrate)
+        rates.insert(0, baudrate)
+    for rate in rates:
+        _check_cancel(cancel)
         try:
             ser.baudrate = rate
             return icomciv.probe_model(ser)
@@ -75,22 +107,19 @@ def _detect_icom_radio(ser):
     raise errors.RadioError("Unable to get radio model")
 
 
-def detect_icom_radio(port):
-    """Detect which Icom model is connected to @port"""
-    if '://' in port:
-        ser = serial.serial_for_url(port, do_not_open=True)
-        ser.timeout = 0.5
-        ser.open()
-    else:
-        ser = serial.Serial(port=port, timeout=0.5)
-
+def _probe_icom(port, baudrate=None, cancel=None):
+    """Return the Icom class and baudrate that answered on @port"""
+    ser = _open_port(port)
     try:
-        result = _detect_icom_radio(ser)
-    except Exception:
+        result = _detect_icom_radio(ser, baudrate, cancel)
+        return result, ser.baudrate
+    finally:
         ser.close()
-        raise
 
-    ser.close()
+
+def detect_icom_radio(port):
+    """Detect which Icom model is connected to @port"""
+    result, _baudrate = _probe_icom(port)
 
     LOG.info("Auto-detected %s %s on %s" %
              (result.VENDOR, result.MODEL, port))
@@ -98,17 +127,18 @@ def detect_icom_radio(port):
     return result
 
 
-def detect_kenwoodlive_radio(port):
-    """Detect which Kenwood model is connected to @port"""
-    if '://' in port:
-        ser = serial.serial_for_url(port, do_not_open=True)
-        ser.timeout = 0.5
-        ser.open()
-    else:
-        ser = serial.Serial(port=port, baudrate=9600, timeout=0.5)
-
-    r_id = kenwood_live.get_id(ser)
-    ser.close()
+def _probe_kenwoodlive(port, baudrate=None, cancel=None):
+    """Return the Kenwood class and baudrate that answered on @port"""
+    _check_cancel(cancel)
+    ser = _open_port(port, baudrate=9600)
+    try:
+        r_id = kenwood_live.get_id(ser, baudrate, cancel)
+        baudrate = ser.baudrate
+    except errors.RadioError:
+        _check_cancel(cancel)
+        raise
+    finally:
+        ser.close()
 
     models = {}
     for rclass in list(directory.DRV_TO_RADIO.values()):
@@ -116,12 +146,117 @@ def detect_kenwoodlive_radio(port):
             models[rclass.MODEL] = rclass
 
     if r_id in list(models.keys()):
-        return models[r_id]
+        return models[r_id], baudrate
     else:
         raise errors.RadioError("Unsupported model `%s'" % r_id)
 
 
+def detect_kenwoodlive_radio(port):
+    """Detect which Kenwood model is connected to @port"""
+    return _probe_kenwoodlive(port)[0]
+
+
 DETECT_FUNCTIONS = {
     "Icom":    detect_icom_radio,
     "Kenwood": detect_kenwoodlive_radio,
 }
+
+PROBE_FUNCTIONS = {
+    "Icom":    _probe_icom,
+    "Kenwood": _probe_kenwoodlive,
+}
+
+
+class MultiPortDetector:
+    """Look for a radio on several serial ports at once
+
+    Each port is probed on its own thread, one vendor after another. The
+    first port to answer wins and is returned right away, while the other
+    probes are abandoned at their next step. Every probe that ran is
+    recorded in @probes with how long it took, in the order they finished,
+    so those may still be arriving after detect() returns.
+    """
+    def __init__(self, ports, vendors=None, max_workers=8):
+        self.ports = list(ports)
+        self.vendors = list(vendors or PROBE_FUNCTIONS)
+        self.max_workers = max_workers
+        self.probes = []
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+
+    def _probe(self, port, vendor, baudrate=None):
+        start = time.monotonic()
+        rclass = error = None
+        try:
+            rclass, baudrate = PROBE_FUNCTIONS[vendor](port, baudrate,
+                                                       self._cancel)
+        except Exception as e:
+            error = e
+        result = DetectResult(port, vendor, rclass, baudrate,
+                              time.monotonic() - start, error)
+        with self._lock:
+            self.probes.append(result)
+        LOG.info('Probe for %s on %s took %.2fs: %s', vendor, port,
+                 result.elapsed, rclass and rclass.MODEL or error)
+        return result
+
+    def _probe_port(self, port):
+        for vendor in self.vendors:
+            if self._cancel.is_set():
+                break
+            result = self._probe(port, vendor)
+            if result.rclass:
+                return result
+
+    def detect(self):
+        """Return the DetectResult for the radio found, or raise
+        RadioError if no port answered"""
+        global LAST_DETECTED
+
+        # Drivers are looked up from the probe threads, so make sure they
+        # are all imported up front
+        directory.DRV_TO_RADIO.load_all()
+
+        last = LAST_DETECTED
+        if last and last.port in self.ports and last.vendor in self.vendors:
+            result = self._probe(last.port, last.vendor, last.baudrate)
+            if result.rclass:
+                return result
+
+        found = None
+        workers = max(1, min(self.max_workers, len(self.ports)))
+        pool = concurrent.futures.ThreadPoolExecutor(workers)
+        futures = []
+        try:
+            futures = [pool.submit(self._probe_port, port)
+                       for port in self.ports]
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                if result:
+                    found = result
+                    self._cancel.set()
+                    break
+        finally:
+            # Do not wait for the probes still running, they give up at
+            # their next step
+            if sys.version_info >= (3, 9):
+                pool.shutdown(wait=False, cancel_futures=True)
+            else:
+                for future in futures:
+                    future.cancel()
+                pool.shutdown(wait=False)
+
+        if not found:
+            raise errors.RadioError('No radio found on %s' % (
+                ', '.join(self.ports)))
+
+        LAST_DETECTED = found
+        LOG.info("Auto-detected %s %s on %s at %s baud" % (
+            found.rclass.VENDOR, found.rclass.MODEL, found.port,
+            found.baudrate))
+        return found
+
+
+def detect_radio(ports, vendors=None):
+    """Detect the radio connected to any of @ports, probing in parallel"""
+    return MultiPortDetector(ports, vendors).detect()
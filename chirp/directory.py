@@ -14,12 +14,18 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import collections
 import glob
+import hashlib
+import heapq
+import importlib
+import json
 import os
 import logging
 import sys
+import zlib
 
-from chirp import chirp_common, errors
+from chirp import chirp_common, errors, memmap
 
 LOG = logging.getLogger(__name__)
 
@@ -53,7 +59,7 @@ def register(cls):
     """Register radio @cls with the directory"""
     global DRV_TO_RADIO
     ident = radio_class_id(cls)
-    if ident in list(DRV_TO_RADIO.keys()):
+    if DRV_TO_RADIO.is_loaded(ident):
         if ALLOW_DUPS:
             LOG.warn("Replacing existing driver id `%s'" % ident)
         else:
@@ -90,7 +96,218 @@ def detected_by(manager_class):
     return wrapper
 
 
-DRV_TO_RADIO = {}
+DRIVER_INDEX = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'share', 'driver_index.json')
+DRIVER_INDEX_VERSION = 3
+
+
+def _driver_module(cls):
+    """Return the chirp.drivers module name that defines @cls, or None"""
+    package, _, module = cls.__module__.rpartition('.')
+    if package == 'chirp.drivers':
+        return module
+
+
+def _driver_kind(cls):
+    for kind, base in (('clone', chirp_common.CloneModeRadio),
+                       ('live', chirp_common.LiveRadio),
+                       ('network', chirp_common.NetworkSourceRadio),
+                       ('file', chirp_common.FileBackedRadio)):
+        if issubclass(cls, base):
+            return kind
+    return 'other'
+
+
+_size_match_model = chirp_common.CloneModeRadio.match_model.__func__
+
+
+def driver_entry(cls):
+    """Return the index entry describing radio class @cls"""
+    extensions = []
+    if getattr(cls, 'FILE_EXTENSION', None):
+        extensions.append(cls.FILE_EXTENSION)
+    memsize = getattr(cls, '_memsize', None)
+    match_model = getattr(getattr(cls, 'match_model', None), '__func__', None)
+    return {
+        'module': _driver_module(cls),
+        'class': cls.__name__,
+        'vendor': cls.VENDOR,
+        'model': cls.MODEL,
+        'variant': cls.VARIANT,
+        'aliases': [[a.VENDOR, a.MODEL, a.VARIANT] for a in cls.ALIASES],
+        'memsize': memsize if isinstance(memsize, int) else None,
+        'extensions': extensions,
+        'kind': _driver_kind(cls),
+        'detected': bool(getattr(cls, '_DETECTED_MODEL', False)),
+        'match_by_size': match_model is _size_match_model,
+        'requires': sorted(
+            {_driver_module(c) for c in getattr(cls, 'DETECTED_MODELS',
+                                                None) or []} -
+            {_driver_module(cls), None}),
+    }
+
+
+class DriverRegistry(dict):
+    """The mapping of driver ids to radio classes.
+
+    Drivers listed in the prebuilt index are not imported until something
+    asks for their class. Membership, keys() and len() are answered from
+    the index, values() and items() import everything first.
+    """
+    def __init__(self):
+        super().__init__()
+        self._index = {}
+        # Loaded drivers whose detected models live in modules that have
+        # not been imported yet
+        self._requires = {}
+        # Bumped whenever the set of drivers (not just what is imported)
+        # changes, so derived lookup tables know to rebuild
+        self.generation = 0
+        # Where each driver in the index registered when every module was
+        # imported, which is independent of what has been imported so far
+        self._order = {}
+
+    def set_order(self, idents):
+        """Record @idents as the order the drivers register in"""
+        self._order = {ident: i for i, ident in enumerate(idents)}
+        self.generation += 1
+
+    def registration_order(self):
+        """Return the driver ids in the order their modules register
+        them when all are imported, whether or not they have been"""
+        keys = self.keys()
+        unknown = len(self._order)
+        position = {ident: self._order.get(ident, unknown + i)
+                    for i, ident in enumerate(keys)}
+        return sorted(keys, key=position.__getitem__)
+
+    def defer(self, ident, entry):
+        """Register @ident as provided by the index @entry"""
+        if not dict.__contains__(self, ident):
+            self._index[ident] = entry
+            self.generation += 1
+
+    def is_loaded(self, ident):
+        return dict.__contains__(self, ident)
+
+    def get_entry(self, ident):
+        """Return the index entry for @ident without importing it"""
+        if ident in self._index:
+            return self._index[ident]
+        return driver_entry(dict.__getitem__(self, ident))
+
+    def _load(self, ident):
+        entry = self._index[ident]
+        importlib.import_module('chirp.drivers.%s' % entry['module'])
+        if self._index.pop(ident, None) is not None:
+            LOG.warning('Driver %s was not registered by module %s',
+                        ident, entry['module'])
+
+    def load_all(self):
+        """Import every deferred driver"""
+        for ident in list(self._index):
+            if ident in self._index:
+                self._load(ident)
+
+    def __getitem__(self, ident):
+        if ident in self._index:
+            self._load(ident)
+        for module in self._requires.pop(ident, []):
+            importlib.import_module('chirp.drivers.%s' % module)
+        return super().__getitem__(ident)
+
+    def get(self, ident, default=None):
+        try:
+            return self[ident]
+        except KeyError:
+            return default
+
+    def __setitem__(self, ident, cls):
+        entry = self._index.pop(ident, None)
+        if entry is None:
+            self.generation += 1
+        elif entry['requires']:
+            # Imported by another module rather than through us
+            self._requires[ident] = entry['requires']
+        super().__setitem__(ident, cls)
+
+    def __delitem__(self, ident):
+        if self._index.pop(ident, None) is None:
+            super().__delitem__(ident)
+        self.generation += 1
+
+    def __contains__(self, ident):
+        return ident in self._index or super().__contains__(ident)
+
+    def keys(self):
+        return list(super().keys()) + list(self._index)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return super().__len__() + len(self._index)
+
+    def values(self):
+        self.load_all()
+        return super().values()
+
+    def items(self):
+        self.load_all()
+        return super().items()
+
+
+class DriverInfo:
+    """A radio model as offered to the user, known from its index entry"""
+    def __init__(self, ident, entry, alias=None):
+        self.ident = ident
+        self.entry = entry
+        self._alias = alias
+        self._class = None
+        if alias:
+            self.VENDOR, self.MODEL, self.VARIANT = alias
+        else:
+            self.VENDOR = entry['vendor']
+            self.MODEL = entry['model']
+            self.VARIANT = entry['variant']
+
+    def __repr__(self):
+        return '<DriverInfo %s %s %s>' % (self.VENDOR, self.MODEL,
+                                          self.VARIANT)
+
+    def get_class(self):
+        """Import the driver and return the radio class for this model"""
+        if self._class is None:
+            rclass = get_radio(self.ident)
+            if self._alias:
+                rclass = _alias_class(rclass, *self._alias)
+            self._class = rclass
+        return self._class
+
+
+def get_driver_infos(aliases=True):
+    """Return a DriverInfo for every registered model (and alias)"""
+    infos = []
+    for ident in DRV_TO_RADIO.keys():
+        entry = DRV_TO_RADIO.get_entry(ident)
+        infos.append(DriverInfo(ident, entry))
+        if aliases:
+            infos.extend(DriverInfo(ident, entry, tuple(alias))
+                         for alias in entry['aliases'])
+    return infos
+
+
+def _alias_class(rclass, vendor, model, variant):
+    class DynamicRadioAlias(rclass):
+        _orig_rclass = rclass
+        VENDOR = vendor
+        MODEL = model
+        VARIANT = variant
+
+    return DynamicRadioAlias
+
+
+DRV_TO_RADIO = DriverRegistry()
 RADIO_TO_DRV = {}
 AUX_FORMATS = set()
 
@@ -142,60 +359,210 @@ MODEL_COMPAT = {
 }
 
 
+class _DetectionIndex:
+    """Lookup tables for finding the driver of an image file
+
+    Built from the driver entries, so nothing is imported until a driver
+    is actually a candidate for the file in question.
+    """
+    def __init__(self, registry):
+        self.generation = registry.generation
+        # (vendor, model, variant) and (vendor, model) to (ident, alias)
+        self.by_model = {}
+        # Drivers that only match on size, keyed by that size, and those
+        # whose match_model() must be asked, all in registration order so
+        # that the first to claim an image is the one that always has
+        self.by_size = collections.defaultdict(list)
+        self.custom = []
+        for order, ident in enumerate(registry.registration_order()):
+            entry = registry.get_entry(ident)
+            if entry['kind'] not in ('clone', 'file'):
+                continue
+            primary = (entry['vendor'], entry['model'], entry['variant'])
+            for alias in [tuple(a) for a in entry['aliases']] + [None]:
+                key = alias or primary
+                self.by_model.setdefault(key, (ident, alias))
+                self.by_model.setdefault(key[:2], (ident, alias))
+            if not entry['match_by_size']:
+                self.custom.append((order, ident))
+            elif entry['memsize']:
+                self.by_size[entry['memsize']].append((order, ident))
+
+    def candidates(self, size):
+        """Return the idents that might match an image of @size bytes"""
+        return [ident for order, ident in
+                heapq.merge(self.custom, self.by_size.get(size, []))]
+
+
+_DETECTION_INDEX = None
+# Recent image contents and the class that matched them (or None)
+_DETECTION_CACHE = collections.OrderedDict()
+DETECTION_CACHE_SIZE = 128
+
+
+def _detection_index():
+    global _DETECTION_INDEX
+    if (_DETECTION_INDEX is None or
+            _DETECTION_INDEX.generation != DRV_TO_RADIO.generation):
+        _DETECTION_INDEX = _DetectionIndex(DRV_TO_RADIO)
+        _DETECTION_CACHE.clear()
+    return _DETECTION_INDEX
+
+
+def _match_image(filedata, image_file):
+    """Return the class whose match_model() claims @filedata, or None"""
+    index = _detection_index()
+    # Drivers may look at the file extension as well as the contents
+    key = (hashlib.sha1(filedata).digest(), os.path.splitext(image_file)[1])
+    try:
+        _DETECTION_CACHE.move_to_end(key)
+        return _DETECTION_CACHE[key]
+    except KeyError:
+        pass
+
+    match = None
+    for ident in index.candidates(len(filedata)):
+        rclass = DRV_TO_RADIO[ident]
+        try:
+            if rclass.match_model(filedata, image_file):
+                match = rclass
+                break
+        except Exception as e:
+            LOG.error('Radio class %s failed during detection: %s' % (
+                rclass.__name__, e))
+
+    _DETECTION_CACHE[key] = match
+    while len(_DETECTION_CACHE) > DETECTION_CACHE_SIZE:
+        _DETECTION_CACHE.popitem(last=False)
+    return match
+
+
 def get_radio_by_image(image_file):
     """Attempt to get the radio class that owns @image_file"""
+    filedata = b""
+    metadata = {}
     if os.path.exists(image_file):
-        with open(image_file, "rb") as f:
-            filedata = f.read()
+        mapping = memmap.map_file(image_file)
+        if mapping is not None:
+            # Large image, so only look at the metadata blob at the tail
+            # unless we need the whole thing for match_model()
+            with mapping:
+                _, metadata = chirp_common.CloneModeRadio._find_metadata(
+                    mapping)
+                if not metadata:
+                    filedata = mapping[:]
+        else:
+            with open(image_file, "rb") as f:
+                filedata = f.read()
+            _, metadata = chirp_common.CloneModeRadio._find_metadata(
+                filedata)
+
+    if not metadata:
+        # If no metadata, we do the old thing
+        rclass = _match_image(filedata, image_file)
+        if rclass is None:
+            raise errors.ImageDetectFailed("Unknown file format")
+        return rclass(image_file)
+
+    meta_vendor = metadata.get('vendor')
+    meta_model = metadata.get('model')
+    meta_variant = metadata.get('variant')
+
+    meta_vendor, meta_model = MODEL_COMPAT.get((meta_vendor, meta_model),
+                                               (meta_vendor, meta_model))
+
+    # If metadata, then it has to match one of the aliases or the parent
+    if meta_variant is None:
+        key = (meta_vendor, meta_model)
     else:
-        filedata = b""
-
-    data, metadata = chirp_common.CloneModeRadio._strip_metadata(filedata)
-
-    for rclass in list(DRV_TO_RADIO.values()):
-        if not issubclass(rclass, chirp_common.FileBackedRadio):
-            continue
-
-        if not metadata:
-            # If no metadata, we do the old thing
-            try:
-                if rclass.match_model(filedata, image_file):
-                    return rclass(image_file)
-            except Exception as e:
-                LOG.error('Radio class %s failed during detection: %s' % (
-                    rclass.__name__, e))
-                pass
-
-        meta_vendor = metadata.get('vendor')
-        meta_model = metadata.get('model')
-        meta_variant = metadata.get('variant')
-
-        meta_vendor, meta_model = MODEL_COMPAT.get((meta_vendor, meta_model),
-                                                   (meta_vendor, meta_model))
-
-        # If metadata, then it has to match one of the aliases or the parent
-        for alias in rclass.ALIASES + [rclass]:
-            if (alias.VENDOR == meta_vendor and alias.MODEL == meta_model and
-                    (meta_variant is None or alias.VARIANT == meta_variant)):
-
-                class DynamicRadioAlias(rclass):
-                    _orig_rclass = rclass
-                    VENDOR = meta_vendor
-                    MODEL = meta_model
-                    VARIANT = metadata.get('variant')
-
-                return DynamicRadioAlias(image_file)
-
-    if metadata:
+        key = (meta_vendor, meta_model, meta_variant)
+    try:
+        ident, _alias = _detection_index().by_model[key]
+    except (KeyError, TypeError):
         ex = errors.ImageMetadataInvalidModel("Unsupported model %s %s" % (
             metadata.get("vendor"), metadata.get("model")))
         ex.metadata = metadata
         raise ex
-    else:
-        raise errors.ImageDetectFailed("Unknown file format")
 
+    return _alias_class(DRV_TO_RADIO[ident], meta_vendor, meta_model,
+                        meta_variant)(image_file)
+
+
+def _module_checksum(path):
+    with open(path, 'rb') as f:
+        return zlib.crc32(f.read())
+
+
+def load_driver_index(path=None):
+    """Load the prebuilt driver index, or return None if it is unusable"""
+    path = path or DRIVER_INDEX
+    try:
+        with open(path) as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        LOG.warning('Unable to read driver index %s: %s', path, e)
+        return None
+    if index.get('version') != DRIVER_INDEX_VERSION:
+        LOG.warning('Ignoring driver index version %s', index.get('version'))
+        return None
+    return index
+
+
+def build_driver_index():
+    """Import all the drivers and return an index suitable for DRIVER_INDEX"""
+    import_drivers(lazy=False)
+    drivers_base = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                'drivers')
+    # Modules that register nothing are included too, so they do not need
+    # to be imported at startup either
+    modules = {}
+    for driver_file in sorted(glob.glob(os.path.join(drivers_base, '*.py'))):
+        module = os.path.splitext(os.path.basename(driver_file))[0]
+        modules[module] = {'checksum': _module_checksum(driver_file),
+                           'depends': [],
+                           'formats': []}
+    # Everything is loaded, so this is the order they registered in
+    order = list(DRV_TO_RADIO.keys())
+    drivers = {}
+    for ident, rclass in sorted(DRV_TO_RADIO.items()):
+        module = _driver_module(rclass)
+        if module not in modules:
+            continue
+        drivers[ident] = entry = driver_entry(rclass)
+        info = modules[module]
+        # A module can only be deferred if everything its classes are
+        # built from is unchanged as well
+        depends = {_driver_module(c) for c in rclass.__mro__}
+        depends.update(entry['requires'])
+        depends.discard(module)
+        depends.discard(None)
+        info['depends'] = sorted(depends.union(info['depends']))
+    for name, pattern, readonly in sorted(AUX_FORMATS):
+        # Attribute each format to the module of the class declaring it
+        for rclass in DRV_TO_RADIO.values():
+            owner = next((c for c in rclass.__mro__
+                          if name in c.__dict__.get('FORMATS', [])), object)
+            if _driver_module(owner) in modules:
+                modules[_driver_module(owner)]['formats'].append(
+                    [name, pattern, readonly])
+                break
+        else:
+            LOG.warning('Format %s is not declared by any driver', name)
+    return {'version': DRIVER_INDEX_VERSION,
+            'modules': modules,
+            'drivers': drivers,
+            'order': [ident for ident in order if ident in drivers]}
+
+
+def import_drivers(limit=None, lazy=True):
+    """Import (or register from the driver index) all the drivers
 
-def import_drivers(limit=None):
+    If @limit is a list of module names, only those are imported. Unless
+    @lazy is False, modules whose source matches the driver index are not
+    imported until one of their radio classes is requested.
+    """
     frozen = getattr(sys, 'frozen', False)
     if sys.platform == 'win32' and frozen:
         # We are in a frozen win32 build, so we can not glob
@@ -211,12 +578,43 @@ def import_drivers(limit=None):
     # Safe import of everything in chirp/drivers. We need to import them
     # to get them to register, but should not abort if one import fails
     chirp_module_base = os.path.dirname(os.path.abspath(__file__))
-    driver_files = glob.glob(os.path.join(chirp_module_base,
-                                          'drivers',
-                                          '*.py'))
+    # Sorted, so drivers register in the same order everywhere
+    driver_files = sorted(glob.glob(os.path.join(chirp_module_base,
+                                                 'drivers',
+                                                 '*.py')))
+    index = load_driver_index() if lazy and not limit else None
+    current = {}
+    imports = []
     for driver_file in driver_files:
         module, ext = os.path.splitext(driver_file)
         driver_module = os.path.basename(module)
         if limit and driver_module not in limit:
             continue
-        __import__('chirp.drivers.%s' % driver_module)
+        info = index and index['modules'].get(driver_module)
+        if info and info['checksum'] == _module_checksum(driver_file):
+            current[driver_module] = info
+        else:
+            imports.append(driver_module)
+
+    # Modules built on something that changed since the index was made
+    # have to be imported to find out what they register now
+    deferred = set()
+    for driver_module, info in current.items():
+        if all(dep in current for dep in info['depends']):
+            deferred.add(driver_module)
+        else:
+            imports.append(driver_module)
+
+    if index:
+        LOG.debug('Deferring %i driver modules from the index, importing %i',
+                  len(deferred), len(imports))
+        DRV_TO_RADIO.set_order(index['order'])
+        for ident, entry in index['drivers'].items():
+            if entry['module'] in deferred:
+                DRV_TO_RADIO.defer(ident, entry)
+        for driver_module in deferred:
+            AUX_FORMATS.update(tuple(fmt)
+                               for fmt in current[driver_module]['formats'])
+
+    for driver_module in imports:
+        importlib.import_module('chirp.drivers.%s' % driver_module)
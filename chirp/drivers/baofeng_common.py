@@ -20,7 +20,7 @@ import time
 import struct
 import logging
 from chirp import chirp_common, memmap
-from chirp import errors, util
+from chirp import checkpoint, errors, util
 from chirp import bandplan_na
 from chirp.settings import RadioSettingGroup, RadioSetting, \
     RadioSettingValueBoolean, InternalError, \
@@ -290,41 +290,46 @@ def _download(radio):
         passes = 2
         end = radio._mem_size - radio._recv_block_size
 
-    data = b""
-    for i in range(0, passes):
-        if i == 1:
-            start = radio._mem_size - radio._recv_block_size
-            end = radio._mem_size
-            blocksize = 0x10
-
-        for addr in range(start, end, blocksize):
-            frame = _make_frame("S", addr, blocksize)
-            # DEBUG
-            LOG.info("Request sent:")
-            LOG.debug(util.hexprint(frame))
-
-            # sending the read request
-            _rawsend(radio, frame)
-
-            if radio._ack_block:
-                ack = _rawrecv(radio, 1)
-                if ack != b"\x06":
-                    raise errors.RadioError(
-                        "Radio refused to send block 0x%04x" % addr)
+    def _read(addr, blocksize):
+        frame = _make_frame("S", addr, blocksize)
+        # DEBUG
+        LOG.info("Request sent:")
+        LOG.debug(util.hexprint(frame))
 
-            # now we read
-            d = _recv(radio, addr, blocksize)
+        # sending the read request
+        _rawsend(radio, frame)
 
-            _rawsend(radio, b"\x06")
-            time.sleep(0.05)
+        if radio._ack_block:
+            ack = _rawrecv(radio, 1)
+            if ack != b"\x06":
+                raise errors.RadioError(
+                    "Radio refused to send block 0x%04x" % addr)
 
-            # aggregate the data
-            data += d
+        # now we read
+        d = _recv(radio, addr, blocksize)
 
-            # UI Update
-            status.cur = addr // blocksize
-            status.msg = "Cloning from radio..."
-            radio.status_fn(status)
+        _rawsend(radio, b"\x06")
+        time.sleep(0.05)
+        return d
+
+    data = b""
+    with checkpoint.DownloadCheckpoint(radio, ident + radio_ident) as ckpt:
+        for i in range(0, passes):
+            if i == 1:
+                start = radio._mem_size - radio._recv_block_size
+                end = radio._mem_size
+                blocksize = 0x10
+
+            for addr in range(start, end, blocksize):
+                # aggregate the data
+                data += ckpt.fetch(addr, blocksize,
+                                   lambda: _read(addr, blocksize))
+
+                # UI Update
+                status.cur = addr // blocksize
+                status.msg = "Cloning from radio..."
+                radio.status_fn(status)
+        ckpt.complete()
 
     data += ident
 
@@ -407,27 +412,33 @@ def _upload(radio):
     radio.status_fn(status)
 
     # the fun start here
+    mmap = radio.get_mmap()
     for start, end in _ranges:
         for addr in range(start, end, radio._send_block_size):
-            # sending the data
-            data = radio.get_mmap()[addr:addr + radio._send_block_size]
+            if mmap.is_dirty(addr, radio._send_block_size):
+                # sending the data
+                data = mmap[addr:addr + radio._send_block_size]
 
-            frame = _make_frame("X", addr, radio._send_block_size, data)
+                frame = _make_frame("X", addr, radio._send_block_size, data)
 
-            _rawsend(radio, frame)
-            time.sleep(0.05)
+                _rawsend(radio, frame)
+                time.sleep(0.05)
 
-            # receiving the response
-            ack = _rawrecv(radio, 1)
-            if ack != b"\x06":
-                msg = "Bad ack writing block 0x%04x" % addr
-                raise errors.RadioError(msg)
+                # receiving the response
+                ack = _rawrecv(radio, 1)
+                if ack != b"\x06":
+                    msg = "Bad ack writing block 0x%04x" % addr
+                    raise errors.RadioError(msg)
 
             # UI Update
             status.cur = addr // radio._send_block_size
             status.msg = "Cloning to radio..."
             radio.status_fn(status)
 
+    # The radio has everything we sent now
+    for start, end in _ranges:
+        mmap.clear_dirty(start, end - start)
+
 
 def _split(rf, f1, f2):
     """Returns False if the two freqs are in the same band (no split)
@@ -479,6 +490,7 @@ class BaofengCommonHT(chirp_common.CloneModeRadio,
             raise errors.RadioError('Unexpected error communicating '
                                     'with the radio')
         self._mmap = memmap.MemoryMapBytes(data)
+        self._mmap.clear_dirty()
         self.process_mmap()
 
     def sync_out(self):
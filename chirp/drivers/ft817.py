@@ -588,7 +588,7 @@ class FT817Radio(yaesu_clone.YaesuCloneModeRadio):
 
         for key in cur_mem.immutable:
             if key != "extd_number":
-                if cur_mem.__dict__[key] != mem.__dict__[key]:
+                if getattr(cur_mem, key) != getattr(mem, key):
                     raise errors.RadioError("Editing field `%s' " % key +
                                             "is not supported on this channel")
 
@@ -1179,7 +1179,7 @@ class FT817NDUSRadio(FT817Radio):
         cur_mem = self._get_special_60m(self.SPECIAL_MEMORIES_REV[mem.number])
 
         for key in cur_mem.immutable:
-            if cur_mem.__dict__[key] != mem.__dict__[key]:
+            if getattr(cur_mem, key) != getattr(mem, key):
                 raise errors.RadioError("Editing field `%s' " % key +
                                         "is not supported on M-60x channels")
 
@@ -298,7 +298,7 @@ class FT818NDUSRadio(FT818Radio):
         cur_mem = self._get_special_60m(self.SPECIAL_MEMORIES_REV[mem.number])
 
         for key in cur_mem.immutable:
-            if cur_mem.__dict__[key] != mem.__dict__[key]:
+            if getattr(cur_mem, key) != getattr(mem, key):
                 raise errors.RadioError("Editing field `%s' " % key +
                                         "is not supported on M-60x channels")
 
@@ -280,8 +280,17 @@ class CSVRadio(chirp_common.FileBackedRadio):
     def load_mmap(self, filename):
         return self.load(filename)
 
-    def get_memories(self, lo=0, hi=999):
-        return [x for x in self.memories if x.number >= lo and x.number <= hi]
+    def get_memories(self, lo=None, hi=None):
+        bounds = self.get_features().memory_bounds
+        if lo is None:
+            lo = bounds[0]
+        if hi is None:
+            hi = bounds[1]
+        for number in (lo, hi):
+            if not bounds[0] <= number <= bounds[1]:
+                raise errors.InvalidMemoryLocation(
+                    "No such memory %s" % number)
+        return [x.dupe() for x in self.memories[lo:hi + 1]]
 
     def get_memory(self, number):
         try:
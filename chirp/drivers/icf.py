@@ -106,7 +106,7 @@ class RadioStream:
     """A class to make reading a stream of IcfFrames easier"""
     def __init__(self, pipe):
         self.pipe = pipe
-        self.data = bytes()
+        self.data = bytearray()
         self.iecho = None
 
     def _process_frames(self):
@@ -122,7 +122,7 @@ class RadioStream:
             # Hispeed clone frames start with a pad of \xFE, so strip those
             # away until we have the two we expect
             while self.data.startswith(b'\xfe\xfe\xfe'):
-                self.data = self.data[1:]
+                del self.data[0]
 
             try:
                 cmd = self.data[4]
@@ -131,8 +131,8 @@ class RadioStream:
 
             try:
                 end = self.data.index(b'\xFD')
-                frame = IcfFrame.parse(self.data[:end + 1])
-                self.data = self.data[end + 1:]
+                frame = IcfFrame.parse(bytes(self.data[:end + 1]))
+                del self.data[:end + 1]
                 if frame.src == 0xEE and frame.dst == 0xEF:
                     # PC echo, ignore
                     if self.iecho is None:
@@ -538,6 +538,22 @@ def convert_model(mod_str):
     return data
 
 
+def _unhex(data):
+    """Convert hex digits to bytes, stopping at the first bad pair"""
+    try:
+        return bytes.fromhex(data)
+    except ValueError:
+        pass
+    result = bytearray()
+    for i in range(0, len(data) - 1, 2):
+        try:
+            result.append(int(data[i:i + 2], 16))
+        except ValueError as e:
+            LOG.debug("Failed to parse byte: %s" % e)
+            break
+    return bytes(result)
+
+
 def convert_data_line(line):
     """Convert an ICF data line to raw memory format"""
     if line.startswith("#"):
@@ -560,18 +576,7 @@ def convert_data_line(line):
         size = int(line[8:10], 16)
         data = line[10:]
 
-    _mmap = b""
-    i = 0
-    while i < (size * 2):
-        try:
-            val = int("%s%s" % (data[i], data[i+1]), 16)
-            i += 2
-            _mmap += struct.pack("B", val)
-        except ValueError as e:
-            LOG.debug("Failed to parse byte: %s" % e)
-            break
-
-    return _mmap
+    return _unhex(data[:size * 2])
 
 
 def read_file(filename):
@@ -585,7 +590,7 @@ def read_file(filename):
         'model': convert_model(mod_str.strip())
     }
 
-    _mmap = b""
+    _mmap = bytearray()
     for line in dat:
         if line.startswith("#"):
             try:
@@ -604,7 +609,7 @@ def read_file(filename):
             if 'recordsize' not in icfdata:
                 icfdata['recordsize'] = len(line_data)
 
-    return icfdata, memmap.MemoryMapBytes(_mmap)
+    return icfdata, memmap.MemoryMapBytes(bytes(_mmap))
 
 
 def _encode_model_for_icf(model):
@@ -13,13 +13,16 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import hashlib
+import json
 import threading
 import os
 import sys
 import time
 import logging
+import weakref
 
-from chirp import chirp_common, errors, directory, util
+from chirp import chirp_common, errors, directory, platform, util
 from chirp.settings import RadioSetting, RadioSettingGroup, \
     RadioSettingValueInteger, RadioSettingValueBoolean, \
     RadioSettingValueString, RadioSettingValueList, RadioSettings
@@ -54,10 +57,22 @@ RADIO_IDS = {
     "ID023": "TS-590S/SG_LiveMode"          # as SG
 }
 
-LOCK = threading.Lock()
 COMMAND_RESP_BUFSIZE = 8
 LAST_BAUD = 4800
-LAST_DELIMITER = ("\r", " ")
+# (command, argument) delimiters, in the order get_id() tries them
+DELIMITERS = [("\r", " "), (";", "")]
+# How many commands pipeline() sends before reading their responses,
+# unless the radio class has been tested with more, see _pipeline_depth
+PIPELINE_DEPTH = 1
+# Set CHIRP_PERSIST_CACHE in the environment to keep the memories read
+# from a radio between sessions, see MemoryCache. Only do that if nothing
+# but CHIRP changes the radio's memories, since edits made from the front
+# panel are only noticed if they happen to be in the sample checked when
+# the cache is used.
+PERSIST_CACHE = "CHIRP_PERSIST_CACHE" in os.environ
+# How many cached memories are read again to check the cache, see
+# KenwoodLiveRadio._checked_cache()
+CACHE_CHECK_COUNT = 8
 
 # The Kenwood TS-2000, TS-480, TS-590 & TS-850 use ";"
 # as a CAT command message delimiter, and all others use "\n".
@@ -65,63 +80,151 @@ LAST_DELIMITER = ("\r", " ")
 # fields, but others do.
 
 
-def _command(ser, cmd, *args):
-    """Send @cmd to radio via @ser"""
-    global LOCK, LAST_DELIMITER, COMMAND_RESP_BUFSIZE
+class _PortState(object):
+    """What we know about the radio on one serial port"""
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.delimiter = DELIMITERS[0]
+        # Anything read past the end of the last response
+        self.buffer = bytearray()
 
-    start = time.time()
 
-    # TODO: This global use of LAST_DELIMITER breaks reentrancy
-    # and needs to be fixed.
+_PORTS = weakref.WeakKeyDictionary()
+_PORTS_LOCK = threading.Lock()
+
+
+def _port(ser):
+    """Return the _PortState for @ser"""
+    with _PORTS_LOCK:
+        try:
+            state = _PORTS.get(ser)
+            if state is None:
+                state = _PORTS[ser] = _PortState()
+        except TypeError:
+            # Not something we can keep track of, so start afresh
+            state = _PortState()
+        return state
+
+
+def _send(ser, port, cmd, *args):
+    delimiter, separator = port.delimiter
     if args:
-        cmd += LAST_DELIMITER[1] + LAST_DELIMITER[1].join(args)
-    cmd += LAST_DELIMITER[0]
+        cmd += separator + separator.join(args)
+    cmd += delimiter
 
     LOG.debug("PC->RADIO: %s" % cmd.strip())
     ser.write(cmd.encode('cp1252'))
 
-    result = ""
-    while not result.endswith(LAST_DELIMITER[0]):
-        result += ser.read(COMMAND_RESP_BUFSIZE).decode('cp1252')
-        if (time.time() - start) > 1:  # TXH sometimes takes longer on TH-D7G
-            LOG.error("Timeout waiting for data")
-            break
 
-    if result.endswith(LAST_DELIMITER[0]):
+def _receive(ser, port, timeout):
+    """Return the next response and whether it arrived complete"""
+    delimiter = port.delimiter[0]
+    reader = util.PipeReader(ser)
+    reader.buffer = port.buffer
+    result = reader.read_until(delimiter.encode('cp1252'),
+                               timeout=timeout,
+                               chunk=COMMAND_RESP_BUFSIZE).decode('cp1252')
+
+    if not result.endswith(delimiter):
+        LOG.error("Timeout waiting for data")
+    if result.endswith(delimiter):
         LOG.debug("RADIO->PC: %r" % result.strip())
         result = result[:-1]
+        complete = True
     else:
         LOG.error("Giving up")
+        complete = False
+
+    return result.strip(), complete
+
 
-    return result.strip()
+def _command(ser, cmd, *args):
+    """Send @cmd to radio via @ser"""
+    start = time.time()
+    port = _port(ser)
+    _send(ser, port, cmd, *args)
+    # TXH sometimes takes longer on TH-D7G
+    return _receive(ser, port, 1 - (time.time() - start))[0]
 
 
 def command(ser, cmd, *args):
-    with LOCK:
+    with _port(ser).lock:
         return _command(ser, cmd, *args)
 
 
-def get_id(ser):
-    """Get the ID of the radio attached to @ser"""
+def pipeline(ser, commands, depth=None):
+    """Send each (cmd, *args) in @commands, returning the responses.
+
+    Commands are sent in groups of @depth without waiting for a response
+    in between, which saves a round trip to the radio for all but the
+    first in each group. If a response in a group goes missing we can not
+    tell which one it was, so the group is sent again a command at a
+    time, and any command in a group that gets an error (which may mean
+    the radio was busy) is sent again on its own. The commands must be
+    safe to repeat.
+    """
+    if depth is None:
+        depth = PIPELINE_DEPTH
+    port = _port(ser)
+    results = []
+    with port.lock:
+        for i in range(0, len(commands), depth):
+            group = commands[i:i + depth]
+            for cmd in group:
+                _send(ser, port, *cmd)
+            responses = []
+            for cmd in group:
+                result, complete = _receive(ser, port, 1)
+                if not complete:
+                    break
+                responses.append(result)
+            if len(group) == 1 and not responses:
+                # Just as command() would have
+                responses.append(result)
+            elif len(responses) < len(group):
+                LOG.warning("Lost a response to one of %i commands, "
+                            "sending them again one at a time", len(group))
+                del port.buffer[:]
+                try:
+                    ser.reset_input_buffer()
+                except (AttributeError, OSError) as e:
+                    LOG.debug('Unable to flush input: %s', e)
+                responses = [_command(ser, *cmd) for cmd in group]
+            elif len(group) > 1:
+                responses = [_command(ser, *cmd) if iserr(result) else result
+                             for cmd, result in zip(group, responses)]
+            results.extend(responses)
+    return results
+
+
+def get_id(ser, baudrate=None, cancel=None):
+    """Get the ID of the radio attached to @ser
+
+    The @baudrate (or the one that worked last time) is tried first. If
+    the @cancel event is set, give up before the next attempt.
+    """
     global LAST_BAUD
+    first = baudrate or LAST_BAUD
     bauds = [4800, 9600, 19200, 38400, 57600, 115200]
-    bauds.remove(LAST_BAUD)
-    # Make sure LAST_BAUD is last so that it is tried first below
-    bauds.append(LAST_BAUD)
+    if first in bauds:
+        bauds.remove(first)
+    # Make sure the first baud is last so that it is tried first below
+    bauds.append(first)
 
-    global LAST_DELIMITER
-    command_delimiters = [("\r", " "), (";", "")]
-
-    for delimiter in command_delimiters:
+    port = _port(ser)
+    for delimiter in DELIMITERS:
         # Process the baud options in reverse order so that we try the
         # last one first, and then start with the high-speed ones next
         for i in reversed(bauds):
-            LAST_DELIMITER = delimiter
+            if cancel is not None and cancel.is_set():
+                raise errors.RadioError("Cancelled")
+            port.delimiter = delimiter
             LOG.info("Trying ID at baud %i with delimiter \"%s\"" %
                      (i, repr(delimiter)))
             ser.baudrate = i
-            ser.write(LAST_DELIMITER[0].encode())
+            ser.write(delimiter[0].encode())
             ser.read(25)
+            del port.buffer[:]
             try:
                 resp = command(ser, "ID")
             except UnicodeDecodeError:
@@ -168,6 +271,82 @@ def iserr(result):
     return result in ["N", "?"]
 
 
+def cache_dir():
+    return platform.get_platform().config_file('kenwood_live_cache')
+
+
+class MemoryCache(object):
+    """The radio's responses for each memory read, kept between sessions.
+
+    Entries are keyed by the ID the radio reports and the port it is on,
+    which names a model rather than a particular radio, so nothing here is
+    trusted until a sample() of it has been read from the radio again and
+    matched. Entries are forgotten when CHIRP changes that memory, and the
+    whole cache after MAX_AGE.
+    """
+    # A cache this old may not match the radio any more
+    MAX_AGE = 3600
+
+    def __init__(self, radio_id, port):
+        self.key = '%s@%s' % (radio_id, port)
+        self.path = os.path.join(
+            cache_dir(),
+            hashlib.sha1(self.key.encode()).hexdigest() + '.json')
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            LOG.warning('Unable to read memory cache %s: %s', self.path, e)
+            return
+        if data.get('key') != self.key:
+            return
+        if time.time() - data.get('time', 0) > self.MAX_AGE:
+            LOG.debug('Memory cache for %s is stale', self.key)
+            return
+        self.entries = {int(k): v for k, v in data['memories'].items()}
+        LOG.debug('Loaded %i cached memories for %s',
+                  len(self.entries), self.key)
+
+    def get(self, number):
+        return self.entries.get(number)
+
+    def put(self, number, responses):
+        self.entries[number] = responses
+        self.dirty = True
+
+    def discard(self, number):
+        if self.entries.pop(number, None) is not None:
+            self.dirty = True
+
+    def clear(self):
+        if self.entries:
+            self.entries = {}
+            self.dirty = True
+
+    def sample(self, count):
+        """Return up to @count cached memory numbers, spread out over
+        all of them"""
+        numbers = sorted(self.entries)
+        step = max(1, len(numbers) // count)
+        return numbers[::step][:count]
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'w') as f:
+                json.dump({'key': self.key, 'time': time.time(),
+                           'memories': self.entries}, f)
+        except OSError as e:
+            LOG.warning('Unable to write memory cache %s: %s', self.path, e)
+        self.dirty = False
+
+
 class KenwoodLiveRadio(chirp_common.LiveRadio):
     """Base class for all live-mode Kenwood radios"""
     BAUD_RATE = 9600
@@ -183,11 +362,16 @@ class KenwoodLiveRadio(chirp_common.LiveRadio):
     _kenwood_split = False
     _kenwood_valid_tones = list(chirp_common.TONES)
     _has_name = True
+    # Commands to have outstanding when reading memories, see pipeline().
+    # Only set this for models that have been tested with it.
+    _pipeline_depth = None
 
     def __init__(self, *args, **kwargs):
         chirp_common.LiveRadio.__init__(self, *args, **kwargs)
 
         self._memcache = {}
+        self._persistent = None
+        self._cache_checked = False
 
         if self.pipe:
             self.pipe.timeout = 0.1
@@ -198,6 +382,10 @@ class KenwoodLiveRadio(chirp_common.LiveRadio):
 
             command(self.pipe, "AI", "0")
 
+            port = getattr(self.pipe, 'port', None)
+            if PERSIST_CACHE and not NOCACHE and isinstance(port, str):
+                self._persistent = MemoryCache(radio_id, port)
+
     def _cmd_get_memory(self, number):
         return "MR", "%i,0,%03i" % (self._vfo, number)
 
@@ -221,19 +409,124 @@ class KenwoodLiveRadio(chirp_common.LiveRadio):
     def get_raw_memory(self, number):
         return command(self.pipe, *self._cmd_get_memory(number))
 
-    def get_memory(self, number):
+    def _check_number(self, number):
         if number < 0 or number > self._upper:
             raise errors.InvalidMemoryLocation(
                 "Number must be between 0 and %i" % self._upper)
+
+    def get_memory(self, number):
+        self._check_number(number)
         if number in self._memcache and not NOCACHE:
             return self._memcache[number]
+        return self._read_memories([number])[number]
+
+    def get_memories(self, lo=None, hi=None):
+        if type(self).get_memory is not KenwoodLiveRadio.get_memory:
+            # This radio reads memories its own way
+            return super().get_memories(lo, hi)
+        bounds = self.get_features().memory_bounds
+        lo = bounds[0] if lo is None else lo
+        hi = bounds[1] if hi is None else hi
+        self._check_number(lo)
+        self._check_number(hi)
+
+        numbers = range(lo, hi + 1)
+        memories = self._read_memories(
+            [n for n in numbers if NOCACHE or n not in self._memcache])
+        return [memories.get(n) or self._memcache[n] for n in numbers]
+
+    def _read_memories(self, numbers):
+        """Read the memories at @numbers, sending the commands for all of
+        them in a pipeline, and return them by number"""
+        cache = self._checked_cache()
+        responses = {}
+        if cache:
+            for number in numbers:
+                cached = cache.get(number)
+                if cached:
+                    responses[number] = cached
+        todo = [n for n in numbers if n not in responses]
+        memories = {n: self._memory_from_responses(n, responses[n])
+                    for n in responses}
+        fetched, fresh = self._fetch_memories(todo)
+        responses.update(fetched)
+        memories.update(fresh)
+
+        if cache and todo:
+            for number in todo:
+                if "?" not in responses[number].values():
+                    cache.put(number, responses[number])
+            cache.save()
+
+        self._memcache.update(memories)
+        return memories
+
+    def _checked_cache(self):
+        """Return the persistent cache once some of it has been read from
+        the radio again and matched, or None if there is none"""
+        if not self._persistent or self._cache_checked:
+            return self._persistent
+        self._cache_checked = True
+        sample = self._persistent.sample(CACHE_CHECK_COUNT)
+        fetched, memories = self._fetch_memories(sample)
+        if any(fetched[n] != self._persistent.get(n) for n in sample):
+            LOG.info('Memory cache for %s does not match the radio, '
+                     'ignoring it', self._persistent.key)
+            self._persistent.clear()
+            self._persistent.save()
+        self._memcache.update(memories)
+        return self._persistent
+
+    def _fetch_memories(self, numbers):
+        """Read the memories at @numbers from the radio, returning the
+        responses and the memories by number"""
+        responses = {}
+        memories = {}
+        results = pipeline(self.pipe,
+                           [self._cmd_get_memory(n) for n in numbers],
+                           self._pipeline_depth)
+        for number, result in zip(numbers, results):
+            responses[number] = {"memory": result}
+            memories[number] = self._parse_memory(number, result)
+
+        if self._has_name:
+            named = [n for n in numbers if not memories[n].empty]
+            results = pipeline(self.pipe,
+                               [self._cmd_get_memory_name(n) for n in named],
+                               self._pipeline_depth)
+            for number, result in zip(named, results):
+                responses[number]["name"] = result
+                self._parse_memory_name(memories[number], result)
+
+        if self._kenwood_split:
+            split = [n for n in numbers
+                     if not memories[n].empty and memories[n].duplex == ""]
+            results = pipeline(self.pipe,
+                               [self._cmd_get_split(n) for n in split],
+                               self._pipeline_depth)
+            for number, result in zip(split, results):
+                responses[number]["split"] = result
+                if " " in result:
+                    value = result.split(" ", 1)[1]
+                    self._parse_split_spec(memories[number], value.split(","))
+        return responses, memories
+
+    def _memory_from_responses(self, number, responses):
+        """Build the memory at @number from the radio's responses to the
+        commands _read_memories() sent for it"""
+        mem = self._parse_memory(number, responses["memory"])
+        if "name" in responses:
+            self._parse_memory_name(mem, responses["name"])
+        if " " in responses.get("split", ""):
+            value = responses["split"].split(" ", 1)[1]
+            self._parse_split_spec(mem, value.split(","))
+        return mem
 
-        result = command(self.pipe, *self._cmd_get_memory(number))
+    def _parse_memory(self, number, result):
         if result == "N" or result == "E":
             mem = chirp_common.Memory()
             mem.number = number
             mem.empty = True
-            self._memcache[mem.number] = mem
             return mem
         elif " " not in result:
             LOG.error("Not sure what to do with this: `%s'" % result)
@@ -242,25 +535,15 @@ class KenwoodLiveRadio(chirp_common.LiveRadio):
         value = result.split(" ")[1]
         spec = value.split(",")
 
-        mem = self._parse_mem_spec(spec)
-        self._memcache[mem.number] = mem
-
-        if self._has_name:
-            result = command(self.pipe, *self._cmd_get_memory_name(number))
-            if " " in result:
-                value = result.split(" ", 1)[1]
-                if value.count(",") == 2:
-                    _zero, _loc, mem.name = value.split(",")
-                else:
-                    _loc, mem.name = value.split(",")
-
-        if mem.duplex == "" and self._kenwood_split:
-            result = command(self.pipe, *self._cmd_get_split(number))
-            if " " in result:
-                value = result.split(" ", 1)[1]
-                self._parse_split_spec(mem, value.split(","))
+        return self._parse_mem_spec(spec)
 
-        return mem
+    def _parse_memory_name(self, mem, result):
+        if " " in result:
+            value = result.split(" ", 1)[1]
+            if value.count(",") == 2:
+                _zero, _loc, mem.name = value.split(",")
+            else:
+                _loc, mem.name = value.split(",")
 
     def _make_mem_spec(self, mem):
         pass
@@ -275,10 +558,15 @@ class KenwoodLiveRadio(chirp_common.LiveRadio):
     def _make_split_spec(self, mem):
         return ("%011i" % mem.offset, "0")
 
+    def _forget(self, number):
+        """Drop what the persistent cache knows about @number"""
+        if self._persistent:
+            self._persistent.discard(number)
+            self._persistent.save()
+
     def set_memory(self, memory):
-        if memory.number < 0 or memory.number > self._upper:
-            raise errors.InvalidMemoryLocation(
-                "Number must be between 0 and %i" % self._upper)
+        self._check_number(memory.number)
+        self._forget(memory.number)
 
         spec = self._make_mem_spec(memory)
         spec = ",".join(spec)
@@ -309,6 +597,7 @@ class KenwoodLiveRadio(chirp_common.LiveRadio):
         if number not in self._memcache:
             return
 
+        self._forget(number)
         resp = command(self.pipe, *self._cmd_set_memory(number, ""))
         if iserr(resp):
             raise errors.RadioError("Radio refused delete of %i" % number)
@@ -1279,8 +1568,9 @@ class TS590Radio(KenwoodLiveRadio):
         mem.extra = RadioSettingGroup("extra", "Extra")
         # Read the base and split MR strings
         mem.number = number
-        spec0 = command(self.pipe, "MR0 %02i" % mem.number)
-        spec1 = command(self.pipe, "MR1 %02i" % mem.number)
+        spec0, spec1 = pipeline(self.pipe, [("MR0 %02i" % mem.number,),
+                                            ("MR1 %02i" % mem.number,)],
+                                self._pipeline_depth)
         mem.name = spec0[41:49]  # Max 8-Char Name if assigned
         mem.name = mem.name.strip()
         mem.name = mem.name.upper()
@@ -1468,8 +1758,9 @@ class TS480Radio(KenwoodLiveRadio):
         mem = chirp_common.Memory()
         # Read the base and split MR strings
         mem.number = number
-        spec0 = command(self.pipe, "MR0%03i" % mem.number)
-        spec1 = command(self.pipe, "MR1%03i" % mem.number)
+        spec0, spec1 = pipeline(self.pipe, [("MR0%03i" % mem.number,),
+                                            ("MR1%03i" % mem.number,)],
+                                self._pipeline_depth)
         # Add 1 to string idecis if referring to CAT manual
         mem.name = spec0[41:49]  # Max 8-Char Name if assigned
         mem.name = mem.name.strip()
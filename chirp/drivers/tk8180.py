@@ -19,6 +19,7 @@ import logging
 from collections import OrderedDict
 
 from chirp import chirp_common, directory, memmap, errors, util
+from chirp import checkpoint
 from chirp import bitwise
 from chirp.settings import RadioSettingGroup, RadioSetting
 from chirp.settings import RadioSettingValueBoolean, RadioSettingValueList
@@ -249,6 +250,7 @@ def do_ident(radio):
         if model == 'P3180':
             model += ' ' + variants.get(ident[5], '(Unknown)')
         raise errors.RadioError('Unsupported radio model %s' % model)
+    return ident
 
 
 def checksum_data(data):
@@ -259,7 +261,7 @@ def checksum_data(data):
 
 
 def do_download(radio):
-    do_ident(radio)
+    ident = do_ident(radio)
 
     data = bytes()
 
@@ -271,27 +273,23 @@ def do_download(radio):
         radio.status_fn(status)
         LOG.debug('Radio address 0x%04x' % len(data))
 
-    # Addresses 0x0000-0xBF00 pulled by block number (divide by 0x100)
-    for block in range(0, 0xBF + 1):
+    def read_numbered(block):
         send(radio, make_frame('R', block))
         cmd = radio.pipe.read(1)
         chunk = b''
         if cmd == b'Z':
-            data += bytes(b'\xff' * 256)
             LOG.debug('Radio reports empty block %02x' % block)
         elif cmd == b'W':
             chunk = bytes(radio.pipe.read(256))
             if len(chunk) != 256:
                 LOG.error('Received %i for block %02x' % (len(chunk), block))
                 raise errors.RadioError('Radio did not send block')
-            data += chunk
         else:
             LOG.error('Radio sent %r (%02x), expected W(0x57)' % (cmd,
                                                                   chr(cmd)))
             raise errors.RadioError('Radio sent unexpected response')
 
         LOG.debug('Read block index %02x' % block)
-        status()
 
         chksum = radio.pipe.read(1)
         if len(chksum) != 1:
@@ -309,22 +307,35 @@ def do_download(radio):
         radio.pipe.write(b'\x06')
         if radio.pipe.read(1) != b'\x06':
             raise errors.RadioError('Post-block exchange failed')
+        return chunk or bytes(b'\xff' * 256)
 
-    # Addresses 0xC000 - 0xD1F0 pulled by address
-    for block in range(0x0100, 0x1200, 0x40):
+    def read_addressed(block):
         send(radio, make_frame('S', block, b'\x40'))
         x = radio.pipe.read(1)
         if x != b'X':
             raise errors.RadioError('Radio did not send block')
         chunk = radio.pipe.read(0x40)
-        data += chunk
 
         LOG.debug('Read memory address %04x' % block)
-        status()
 
         radio.pipe.write(b'\x06')
         if radio.pipe.read(1) != b'\x06':
             raise errors.RadioError('Post-block exchange failed')
+        return chunk
+
+    with checkpoint.DownloadCheckpoint(radio, ident) as ckpt:
+        # Addresses 0x0000-0xBF00 pulled by block number (divide by 0x100)
+        for block in range(0, 0xBF + 1):
+            data += ckpt.fetch(len(data), 256,
+                               lambda: read_numbered(block))
+            status()
+
+        # Addresses 0xC000 - 0xD1F0 pulled by address
+        for block in range(0x0100, 0x1200, 0x40):
+            data += ckpt.fetch(len(data), 0x40,
+                               lambda: read_addressed(block))
+            status()
+        ckpt.complete()
 
     radio.pipe.write(b'E')
     if radio.pipe.read(1) != b'\x06':
@@ -346,6 +357,9 @@ def do_upload(radio):
 
     for block in range(0, 0xBF + 1):
         addr = block * 0x100
+        if not radio._mmap.is_dirty(addr, 0x100):
+            status(addr)
+            continue
         chunk = bytes(radio._mmap[addr:addr + 0x100])
         if all(byte == b'\xff' for byte in chunk):
             LOG.debug('Sending zero block %i, range 0x%04x' % (block, addr))
@@ -364,6 +378,9 @@ def do_upload(radio):
     addr_base = 0xC000
     for addr in range(addr_base, radio._memsize, 0x40):
         block_addr = addr - addr_base + 0x0100
+        if not radio._mmap.is_dirty(addr, 0x40):
+            status(addr)
+            continue
         chunk = radio._mmap[addr:addr + 0x40]
         send(radio, make_frame('X', block_addr, b'\x40' + chunk))
 
@@ -378,6 +395,7 @@ def do_upload(radio):
     radio.pipe.write(b'E')
     if radio.pipe.read(1) != b'\x06':
         raise errors.RadioError('Radio failed to acknowledge completion')
+    radio._mmap.clear_dirty()
 
 
 def reset(self):
@@ -412,6 +430,7 @@ class KenwoodTKx180Radio(chirp_common.CloneModeRadio):
         try:
             data = do_download(self)
             self._mmap = memmap.MemoryMapBytes(data)
+            self._mmap.clear_dirty()
         except errors.RadioError:
             reset(self)
             raise
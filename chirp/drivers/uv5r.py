@@ -21,6 +21,7 @@ import logging
 
 from chirp.drivers import baofeng_common as bfc
 from chirp import chirp_common, errors, util, directory, memmap
+from chirp import checkpoint
 from chirp import bitwise
 from chirp.settings import RadioSetting, RadioSettingGroup, \
     RadioSettingValueInteger, RadioSettingValueList, \
@@ -571,35 +572,46 @@ def _do_download(radio):
     LOG.info("Radio Version is %s" % repr(radio_version))
     LOG.info("Radio has dropped byte issue: %s" % repr(has_dropped_byte))
 
-    # Main block
-    LOG.debug("downloading main block...")
-    for i in range(0, 0x1800, 0x40):
-        data += _read_block(radio, i, 0x40, False)
-        _do_status(radio, "from", i)
-    _do_status(radio, "from", radio.get_memsize())
-    LOG.debug("done.")
-    if radio._aux_block:
-        if has_dropped_byte:
-            LOG.debug("downloading aux block...")
-            # Auxiliary block starts at 0x1ECO (?)
-            for i in range(0x1EC0, 0x1FC0, 0x40):
-                data += _read_block(radio, i, 0x40, False)
-            # Shift to 0x10 block sizes as a workaround for new radios that
-            # will drop byte 0x1FCF if the last 0x40 bytes are read using a
-            # 0x40 block size
-            for i in range(0x1FC0, 0x2000, 0x10):
-                data += _read_block(radio, i, 0x10, False)
-        else:
-            # Retain 0x40 byte block download for legacy radios (the
-            # 'original' radios with firmware versions prior to BFB291 do not
-            # support reading the Aux memory are with 0x10 bytes blocks.
-            LOG.debug("downloading aux block...")
-            # Auxiliary block starts at 0x1ECO (?)
-            for i in range(0x1EC0, 0x2000, 0x40):
-                data += _read_block(radio, i, 0x40, False)
+    ckpt = checkpoint.DownloadCheckpoint(radio, data + radio_version)
+
+    def _read(start, size):
+        return ckpt.fetch(start, size,
+                          lambda: _read_block(radio, start, size, False))
+
+    with ckpt:
+        # Main block
+        LOG.debug("downloading main block...")
+        for i in range(0, 0x1800, 0x40):
+            data += _read(i, 0x40)
+            _do_status(radio, "from", i)
+        _do_status(radio, "from", radio.get_memsize())
+        LOG.debug("done.")
+        if radio._aux_block:
+            if has_dropped_byte:
+                LOG.debug("downloading aux block...")
+                # Auxiliary block starts at 0x1ECO (?)
+                for i in range(0x1EC0, 0x1FC0, 0x40):
+                    data += _read(i, 0x40)
+                # Shift to 0x10 block sizes as a workaround for new radios
+                # that will drop byte 0x1FCF if the last 0x40 bytes are read
+                # using a 0x40 block size
+                for i in range(0x1FC0, 0x2000, 0x10):
+                    data += _read(i, 0x10)
+            else:
+                # Retain 0x40 byte block download for legacy radios (the
+                # 'original' radios with firmware versions prior to BFB291
+                # do not support reading the Aux memory are with 0x10 bytes
+                # blocks.
+                LOG.debug("downloading aux block...")
+                # Auxiliary block starts at 0x1ECO (?)
+                for i in range(0x1EC0, 0x2000, 0x40):
+                    data += _read(i, 0x40)
+        ckpt.complete()
 
     LOG.debug("done.")
-    return memmap.MemoryMapBytes(data)
+    mmap = memmap.MemoryMapBytes(data)
+    mmap.clear_dirty()
+    return mmap
 
 
 def _send_block(radio, addr, data):
@@ -729,10 +741,14 @@ def _do_upload(radio):
     mmap = radio.get_mmap().get_byte_compatible()
     for start_addr, end_addr in ranges_main:
         for i in range(start_addr, end_addr, 0x10):
-            _send_block(radio, i - 0x08, mmap[i:i + 0x10])
+            if mmap.is_dirty(i, 0x10):
+                _send_block(radio, i - 0x08, mmap[i:i + 0x10])
             _do_status(radio, "to", i)
         _do_status(radio, "to", radio.get_memsize())
 
+    for start_addr, end_addr in ranges_main:
+        mmap.clear_dirty(start_addr, end_addr - start_addr)
+
     if len(mmap.get_packed()) == 0x1808:
         LOG.info("Old image, not writing aux block")
         return  # Old image, no aux block
@@ -741,7 +757,10 @@ def _do_upload(radio):
     for start_addr, end_addr in ranges_aux:
         for i in range(start_addr, end_addr, 0x10):
             addr = 0x1808 + (i - 0x1EC0)
-            _send_block(radio, i, mmap[addr:addr + 0x10])
+            if mmap.is_dirty(addr, 0x10):
+                _send_block(radio, i, mmap[addr:addr + 0x10])
+        mmap.clear_dirty(0x1808 + (start_addr - 0x1EC0),
+                         end_addr - start_addr)
 
     if radio._all_range_flag:
         radio._all_range_flag = False
@@ -29,6 +29,7 @@ import struct
 import logging
 
 from chirp import chirp_common, directory, bitwise, memmap, errors, util
+from chirp import checkpoint
 from chirp.settings import RadioSetting, RadioSettingGroup, \
     RadioSettingValueBoolean, RadioSettingValueList, \
     RadioSettingValueInteger, RadioSettingValueString, \
@@ -572,18 +573,26 @@ def do_download(radio):
     radio.metadata = {'uvk5_firmware': f}
 
     addr = 0
-    while addr < MEM_SIZE:
-        data = _readmem(serport, addr, MEM_BLOCK)
-        status.cur = addr
-        radio.status_fn(status)
-
-        if data and len(data) == MEM_BLOCK:
-            eeprom += data
-            addr += MEM_BLOCK
-        else:
-            raise errors.RadioError("Memory download incomplete")
+    with checkpoint.DownloadCheckpoint(radio, f) as ckpt:
+        while addr < MEM_SIZE:
+            data = ckpt.get(addr, MEM_BLOCK)
+            if data is None:
+                data = _readmem(serport, addr, MEM_BLOCK)
+                if data and len(data) == MEM_BLOCK:
+                    ckpt.put(addr, data)
+            status.cur = addr
+            radio.status_fn(status)
+
+            if data and len(data) == MEM_BLOCK:
+                eeprom += data
+                addr += MEM_BLOCK
+            else:
+                raise errors.RadioError("Memory download incomplete")
+        ckpt.complete()
 
-    return memmap.MemoryMapBytes(eeprom)
+    mmap = memmap.MemoryMapBytes(eeprom)
+    mmap.clear_dirty()
+    return mmap
 
 
 def do_upload(radio):
@@ -614,9 +623,14 @@ def do_upload(radio):
             'Firmware version is not supported by this driver')
     LOG.info('Uploading image from firmware %r to radio with %r',
              radio.metadata.get('uvk5_firmware', 'unknown'), f)
+    mmap = radio.get_mmap()
     addr = start_addr
     while addr < stop_addr:
-        dat = radio.get_mmap()[addr:addr+MEM_BLOCK]
+        if not mmap.is_dirty(addr, MEM_BLOCK):
+            # Unchanged since we downloaded it from the radio
+            addr += MEM_BLOCK
+            continue
+        dat = mmap[addr:addr+MEM_BLOCK]
         _writemem(serport, dat, addr)
         status.cur = addr - start_addr
         radio.status_fn(status)
@@ -625,6 +639,7 @@ def do_upload(radio):
         else:
             raise errors.RadioError("Memory upload incomplete")
     status.msg = "Uploaded OK"
+    mmap.clear_dirty(start_addr, stop_addr - start_addr)
 
     _resetradio(serport)
 
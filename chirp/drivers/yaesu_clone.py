@@ -25,53 +25,43 @@ LOG = logging.getLogger(__name__)
 CMD_ACK = 0x06
 
 
-def _safe_read(pipe, count):
-    buf = bytes(b"")
-    first = True
-    for _i in range(0, 60):
-        buf += pipe.read(count - len(buf))
-        # LOG.debug("safe_read: %i/%i\n" % (len(buf), count))
-        if buf:
-            if first and buf[0] == CMD_ACK:
-                # LOG.debug("Chewed an ack")
-                buf = buf[1:]  # Chew an echo'd ack if using a 2-pin cable
-            first = False
-        if len(buf) == count:
-            break
+def _safe_read(pipe, count, reader=None):
+    if reader is None:
+        reader = util.PipeReader(pipe)
+    # Chew an echo'd ack if using a 2-pin cable
+    reader.skip_echo(bytes([CMD_ACK]))
+    buf = reader.read_exact(count, attempts=60)
     LOG.debug(util.hexprint(buf))
     return buf
 
 
-def _chunk_read(pipe, count, status_fn):
-    timer = time.time()
-    block = 32
-    data = bytes(b"")
-    while len(data) < count:
-        # Don't read past the end of our block if we're not on a 32-byte
-        # boundary
-        chunk_size = min(block, count - len(data))
-        chunk = pipe.read(chunk_size)
-        if chunk:
-            timer = time.time()
-            data += chunk
-            if data[0] == CMD_ACK:
-                data = data[1:]  # Chew an echo'd ack if using a 2-pin cable
-        # LOG.debug("Chewed an ack")
-        if time.time() - timer > 2:
-            # It's been two seconds since we last saw data from the radio,
-            # so it's time to give up.
-            raise errors.RadioError("Timed out reading from radio")
+def _chunk_read(pipe, count, status_fn, reader=None):
+    if reader is None:
+        reader = util.PipeReader(pipe)
+    # Chew an echo'd ack if using a 2-pin cable
+    reader.skip_echo(bytes([CMD_ACK]))
+
+    def _status(cur):
         status = chirp_common.Status()
         status.msg = "Cloning from radio"
         status.max = count
-        status.cur = len(data)
+        status.cur = cur
         status_fn(status)
-        LOG.debug("Read %i/%i" % (len(data), count))
+        LOG.debug("Read %i/%i" % (cur, count))
+
+    # Don't read past the end of our block if we're not on a 32-byte
+    # boundary, and give up once it has been two seconds since we last
+    # saw data from the radio.
+    data = reader.read_exact(count, idle_timeout=2, chunk=32,
+                             progress=_status)
+    if len(data) < count:
+        raise errors.RadioError("Timed out reading from radio")
     return data
 
 
 def __clone_in(radio):
     pipe = radio.pipe
+    reader = util.PipeReader(pipe)
 
     status = chirp_common.Status()
     status.msg = "Cloning from radio"
@@ -79,14 +69,14 @@ def __clone_in(radio):
 
     start = time.time()
 
-    data = bytes(b"")
+    data = bytearray()
     blocks = 0
     for block in radio._block_lengths:
         blocks += 1
         if blocks == len(radio._block_lengths):
-            chunk = _chunk_read(pipe, block, radio.status_fn)
+            chunk = _chunk_read(pipe, block, radio.status_fn, reader)
         else:
-            chunk = _safe_read(pipe, block)
+            chunk = _safe_read(pipe, block, reader)
             pipe.write(bytes([CMD_ACK]))
         if not chunk:
             raise errors.RadioError("No response from radio")
@@ -102,7 +92,7 @@ def __clone_in(radio):
 
     LOG.debug("Clone completed in %i seconds" % (time.time() - start))
 
-    return memmap.MemoryMapBytes(data)
+    return memmap.MemoryMapBytes(bytes(data))
 
 
 def _clone_in(radio):
@@ -112,21 +102,57 @@ def _clone_in(radio):
         raise errors.RadioError("Failed to communicate with the radio: %s" % e)
 
 
-def _chunk_write(pipe, data, status_fn, block):
-    delay = 0.03
+class ClonePacer:
+    """Paces blocks written to a radio that does not acknowledge them.
+
+    This leaves @delay between the start of one block and the next, so
+    time spent on status updates counts towards the gap, and keeps track
+    of the rate achieved.
+    """
+    def __init__(self, pipe, delay):
+        self.pipe = pipe
+        self.delay = delay
+        self.written = 0
+        self.start = None
+        self._next = None
+
+    def write(self, data):
+        """Write @data once the gap after the previous block has passed"""
+        now = time.monotonic()
+        if self._next is None:
+            self.start = now
+        elif now < self._next:
+            time.sleep(self._next - now)
+        self.pipe.write(data)
+        self.written += len(data)
+        self._next = time.monotonic() + self.delay
+
+    @property
+    def rate(self):
+        """The achieved rate in bytes per second"""
+        if self.start is None:
+            return None
+        elapsed = time.monotonic() - self.start
+        return self.written / elapsed if elapsed > 0 else None
+
+
+def _chunk_write(pipe, data, status_fn, block, pacer=None):
+    if pacer is None:
+        pacer = ClonePacer(pipe, 0.03)
     count = 0
     for i in range(0, len(data), block):
         chunk = data[i:i+block]
-        pipe.write(chunk)
+        pacer.write(chunk)
         count += len(chunk)
         LOG.debug("@_chunk_write, count: %i, blocksize: %i" % (count, block))
-        time.sleep(delay)
 
         status = chirp_common.Status()
         status.msg = "Cloning to radio"
         status.max = len(data)
         status.cur = count
+        status.rate = pacer.rate
         status_fn(status)
+    LOG.debug('Wrote %i bytes at %.0f B/s' % (count, pacer.rate or 0))
 
 
 def __clone_out(radio):
@@ -142,6 +168,7 @@ def __clone_out(radio):
         radio.status_fn(status)
 
     start = time.time()
+    pacer = ClonePacer(pipe, radio._block_delay)
 
     blocks = 0
     pos = 0
@@ -158,7 +185,7 @@ def __clone_out(radio):
                 raise Exception("Radio did not ack block %i" % blocks)
         else:
             _chunk_write(pipe, mmap[pos:],
-                         radio.status_fn, radio._block_size)
+                         radio.status_fn, radio._block_size, pacer)
         pos += block
 
     pipe.read(pos)  # Chew the echo if using a 2-pin cable
@@ -207,12 +234,8 @@ class YaesuChecksum:
     def get_calculated(self, mmap):
         """Return the calculated value of the checksum"""
         mmap = self._asbytes(mmap)
-        cs = 0
-        for i in range(self._start, self._stop+1):
-            # NOTE: mmap[i] returns a slice'd bytes, not an int like a
-            # bytes does
-            cs += mmap[i][0]
-        return cs % 256
+        return sum(mmap.get_view(self._start,
+                                 self._stop - self._start + 1)) % 256
 
     def update(self, mmap):
         """Update the checksum with the data in @mmap"""
@@ -229,6 +252,8 @@ class YaesuCloneModeRadio(chirp_common.CloneModeRadio):
     """Base class for all Yaesu clone-mode radios"""
     _block_lengths = [8, 65536]
     _block_size = 8
+    # Gap between blocks of the final chunk on upload
+    _block_delay = 0.03
 
     VENDOR = "Yaesu"
     NEEDS_COMPAT_SERIAL = False
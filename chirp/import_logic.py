@@ -222,9 +222,14 @@ def _import_duplex(dst_radio, srcrf, mem):
         mem.duplex = ''
 
 
-def import_mem(dst_radio, src_features, src_mem, overrides={}, mem_cls=None):
+def import_mem(dst_radio, src_features, src_mem, overrides={}, mem_cls=None,
+               validate=True):
     """Perform import logic to create a destination memory from
-    src_mem that will be compatible with @dst_radio"""
+    src_mem that will be compatible with @dst_radio
+
+    If @validate is False, the caller is responsible for running the result
+    through dst_radio.validate_memory() (or validate_memories()).
+    """
     dst_rf = dst_radio.get_features()
 
     if isinstance(src_mem, chirp_common.DVMemory):
@@ -250,7 +255,7 @@ def import_mem(dst_radio, src_features, src_mem, overrides={}, mem_cls=None):
     dst_mem.immutable = []
 
     for k, v in overrides.items():
-        dst_mem.__dict__[k] = v
+        object.__setattr__(dst_mem, k, v)
 
     helpers = [_import_name,
                _import_power,
@@ -269,10 +274,12 @@ def import_mem(dst_radio, src_features, src_mem, overrides={}, mem_cls=None):
         cur_mem = dst_radio.get_memory(dst_mem.number)
         dst_radio.check_set_memory_immutable_policy(cur_mem, dst_mem)
 
-    msgs = dst_radio.validate_memory(dst_mem)
-    errs = [x for x in msgs if isinstance(x, chirp_common.ValidationError)]
-    if errs:
-        raise DestNotCompatible(", ".join(errs))
+    if validate:
+        msgs = dst_radio.validate_memory(dst_mem)
+        errs = [x for x in msgs
+                if isinstance(x, chirp_common.ValidationError)]
+        if errs:
+            raise DestNotCompatible(", ".join(errs))
 
     return dst_mem
 
@@ -14,11 +14,19 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from builtins import bytes
+import logging
+import mmap
+import os
 
 import six
 
 from chirp import util
 
+LOG = logging.getLogger(__name__)
+
+# Files at least this big are mapped instead of read into memory
+MAP_THRESHOLD = 256 * 1024
+
 
 class MemoryMapBytes(object):
     """
@@ -27,9 +35,34 @@ class MemoryMapBytes(object):
     """
 
     def __init__(self, data):
-        assert isinstance(data, bytes)
-
-        self._data = list(data)
+        assert isinstance(data, (bytes, bytearray))
+
+        self._data = bytearray(data)
+        # Ranges of (start, end) written since the map was last known to
+        # match the radio. Until clear_dirty() is called (usually after a
+        # download), we know nothing about that, so the whole map is dirty.
+        self._dirty = [(0, len(self._data))]
+        self._dirty_limit = 256
+
+    @property
+    def _data(self):
+        return self.__data
+
+    @_data.setter
+    def _data(self, data):
+        # Keep a view of the backing store around so that slicing does
+        # not copy the data twice
+        self.__data = data
+        self._view = memoryview(data)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_view']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._view = memoryview(self.__data)
 
     def printable(self, start=None, end=None):
         """Return a printable representation of the memory map"""
@@ -46,11 +79,22 @@ class MemoryMapBytes(object):
     def get(self, start, length=1):
         """Return a chunk of memory of @length bytes from @start"""
         if length == -1:
-            return bytes(self._data[start:])
+            return self._view[start:].tobytes()
         else:
-            end = start + length
-            d = self._data[start:end]
-            return bytes(d)
+            return self._view[start:start + length].tobytes()
+
+    def get_view(self, start=0, length=-1):
+        """Return a read-only view of @length bytes from @start
+
+        This does not copy the data, so it is suitable for checksumming
+        or sending large parts of the map. The view reflects later changes
+        to the map.
+        """
+        if length == -1:
+            view = self._view[start:]
+        else:
+            view = self._view[start:start + length]
+        return view.toreadonly()
 
     def set(self, pos, value):
         """Set a chunk of memory at @pos to @value"""
@@ -58,21 +102,86 @@ class MemoryMapBytes(object):
         pos = int(pos)
 
         if isinstance(value, int):
-            self._data[pos] = value & 0xFF
-        elif isinstance(value, bytes):
-            for byte in bytes(value):
-                self._data[pos] = byte
-                pos += 1
+            value &= 0xFF
+            if self._data[pos] != value:
+                self._data[pos] = value
+                self._mark_dirty(pos if pos >= 0 else pos + len(self), 1)
+            return
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            pass
         elif isinstance(value, str):
             if six.PY3:
                 value = value.encode()
-            for byte in value:
-                self._data[pos] = ord(byte)
-                pos += 1
         else:
             raise ValueError("Unsupported type %s for value" %
                              type(value).__name__)
 
+        if pos < 0:
+            pos += len(self._data)
+        end = pos + len(value)
+        if pos < 0 or end > len(self._data):
+            raise IndexError('Write of %i bytes at %i is outside the map' % (
+                len(value), pos))
+        if self._view[pos:end] != value:
+            self._view[pos:end] = value
+            self._mark_dirty(pos, end - pos)
+
+    def _mark_dirty(self, start, length):
+        self._dirty.append((start, start + length))
+        if len(self._dirty) > self._dirty_limit:
+            # Merge overlapping ranges to keep this from growing with every
+            # write to the same location
+            self._dirty[:] = self.get_dirty_ranges()
+            self._dirty_limit = max(256, len(self._dirty) * 2)
+
+    def mark_dirty(self, start=0, length=-1):
+        """Mark @length bytes from @start as changed (default: everything)"""
+        if length == -1:
+            length = len(self._data) - start
+        self._mark_dirty(start, length)
+
+    def clear_dirty(self, start=0, length=-1):
+        """Declare that @length bytes from @start (default: everything)
+        match what is in the radio
+
+        This should be called after a download, and for what was sent
+        after a successful upload, so that later writes can be tracked
+        with get_dirty_ranges().
+        """
+        if start == 0 and length == -1:
+            del self._dirty[:]
+            return
+        if length == -1:
+            length = len(self._data) - start
+        end = start + length
+        remaining = []
+        for dstart, dend in self._dirty:
+            if dstart < start:
+                remaining.append((dstart, min(dend, start)))
+            if dend > end:
+                remaining.append((max(dstart, end), dend))
+        self._dirty[:] = remaining
+
+    def get_dirty_ranges(self):
+        """Return a sorted list of (start, end) ranges changed since the
+        last clear_dirty()"""
+        merged = []
+        for start, end in sorted(self._dirty):
+            end = min(end, len(self._data))
+            if start >= end:
+                continue
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def is_dirty(self, start, length=1):
+        """Return True if any of @length bytes from @start have changed"""
+        end = start + length
+        return any(dstart < end and start < dend
+                   for dstart, dend in self._dirty)
+
     def get_packed(self):
         """Return the entire memory map as raw data"""
         return bytes(self._data)
@@ -85,10 +194,7 @@ class MemoryMapBytes(object):
 
     def __getitem__(self, pos):
         if isinstance(pos, slice):
-            if pos.stop is None:
-                return self.get(pos.start, -1)
-
-            return self.get(pos.start, pos.stop - pos.start)
+            return self._view[pos.start:pos.stop].tobytes()
         else:
             return self.get(pos)
 
@@ -113,6 +219,63 @@ class MemoryMapBytes(object):
         return self
 
 
+class MappedMemoryMap(MemoryMapBytes):
+    """A MemoryMapBytes backed by a private mapping of a file
+
+    Pages of the file are only read as they are touched, and writes go to
+    private copies of those pages, never to the file itself. Call detach()
+    before the file is rewritten.
+    """
+
+    def __init__(self, mapping, size=-1):
+        if size == -1:
+            size = len(mapping)
+        self._mapping = mapping
+        self._data = memoryview(mapping)[:size]
+        self._dirty = [(0, size)]
+        self._dirty_limit = 256
+
+    def __getstate__(self):
+        state = super(MappedMemoryMap, self).__getstate__()
+        state['_MemoryMapBytes__data'] = bytearray(self._data)
+        state['_mapping'] = None
+        return state
+
+    @property
+    def mapped(self):
+        """True if the data still comes from the file mapping"""
+        return self._mapping is not None
+
+    def detach(self):
+        """Copy the data into memory and release the file mapping"""
+        if self._mapping is None:
+            return
+        self._data = bytearray(self._data)
+        mapping, self._mapping = self._mapping, None
+        try:
+            mapping.close()
+        except BufferError:
+            # A view from get_view() is still alive somewhere, so the
+            # mapping will be released along with it
+            LOG.debug('File mapping still in use, not closing')
+
+
+def map_file(filename):
+    """Return a private copy-on-write mapping of @filename
+
+    Returns None if the file is smaller than MAP_THRESHOLD, where just
+    reading it is cheaper, or if it cannot be mapped.
+    """
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < max(MAP_THRESHOLD, 1):
+            return None
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except (OSError, ValueError) as e:
+            LOG.debug('Unable to map %s: %s', filename, e)
+            return None
+
+
 class MemoryMap(MemoryMapBytes):
     """Compatibility version of MemoryMapBytes
 
@@ -148,6 +311,7 @@ class MemoryMap(MemoryMapBytes):
             super(MemoryMap, self).get_packed())
 
     def get_byte_compatible(self):
-        mmb = MemoryMapBytes(bytes(self._data))
+        mmb = MemoryMapBytes(self._data)
         self._data = mmb._data
+        mmb._dirty = self._dirty
         return mmb
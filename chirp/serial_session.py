@@ -0,0 +1,275 @@
+# Copyright 2026 CHIRP Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Record the conversation between a driver and a radio, and replay it.
+
+RecordingSerial wraps the pipe handed to a driver and logs every write,
+read and settings change with a timestamp. ReplaySerial plays a recorded
+session back to a driver without the radio, checking that the driver
+sends the same bytes it did when the session was recorded. This lets us
+run, benchmark and profile a clone offline.
+
+Replay treats each direction as a stream of bytes, so a driver that
+splits its reads or writes differently from when the session was
+recorded still replays, as long as it says the same thing. The radio's
+responses become readable once the driver has written everything that
+preceded them in the recording.
+"""
+
+import logging
+import struct
+import time
+
+import serial
+
+from chirp import util
+
+LOG = logging.getLogger(__name__)
+
+MAGIC = b'CHIRP serial session 1\n'
+WRITE = b'W'
+READ = b'R'
+SET = b'S'
+# Port name that opens a ReplaySerial for the session in the named file
+REPLAY_PREFIX = 'replay:'
+# kind, seconds since start, bytes requested (for reads), length of data
+_RECORD = struct.Struct('>cdII')
+# Serial settings that are worth recording when a driver changes them
+SETTINGS = ('baudrate', 'bytesize', 'parity', 'stopbits', 'timeout',
+            'rtscts', 'rts', 'dtr')
+
+
+class ReplayError(Exception):
+    """The driver did not do what it did when the session was recorded"""
+
+
+class SerialEvent(tuple):
+    __slots__ = ()
+
+    def __new__(cls, kind, time, requested, data):
+        return tuple.__new__(cls, (kind, time, requested, data))
+
+    kind = property(lambda self: self[0])
+    time = property(lambda self: self[1])
+    requested = property(lambda self: self[2])
+    data = property(lambda self: self[3])
+
+
+class SerialSession:
+    """A recorded conversation with a radio"""
+    def __init__(self, events=None):
+        self.events = list(events or [])
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'rb') as f:
+            data = f.read()
+        if not data.startswith(MAGIC):
+            raise ValueError('%s is not a serial session' % filename)
+        events = []
+        pos = len(MAGIC)
+        while pos + _RECORD.size <= len(data):
+            kind, when, requested, length = _RECORD.unpack_from(data, pos)
+            pos += _RECORD.size
+            events.append(SerialEvent(kind, when, requested,
+                                      data[pos:pos + length]))
+            pos += length
+        return cls(events)
+
+    def save(self, filename):
+        with open(filename, 'wb') as f:
+            f.write(MAGIC)
+            for event in self.events:
+                f.write(encode_event(event))
+
+    def exchanges(self):
+        """Return the session as a list of (written, response) bytes"""
+        exchanges = []
+        written = response = b''
+        for event in self.events:
+            if event.kind == WRITE:
+                if response:
+                    exchanges.append((written, response))
+                    written = response = b''
+                written += event.data
+            elif event.kind == READ:
+                response += event.data
+        if written or response:
+            exchanges.append((written, response))
+        return exchanges
+
+    def stats(self):
+        """Return a dict of counts and sizes describing the session"""
+        writes = [e for e in self.events if e.kind == WRITE]
+        reads = [e for e in self.events if e.kind == READ]
+        return {
+            'writes': len(writes),
+            'reads': len(reads),
+            'short_reads': sum(1 for e in reads
+                               if len(e.data) < e.requested),
+            'bytes_written': sum(len(e.data) for e in writes),
+            'bytes_read': sum(len(e.data) for e in reads),
+            'duration': self.events[-1].time if self.events else 0.0,
+        }
+
+
+def encode_event(event):
+    return _RECORD.pack(event.kind, event.time, event.requested,
+                        len(event.data)) + event.data
+
+
+class RecordingSerial:
+    """Wraps @pipe, recording everything that goes through it.
+
+    If @filename is given, each event is appended to it as it happens, so
+    the session leading up to a crash or hang is not lost.
+    """
+    def __init__(self, pipe, filename=None):
+        self.__dict__['pipe'] = pipe
+        self.__dict__['session'] = SerialSession()
+        self.__dict__['_start'] = time.monotonic()
+        self.__dict__['_file'] = None
+        if filename:
+            self.__dict__['_file'] = open(filename, 'wb')
+            self._file.write(MAGIC)
+            self._file.flush()
+
+    def _record(self, kind, data, requested=0):
+        event = SerialEvent(kind, time.monotonic() - self._start,
+                            requested, bytes(data))
+        self.session.events.append(event)
+        if self._file:
+            self._file.write(encode_event(event))
+            self._file.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.pipe, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.pipe, name, value)
+        if name in SETTINGS:
+            self._record(SET, ('%s=%s' % (name, value)).encode())
+
+    def write(self, data):
+        self._record(WRITE, data)
+        return self.pipe.write(data)
+
+    def read(self, size=1):
+        data = self.pipe.read(size)
+        self._record(READ, data, size)
+        return data
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self.__dict__['_file'] = None
+        self.pipe.close()
+
+    def __repr__(self):
+        return '<RecordingSerial %r>' % self.pipe
+
+
+class ReplaySerial(serial.SerialBase):
+    """Plays a recorded session back to a driver.
+
+    With @strict (the default) a write that differs from the recording
+    raises ReplayError; otherwise it is logged and replay carries on.
+    """
+    def __init__(self, session, strict=True, *a, **k):
+        if not isinstance(session, SerialSession):
+            session = SerialSession.load(session)
+        self.session = session
+        self.strict = strict
+        self._exchanges = session.exchanges()
+        self._index = 0
+        self._expected = b''
+        self._buffer = bytearray()
+        self.written = 0
+        super().__init__(*a, **k)
+        self._advance()
+
+    def _advance(self):
+        # Anything the radio said before we next have to write is now
+        # available to read
+        self._expected = b''
+        while self._index < len(self._exchanges):
+            expected, response = self._exchanges[self._index]
+            if expected:
+                self._expected = expected
+                return
+            self._buffer += response
+            self._index += 1
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def write(self, data):
+        data = bytes(data)
+        pos = 0
+        while pos < len(data):
+            if not self._expected:
+                self._mismatch(data[pos:], b'', self.written + pos)
+                break
+            count = min(len(self._expected), len(data) - pos)
+            if data[pos:pos + count] != self._expected[:count]:
+                self._mismatch(data[pos:pos + count],
+                               self._expected[:count], self.written + pos)
+            pos += count
+            self._expected = self._expected[count:]
+            if not self._expected:
+                self._buffer += self._exchanges[self._index][1]
+                self._index += 1
+                self._advance()
+        self.written += len(data)
+        return len(data)
+
+    def _mismatch(self, got, expected, offset):
+        msg = 'Write at offset %i differs from recording' % offset
+        LOG.error('%s, got:\n%sexpected:\n%s', msg, util.hexprint(got),
+                  util.hexprint(expected))
+        if self.strict:
+            raise ReplayError(msg)
+
+    def read(self, size=1):
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    @property
+    def in_waiting(self):
+        return len(self._buffer)
+
+    @property
+    def out_waiting(self):
+        return 0
+
+    def reset_input_buffer(self):
+        # The recording only has what the driver actually read, so there
+        # is never anything stale to throw away
+        pass
+
+    def reset_output_buffer(self):
+        pass
+
+    def flush(self):
+        pass
+
+    @property
+    def finished(self):
+        """True if the driver wrote and read everything recorded"""
+        return self._index >= len(self._exchanges) and not self._buffer
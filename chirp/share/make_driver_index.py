@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+#
+# Regenerate the driver index used to avoid importing every driver at
+# startup. Run this after adding or changing a driver; stale entries are
+# detected and imported normally, they just do not get the benefit.
+
+import json
+import sys
+
+sys.path.insert(0, ".")
+sys.path.insert(0, "..")
+
+from chirp import directory  # noqa
+
+setattr(__builtins__, '_', str)
+
+output = sys.argv[1] if len(sys.argv) > 1 else directory.DRIVER_INDEX
+index = directory.build_driver_index()
+with open(output, 'w') as f:
+    json.dump(index, f, indent=1, sort_keys=True)
+    f.write('\n')
+print('Wrote %i drivers from %i modules to %s' % (
+    len(index['drivers']), len(index['modules']), output))
@@ -0,0 +1,230 @@
+# Copyright 2026 CHIRP Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Record where the time goes while CHIRP starts up.
+
+Enabled with --profile-startup FILE on chirpc and chirpwx. Every module
+imported while the profiler is running is timed (including drivers that
+the directory imports on demand), along with named spans and milestones
+like the first window or first output. The report is a text table sorted
+by self time, or a Chrome trace (chrome://tracing, Perfetto) if FILE ends
+in .json. A FILE of - writes the text report to stderr.
+"""
+
+import atexit
+import contextlib
+import importlib.abc
+import json
+import os
+import sys
+import threading
+import time
+
+OPTION = '--profile-startup'
+PROFILER = None
+
+
+class _TimingLoader:
+    """Wraps a module's loader to time executing the module"""
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        with self._profiler.span(module.__name__, 'import'):
+            self._loader.exec_module(module)
+
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    """Finds modules with the rest of sys.meta_path and wraps the loader"""
+    def __init__(self, profiler):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if hasattr(spec.loader, 'exec_module'):
+                spec.loader = _TimingLoader(spec.loader, self._profiler)
+            return spec
+        return None
+
+
+class StartupProfiler:
+    def __init__(self, output):
+        self.output = output
+        self.start = time.perf_counter()
+        # (name, category, start, duration, self time, thread)
+        self.events = []
+        self.marks = []
+        self._stacks = threading.local()
+        self._finder = _TimingFinder(self)
+
+    def install(self):
+        sys.meta_path.insert(0, self._finder)
+
+    def uninstall(self):
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+
+    @contextlib.contextmanager
+    def span(self, name, category='phase'):
+        """Time the body, excluding nested spans from its self time"""
+        stack = self._stacks.__dict__.setdefault('stack', [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += duration
+            self.events.append((name, category, start - self.start,
+                                duration, duration - children,
+                                threading.get_ident()))
+
+    def mark(self, name):
+        """Record a milestone, only the first time it is reached"""
+        if name not in [n for n, t in self.marks]:
+            self.marks.append((name, time.perf_counter() - self.start))
+
+    def text_report(self):
+        total = time.perf_counter() - self.start
+        lines = ['CHIRP startup profile: %.3fs total, %i imports' % (
+            total, sum(1 for e in self.events if e[1] == 'import'))]
+        for name, when in self.marks:
+            lines.append('%9.1fms  %s' % (when * 1000, name))
+        lines.append('%10s %10s  %s' % ('self', 'total', 'name'))
+        for name, category, start, duration, self_time, thread in sorted(
+                self.events, key=lambda e: e[4], reverse=True):
+            if category != 'import':
+                name = '[%s]' % name
+            lines.append('%8.1fms %8.1fms  %s' % (
+                self_time * 1000, duration * 1000, name))
+        return '\n'.join(lines) + '\n'
+
+    def chrome_trace(self):
+        pid = os.getpid()
+        events = [{'name': name, 'cat': category, 'ph': 'X',
+                   'ts': start * 1e6, 'dur': duration * 1e6,
+                   'pid': pid, 'tid': thread}
+                  for name, category, start, duration, _self, thread
+                  in self.events]
+        events.extend({'name': name, 'cat': 'mark', 'ph': 'i', 's': 'g',
+                       'ts': when * 1e6, 'pid': pid, 'tid': 0}
+                      for name, when in self.marks)
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write(self):
+        if self.output == '-':
+            sys.stderr.write(self.text_report())
+        elif self.output.endswith('.json'):
+            with open(self.output, 'w') as f:
+                json.dump(self.chrome_trace(), f)
+        else:
+            with open(self.output, 'w') as f:
+                f.write(self.text_report())
+
+
+class _FirstOutput:
+    """Stands in for sys.stdout while profiling, to mark the first write"""
+    def __init__(self, stream):
+        self._stream = stream
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+    def write(self, data):
+        # Do not swap sys.stdout back from here, print() does not hold a
+        # reference to the file it is writing to
+        mark('first output')
+        return self._stream.write(data)
+
+
+def start(output):
+    """Start profiling, writing the report to @output at finish()"""
+    global PROFILER
+    if PROFILER is None:
+        PROFILER = StartupProfiler(output)
+        PROFILER.install()
+        atexit.register(finish)
+    return PROFILER
+
+
+def start_from_argv(argv=None):
+    """Start profiling if --profile-startup is on the command line.
+
+    Entry points call this before argparse gets a look at the arguments,
+    so that their heavy imports (wx, the drivers) are covered.
+    """
+    argv = [str(arg) for arg in (sys.argv[1:] if argv is None else argv)]
+    for i, arg in enumerate(argv):
+        if arg == OPTION and i + 1 < len(argv):
+            return start(argv[i + 1])
+        elif arg.startswith(OPTION + '='):
+            return start(arg.split('=', 1)[1])
+
+
+def add_argument(parser):
+    parser.add_argument(OPTION, metavar='FILE',
+                        help=('Write a startup/import time profile to FILE '
+                              '(Chrome trace if FILE ends in .json, '
+                              '- for stderr)'))
+
+
+def watch_output():
+    """Mark the first thing written to stdout as the first output"""
+    if PROFILER is not None and not isinstance(sys.stdout, _FirstOutput):
+        sys.stdout = _FirstOutput(sys.stdout)
+
+
+def span(name):
+    if PROFILER is None:
+        return contextlib.nullcontext()
+    return PROFILER.span(name)
+
+
+def mark(name):
+    if PROFILER is not None:
+        PROFILER.mark(name)
+
+
+def finish(name=None):
+    """Stop profiling and write the report, marking @name if given"""
+    global PROFILER
+    profiler = PROFILER
+    if profiler is None:
+        return
+    if name:
+        profiler.mark(name)
+    PROFILER = None
+    profiler.uninstall()
+    atexit.unregister(finish)
+    if isinstance(sys.stdout, _FirstOutput):
+        sys.stdout = sys.stdout._stream
+    try:
+        profiler.write()
+    except OSError as e:
+        sys.stderr.write('Unable to write startup profile: %s\n' % e)
@@ -15,6 +15,7 @@
 
 import struct
 import sys
+import time
 
 
 def byte_to_int(b):
@@ -147,3 +148,106 @@ class StringStruct(object):
         return tuple(bitwise.string_straight_decode(x) if isinstance(x, bytes)
                      else x
                      for x in result)
+
+
+class PipeReader(object):
+    """Buffered reads from a radio's serial pipe.
+
+    Data is collected in a bytearray instead of concatenating bytes, and
+    anything read beyond what a call returns is kept for the next one, so
+    one reader should be used for a whole exchange.
+    """
+    def __init__(self, pipe):
+        self.pipe = pipe
+        self.buffer = bytearray()
+        self._echo = b''
+
+    def skip_echo(self, data):
+        """Discard @data if it is the next thing read back.
+
+        Two-pin cables echo everything we send; this drops that echo if
+        it shows up and does nothing if it does not.
+        """
+        self._echo += data
+
+    def _drop_echo(self):
+        echo = self._echo
+        if self.buffer[:len(echo)] == echo[:len(self.buffer)]:
+            if len(self.buffer) < len(echo):
+                # Can not tell yet
+                return
+            del self.buffer[:len(echo)]
+        self._echo = b''
+
+    def _fill(self, size):
+        data = self.pipe.read(size)
+        if data:
+            self.buffer += data
+            if self._echo:
+                self._drop_echo()
+        return data
+
+    def _available(self):
+        return 0 if self._echo else len(self.buffer)
+
+    def _take(self, count):
+        data = bytes(self.buffer[:count])
+        del self.buffer[:count]
+        return data
+
+    def read_exact(self, count, timeout=None, idle_timeout=None,
+                   attempts=None, chunk=None, progress=None):
+        """Read @count bytes, or fewer if the radio stops sending.
+
+        Gives up after @timeout seconds in total, @idle_timeout seconds
+        without receiving anything, or @attempts reads from the pipe,
+        whichever comes first. Reads are at most @chunk bytes, and
+        @progress is called with the number of bytes so far after each.
+        """
+        start = last = time.monotonic()
+        tries = 0
+        while self._available() < count:
+            # Never ask for more than we need, in case there is no echo
+            size = max(1, count - len(self.buffer))
+            if chunk:
+                size = min(size, chunk)
+            got = self._fill(size)
+            now = time.monotonic()
+            if got:
+                last = now
+            tries += 1
+            if progress:
+                progress(self._available())
+            if attempts is not None and tries >= attempts:
+                break
+            if timeout is not None and now - start > timeout:
+                break
+            if idle_timeout is not None and now - last > idle_timeout:
+                break
+        # An echo that has not shown up by now is not coming
+        self._echo = b''
+        return self._take(min(count, len(self.buffer)))
+
+    def read_until(self, delimiter, timeout=None, chunk=1, max_size=None):
+        """Read through the next @delimiter, which is included.
+
+        If @timeout seconds pass or @max_size bytes arrive first, whatever
+        was read is returned without a delimiter.
+        """
+        start = time.monotonic()
+        searched = 0
+        while True:
+            if not self._echo:
+                index = self.buffer.find(delimiter, searched)
+                if index >= 0:
+                    return self._take(index + len(delimiter))
+                # Only look at new data (and a possible split delimiter)
+                # next time
+                searched = max(0, len(self.buffer) - len(delimiter) + 1)
+            if max_size is not None and len(self.buffer) >= max_size:
+                break
+            if timeout is not None and time.monotonic() - start > timeout:
+                break
+            self._fill(chunk)
+        self._echo = b''
+        return self._take(len(self.buffer))
@@ -9,8 +9,11 @@ if sys.version_info < (3, 10):
 else:
     import importlib.resources as importlib_resources
 
+from chirp import bitwise
 from chirp import directory
 from chirp import logger
+from chirp import platform
+from chirp import startup_profile
 
 LOG = logging.getLogger(__name__)
 CONF = None
@@ -62,6 +65,8 @@ def maybe_install_desktop():
 
 def chirpmain():
     global CONF
+    # Start before importing wx and the UI, if asked to
+    startup_profile.start_from_argv()
     import wx
     # This must be imported before wx.App() to squelch warnings on startup
     # about duplicate "Windows bitmap file" handlers
@@ -81,6 +86,7 @@ def chirpmain():
     logger.add_version_argument(parser)
     parser.add_argument("--profile", action="store_true",
                         help="Enable profiling")
+    startup_profile.add_argument(parser)
     parser.add_argument("--onlydriver", nargs="+",
                         help="Include this driver while loading")
     parser.add_argument("--inspect", action="store_true",
@@ -163,7 +169,14 @@ def chirpmain():
 
     logging.getLogger('main').info(report.get_environment())
 
-    directory.import_drivers(limit=args.onlydriver)
+    with startup_profile.span('import_drivers'):
+        directory.import_drivers(limit=args.onlydriver)
+
+    try:
+        bitwise.SPEC_CACHE.set_path(
+            platform.get_platform().config_file('bitwise'))
+    except Exception as e:
+        LOG.warning('Unable to use bitwise spec cache: %s', e)
 
     if CONF.get_bool('developer', 'state'):
         from chirp.drivers import fake
@@ -177,6 +190,7 @@ def chirpmain():
     app.SetAppName('CHIRP')
     mainwindow = main.ChirpMain(None, title='CHIRP')
     mainwindow.Show()
+    startup_profile.mark('main window created')
 
     if args.module:
         mainwindow.load_module(args.module)
@@ -212,4 +226,6 @@ def chirpmain():
         except Exception as e:
             LOG.exception('Failed to run linux desktop installer: %s', e)
 
+    # This runs once the event loop is up and the window has been drawn
+    wx.CallAfter(startup_profile.finish, 'first window')
     app.MainLoop()
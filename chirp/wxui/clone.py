@@ -29,6 +29,8 @@ from chirp import chirp_common
 from chirp import directory
 from chirp.drivers import fake
 from chirp import errors
+from chirp import memmap
+from chirp import serial_session
 from chirp.wxui import config
 from chirp.wxui import common
 from chirp.wxui import developer
@@ -129,6 +131,9 @@ class SettingsThread(threading.Thread):
 def open_serial(port, rclass):
     if port.startswith('Fake'):
         return FAKES[port]
+    if port.startswith(serial_session.REPLAY_PREFIX):
+        return serial_session.ReplaySerial(
+            port[len(serial_session.REPLAY_PREFIX):])
     if '://' in port:
         pipe = serial.serial_for_url(port, do_not_open=True)
         pipe.timeout = 0.25
@@ -304,16 +309,15 @@ class ChirpCloneDialog(wx.Dialog):
         self.SetSizer(vbox)
         self.Center()
 
+        # Build the model list from the directory's driver info so that
+        # drivers are only imported once a model is actually selected
         self._vendors = collections.defaultdict(list)
-        for rclass in directory.DRV_TO_RADIO.values():
-            if (not issubclass(rclass, chirp_common.CloneModeRadio) and
-                    not issubclass(rclass, chirp_common.LiveRadio)):
+        for info in directory.get_driver_infos():
+            if info.entry['kind'] not in ('clone', 'live'):
                 continue
-            if (getattr(rclass, '_DETECTED_MODEL', False) and
-                    not allow_detected_models):
+            if info.entry['detected'] and not allow_detected_models:
                 continue
-            self._vendors[rclass.VENDOR].append(rclass)
-            self._add_aliases(rclass)
+            self._vendors[info.VENDOR].append(info)
 
         for models in self._vendors.values():
             models.sort(key=lambda x: '%s %s' % (x.MODEL, x.VARIANT))
@@ -417,16 +421,6 @@ class ChirpCloneDialog(wx.Dialog):
             return
         self.set_ports(after, select=found.device)
 
-    def _add_aliases(self, rclass):
-        for alias in rclass.ALIASES:
-            class DynamicRadioAlias(rclass):
-                _orig_rclass = rclass
-                VENDOR = alias.VENDOR
-                MODEL = alias.MODEL
-                VARIANT = alias.VARIANT
-
-            self._vendors[alias.VENDOR].append(DynamicRadioAlias)
-
     def disable_model_select(self):
         self._vendor.Disable()
         self._model.Disable()
@@ -476,7 +470,11 @@ class ChirpCloneDialog(wx.Dialog):
         def _safe_status():
             self.gauge.SetRange(status.max)
             self.gauge.SetValue(min(status.cur, status.max))
-            self.status_msg.SetLabel(status.msg)
+            if status.rate:
+                self.status_msg.SetLabel('%s (%i B/s)' % (status.msg,
+                                                          status.rate))
+            else:
+                self.status_msg.SetLabel(status.msg)
 
         wx.CallAfter(_safe_status)
 
@@ -508,7 +506,7 @@ class ChirpCloneDialog(wx.Dialog):
         vendor = self._vendor.GetStringSelection()
         model = self._model.GetSelection()
         LOG.debug('Selected %r' % self._vendors[vendor][model])
-        return self._vendors[vendor][model]
+        return self._vendors[vendor][model].get_class()
 
 
 class ChirpDownloadDialog(ChirpCloneDialog):
@@ -680,5 +678,12 @@ class ChirpUploadDialog(ChirpCloneDialog):
 
         self._radio._status_fn = self._status
 
+        if (isinstance(self._radio, chirp_common.CloneModeRadio) and
+                isinstance(self._radio.get_mmap(), memmap.MemoryMapBytes) and
+                not CONF.get_bool('differential_upload', 'prefs', False)):
+            # Unless asked to, do not assume that the radio we are uploading
+            # to still contains what we last downloaded, so send everything
+            self._radio.get_mmap().mark_dirty()
+
         self._clone_thread = CloneThread(self._radio, self, 'sync_out')
         self._clone_thread.start()
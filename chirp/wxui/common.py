@@ -66,6 +66,8 @@ def closes_clipboard(fn):
 
 class LiveAdapter(generic_csv.CSVRadio):
     FILE_EXTENSION = 'img'
+    # How many memories to fetch from the radio between status updates
+    SYNC_CHUNK = 10
 
     def __init__(self, liveradio):
         # Python2 old-style class compatibility
@@ -78,6 +80,9 @@ class LiveAdapter(generic_csv.CSVRadio):
         self.HARDWARE_FLOW = liveradio.HARDWARE_FLOW
         self.pipe = liveradio.pipe
         self._features = self._liveradio.get_features()
+        # Fingerprints of what we know is in each location of the radio,
+        # so sync_out() can skip the ones that have not changed
+        self._synced = {}
 
     def get_features(self):
         return self._features
@@ -87,12 +92,16 @@ class LiveAdapter(generic_csv.CSVRadio):
         self._liveradio.pipe = pipe
 
     def sync_in(self):
-        for i in range(*self._features.memory_bounds):
-            mem = self._liveradio.get_memory(i)
-            self.set_memory(mem)
+        lo, hi = self._features.memory_bounds
+        for first in range(lo, hi, self.SYNC_CHUNK):
+            last = min(first + self.SYNC_CHUNK, hi) - 1
+            for mem in self._liveradio.get_memories(first, last):
+                self.set_memory(mem)
+                self._synced[mem.number] = self.get_memory(
+                    mem.number).fingerprint()
             status = chirp_common.Status()
-            status.max = self._features.memory_bounds[1]
-            status.cur = i
+            status.max = hi
+            status.cur = last
             status.msg = 'Cloning'
             self.status_fn(status)
 
@@ -100,15 +109,21 @@ class LiveAdapter(generic_csv.CSVRadio):
         # FIXME: Handle errors
         for i in range(*self._features.memory_bounds):
             mem = self.get_memory(i)
-            if mem.freq == 0:
+            fingerprint = mem.fingerprint()
+            if self._synced.get(i) == fingerprint:
+                # Unchanged since we last read or wrote it
+                pass
+            elif mem.freq == 0:
                 # Convert the CSV notion of emptiness
                 try:
                     self._liveradio.erase_memory(i)
+                    self._synced[i] = fingerprint
                 except errors.RadioError as e:
                     LOG.error(e)
             else:
                 try:
                     self._liveradio.set_memory(mem)
+                    self._synced[i] = fingerprint
                 except errors.RadioError as e:
                     LOG.error(e)
             status = chirp_common.Status()
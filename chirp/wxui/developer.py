@@ -399,10 +399,37 @@ class ChirpRadioBrowser(common.ChirpEditor, common.ChirpSyncEditor):
         self._treebook.Bind(wx.EVT_TREEBOOK_PAGE_CHANGED,
                             self.page_selected)
 
+        self._field_index = None
+        lookup = wx.BoxSizer(wx.HORIZONTAL)
+        lookup.Add(wx.StaticText(self, label=_('Find offset') + ': '),
+                   0, wx.ALIGN_CENTER_VERTICAL)
+        self._offset_entry = wx.TextCtrl(self, style=wx.TE_PROCESS_ENTER)
+        self._offset_entry.Bind(wx.EVT_TEXT_ENTER, self._find_offset)
+        lookup.Add(self._offset_entry, 0, wx.ALIGN_CENTER_VERTICAL)
+        self._offset_fields = wx.StaticText(self)
+        lookup.Add(self._offset_fields, 1,
+                   wx.ALIGN_CENTER_VERTICAL | wx.LEFT, 5)
+
         sizer = wx.BoxSizer(wx.VERTICAL)
+        sizer.Add(lookup, 0, wx.EXPAND | wx.ALL, 5)
         sizer.Add(self._treebook, 1, wx.EXPAND)
         self.SetSizer(sizer)
 
+    def _find_offset(self, event):
+        text = self._offset_entry.GetValue().strip()
+        try:
+            offset = int(text, 16)
+        except ValueError:
+            self._offset_fields.SetLabel(_('Enter an offset in hex'))
+            return
+
+        memobj = self._radio._memobj
+        if self._field_index is None or self._field_index[0] is not memobj:
+            self._field_index = (memobj, bitwise.FieldIndex(memobj))
+        fields = self._field_index[1].lookup(offset)
+        self._offset_fields.SetLabel(', '.join(fields) or
+                                     _('No field at 0x%06x') % offset)
+
     def selected(self):
         if self._loaded:
             self._treebook.CurrentPage.selected()
@@ -988,7 +988,7 @@ class ChirpMemEdit(common.ChirpEditor, common.ChirpSyncEditor):
         if memory.extra:
             self._expand_extra(memory)
 
-        if orig_mem:
+        if orig_mem and orig_mem.fingerprint() != memory.fingerprint():
             delta = orig_mem.debug_diff(memory, '->')
             if delta:
                 LOG.debug('Driver refresh delta from set: %s', delta)
@@ -1811,8 +1811,7 @@ class ChirpMemEdit(common.ChirpEditor, common.ChirpSyncEditor):
                     self._features.memory_bounds[0])
         last = min(source_rf.memory_bounds[1],
                    self._features.memory_bounds[1])
-        memories = [source_radio.get_memory(i)
-                    for i in range(first, last + 1)]
+        memories = source_radio.get_memories(first, last)
         used = [m.number for m in memories if not m.empty]
         # Update the range to be from just the lowest and highest used memory.
         # The range of memories that are used in the source will be imported,
@@ -1835,7 +1834,8 @@ class ChirpMemEdit(common.ChirpEditor, common.ChirpSyncEditor):
         overwrite = []
         for i in range(len(mems)):
             mem = self._memory_cache[row + i]
-            if not mem.empty:
+            # Pasting the same thing over a memory does not lose anything
+            if not mem.empty and mem.fingerprint() != mems[i].fingerprint():
                 overwrite.append(mem.extd_number or mem.number)
 
         if overwrite:
@@ -1864,6 +1864,19 @@ class ChirpMemEdit(common.ChirpEditor, common.ChirpSyncEditor):
 
         errormsgs = []
         modified = False
+
+        def paste_failed(mem, e):
+            if isinstance(e, (import_logic.DestNotCompatible,
+                              chirp_common.ImmutableValueError,
+                              errors.RadioError)):
+                LOG.warning('Pasted memory %s incompatible: %s' % (
+                    mem, str(e)))
+            else:
+                LOG.exception('Failed to paste: %s' % e)
+            errormsgs.append((mem, e))
+
+        imported = []
+        existing_mems = []
         for mem in mems:
             existing = self._memory_cache[row]
             number = self.row2mem(row)
@@ -1887,33 +1900,45 @@ class ChirpMemEdit(common.ChirpEditor, common.ChirpSyncEditor):
                     self.erase_memory(mem.number)
                     self._radio.check_set_memory_immutable_policy(existing,
                                                                   mem)
+                    modified = True
                 else:
-                    mem = import_logic.import_mem(self._radio, srcrf, mem)
-                    warns, errs = chirp_common.split_validation_msgs(
-                        self._radio.validate_memory(mem))
-                    errormsgs.extend([(mem, e) for e in errs])
-                    errormsgs.extend([(mem, w) for w in warns])
-
-                    # If we are not pasting into a radio of the same type,
-                    # then unset the mem.extra bits which won't be compatible.
-                    if not same_class:
-                        mem.extra = []
-
-                    if not errs:
-                        # If we got error messages from validate, don't even
-                        # try to set the memory, just like if import_logic
-                        # was unable to make it compatible.
-                        self.set_memory(mem)
-                modified = True
-            except (import_logic.DestNotCompatible,
-                    chirp_common.ImmutableValueError,
-                    errors.RadioError) as e:
-                LOG.warning('Pasted memory %s incompatible: %s' % (
-                    mem, str(e)))
-                errormsgs.append((mem, e))
+                    # These are all validated together below
+                    imported.append(import_logic.import_mem(
+                        self._radio, srcrf, mem, validate=False))
+                    existing_mems.append(existing)
             except Exception as e:
-                LOG.exception('Failed to paste: %s' % e)
-                errormsgs.append((mem, e))
+                paste_failed(mem, e)
+
+        try:
+            results = self._radio.validate_memories(imported)
+        except Exception as e:
+            for mem in imported:
+                paste_failed(mem, e)
+            results = []
+
+        for mem, existing, msgs in zip(imported, existing_mems, results):
+            try:
+                warns, errs = chirp_common.split_validation_msgs(msgs)
+                errormsgs.extend([(mem, e) for e in errs])
+                errormsgs.extend([(mem, w) for w in warns])
+
+                # If we are not pasting into a radio of the same type,
+                # then unset the mem.extra bits which won't be compatible.
+                if not same_class:
+                    mem.extra = []
+
+                if (not existing.empty and
+                        existing.fingerprint() == mem.fingerprint()):
+                    # Already there, so don't bother the radio with it
+                    LOG.debug('Pasted memory %s is unchanged', mem.number)
+                elif not errs:
+                    # If we got error messages from validate, don't even
+                    # try to set the memory, just like if import_logic
+                    # was unable to make it compatible.
+                    self.set_memory(mem)
+                    modified = True
+            except Exception as e:
+                paste_failed(mem, e)
 
         if modified:
             wx.PostEvent(self, common.EditorChanged(self.GetId()))
@@ -2252,8 +2277,8 @@ class ChirpMemPropDialog(wx.Dialog):
                         mem.number, setting.get_name(), value))
 
     def _validate_memories(self):
-        for mem in self._memories:
-            msgs = self._radio.validate_memory(mem)
+        results = self._radio.validate_memories(self._memories)
+        for msgs in results:
             if msgs:
                 wx.MessageBox(_('Invalid edit: %s') % '; '.join(msgs),
                               'Invalid Entry', parent=self)
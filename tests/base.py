@@ -130,13 +130,21 @@ class DriverTest(unittest.TestCase):
                   "test because I don't have a memory to test with")
 
     def assertEqualMem(self, a, b, ignore=None):
+        if (a.number == b.number and
+                a.fingerprint() == b.fingerprint() and
+                (not self.rf.has_name or
+                 self.radio.filter_name(a.name).rstrip() == a.name)):
+            # Identical contents, so nothing below could differ
+            return
+
         if a.tmode == "Cross":
             tx_mode, rx_mode = a.cross_mode.split("->")
 
         a_vals = {}
         b_vals = {}
 
-        for k, v in list(a.__dict__.items()):
+        b_dict = b.to_dict()
+        for k, v in a.to_dict().items():
             if ignore and k in ignore:
                 continue
             if k == "power":
@@ -189,7 +197,7 @@ class DriverTest(unittest.TestCase):
                 continue
 
             a_vals[k] = v
-            b_vals[k] = b.__dict__[k]
+            b_vals[k] = b_dict[k]
 
         self.assertEqual(a_vals, b_vals,
                          'Memories have unexpected differences')
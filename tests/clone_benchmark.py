@@ -0,0 +1,136 @@
+# Copyright 2026 CHIRP Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark clone downloads and uploads against simulated radios.
+
+    python -m tests.clone_benchmark [options] [IMAGE ...]
+
+For every test image (or just the ones named) that has a simulator in
+tests.radio_simulator, this times the driver's sync_in and sync_out and
+reports wall time, CPU time, how long the driver spent sleeping, and how
+long the same transfer would have kept the modelled serial link busy.
+"""
+
+import argparse
+import collections
+import glob
+import logging
+import os
+import sys
+import time
+from unittest import mock
+
+from chirp import directory
+from tests import radio_simulator
+
+LOG = logging.getLogger(__name__)
+IMAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'images')
+
+Result = collections.namedtuple('Result', ['operation', 'wall', 'cpu',
+                                           'sleep', 'link', 'bytes'])
+
+
+def benchmark(radio, operation, skip_sleeps=False, **sim_args):
+    """Time @radio doing @operation ('download' or 'upload')"""
+    sim = radio_simulator.simulator_for(radio, **sim_args)
+    if operation == 'download':
+        target = radio.__class__(sim)
+        run = target.sync_in
+    else:
+        target = radio
+        target.set_pipe(sim)
+        run = target.sync_out
+    target.status_fn = lambda status: None
+    sim.prepare(operation)
+
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        if not skip_sleeps:
+            radio_simulator._sleep(seconds)
+
+    with mock.patch('time.sleep', side_effect=sleep):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        run()
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+    return Result(operation, wall, cpu, sum(slept), sim.link_time,
+                  sim.bytes_in + sim.bytes_out)
+
+
+def find_images(names=None):
+    if names:
+        return [os.path.join(IMAGES, n) if not os.path.exists(n) else n
+                for n in names]
+    images = []
+    for image in sorted(glob.glob(os.path.join(IMAGES, '*.img'))):
+        try:
+            radio = directory.get_radio_by_image(image)
+            radio_simulator.simulator_for(radio)
+        except Exception:
+            continue
+        images.append(image)
+    return images
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark clones against simulated radios')
+    parser.add_argument('images', nargs='*', metavar='IMAGE',
+                        help='Test images to use (default: all supported)')
+    parser.add_argument('--baud', type=int, default=None,
+                        help='Model the link at this rate instead of the '
+                             'one the driver sets')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds the radio takes to start a response')
+    parser.add_argument('--realtime', action='store_true',
+                        help='Actually wait for the modelled link')
+    parser.add_argument('--skip-sleeps', action='store_true',
+                        help='Do not wait when the driver sleeps')
+    parser.add_argument('--operation', choices=('download', 'upload'),
+                        action='append',
+                        help='Only benchmark this operation')
+    options = parser.parse_args(args)
+    logging.getLogger().setLevel(logging.ERROR)
+
+    directory.import_drivers()
+    print('%-32s %-8s %9s %9s %9s %9s %8s' % (
+        'Image', 'Op', 'Wall', 'CPU', 'Sleep', 'Link', 'Bytes'))
+    failed = False
+    for image in find_images(options.images):
+        for operation in options.operation or ('download', 'upload'):
+            name = os.path.basename(image)
+            try:
+                result = benchmark(directory.get_radio_by_image(image),
+                                   operation,
+                                   skip_sleeps=options.skip_sleeps,
+                                   baudrate=options.baud,
+                                   latency=options.latency,
+                                   realtime=options.realtime)
+            except Exception as e:
+                LOG.exception('%s %s failed', name, operation)
+                print('%-32s %-8s FAILED: %s' % (name, operation, e))
+                failed = True
+                continue
+            print('%-32s %-8s %8.3fs %8.3fs %8.3fs %8.3fs %8i' % (
+                name, operation, result.wall, result.cpu, result.sleep,
+                result.link, result.bytes))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
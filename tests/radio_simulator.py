@@ -0,0 +1,469 @@
+# Copyright 2026 CHIRP Contributors
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Simulated radios that serve a test image over a virtual serial port.
+
+Each simulator speaks one family of block clone protocols well enough for
+the driver to download the image from it, or upload an image to it. The
+link is modelled with a baud rate and a per-response latency: the time a
+real cable would have spent is added up in link_time, and with
+realtime=True the simulator actually waits that long.
+
+Use simulator_for() to get the right simulator for a radio class, or
+SIMULATORS to add another protocol family.
+"""
+
+import logging
+import struct
+import time
+
+from chirp.drivers import baofeng_common
+from chirp.drivers import tk8180
+from chirp.drivers import uv5r
+from chirp.drivers import uvk5
+from chirp.drivers import yaesu_clone
+
+LOG = logging.getLogger(__name__)
+
+ACK = b'\x06'
+# Held on to so that benchmarks can replace time.sleep for the driver
+# without affecting realtime simulation
+_sleep = time.sleep
+
+
+class SimulatedRadio(object):
+    """Base for a radio on the other end of a virtual serial port.
+
+    Subclasses implement handle(), which is passed everything the driver
+    has written that has not been consumed yet. It returns the number of
+    bytes it used, or zero if it needs more, and queues any reply with
+    respond().
+    """
+    def __init__(self, rclass, image, baudrate=None, latency=0.0,
+                 realtime=False, echo=False):
+        self.rclass = rclass
+        self.image = bytearray(image)
+        # The driver sets this as it would on a real port; a fixed
+        # @baudrate overrides whatever it asks for
+        self.baudrate = rclass.BAUD_RATE
+        self.link_baudrate = baudrate
+        self.latency = latency
+        self.realtime = realtime
+        self.echo = echo
+        self.timeout = None
+        self.link_time = 0.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._inbuf = bytearray()
+        self._outbuf = bytearray()
+
+    def _byte_time(self):
+        # One start bit, eight data bits, one stop bit
+        return 10.0 / (self.link_baudrate or self.baudrate or 9600)
+
+    def _spend(self, seconds):
+        self.link_time += seconds
+        if self.realtime and seconds > 0:
+            _sleep(seconds)
+
+    def prepare(self, operation):
+        """Get ready for a 'download' or 'upload' started by the driver"""
+        # Anything left over from a previous session is gone by the time
+        # the radio is put back into clone mode
+        del self._inbuf[:]
+        del self._outbuf[:]
+
+    def handle(self, data):
+        raise NotImplementedError()
+
+    def respond(self, data):
+        self._spend(self.latency + len(data) * self._byte_time())
+        self._outbuf += data
+        self.bytes_out += len(data)
+
+    def write(self, data):
+        data = bytes(data)
+        self.bytes_in += len(data)
+        self._spend(len(data) * self._byte_time())
+        if self.echo:
+            self._outbuf += data
+        self._inbuf += data
+        while self._inbuf:
+            consumed = self.handle(bytes(self._inbuf))
+            if not consumed:
+                break
+            del self._inbuf[:consumed]
+        return len(data)
+
+    def read(self, size=1):
+        data = bytes(self._outbuf[:size])
+        del self._outbuf[:size]
+        if len(data) < size:
+            # A real port would have waited this long for the rest
+            self._spend(self.timeout or 0)
+        return data
+
+    @property
+    def in_waiting(self):
+        return len(self._outbuf)
+
+    @property
+    def out_waiting(self):
+        return 0
+
+    def reset_input_buffer(self):
+        del self._outbuf[:]
+
+    def reset_output_buffer(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class BlockMemoryRadio(SimulatedRadio):
+    """A radio with an address space, part of which is the image.
+
+    LAYOUT is a list of (radio address, image offset, length) describing
+    where the image lives in the radio's memory. Everything else reads as
+    0xFF.
+    """
+    LAYOUT = []
+    MEMORY_SIZE = 0x10000
+
+    def __init__(self, *a, **k):
+        super().__init__(*a, **k)
+        self.memory = bytearray(b'\xff' * self.MEMORY_SIZE)
+        for addr, offset, length in self.layout():
+            self.memory[addr:addr + length] = self.image[offset:
+                                                         offset + length]
+
+    def layout(self):
+        return self.LAYOUT
+
+    def read_memory(self, addr, length):
+        return bytes(self.memory[addr:addr + length])
+
+    def write_memory(self, addr, data):
+        self.memory[addr:addr + len(data)] = data
+        for base, offset, length in self.layout():
+            start = max(addr, base)
+            end = min(addr + len(data), base + length)
+            if start < end:
+                self.image[offset + start - base:offset + end - base] = \
+                    data[start - addr:end - addr]
+
+
+class BaofengRadio(BlockMemoryRadio):
+    """The S/X block protocol in baofeng_common, with the ident appended
+    to the image"""
+    # The radio class attribute listing the magic strings we answer to
+    MAGIC_ATTR = '_magic'
+
+    def __init__(self, *a, **k):
+        super().__init__(*a, **k)
+        self.state = 'idle'
+        self.magics = getattr(self.rclass, self.MAGIC_ATTR)
+
+    def layout(self):
+        return [(0, 0, self.rclass._mem_size)]
+
+    def prepare(self, operation):
+        super().prepare(operation)
+        self.state = 'idle'
+
+    @property
+    def ident(self):
+        return bytes(self.image[self.rclass._mem_size:])
+
+    @property
+    def ack_block(self):
+        return self.rclass._ack_block
+
+    def handle(self, data):
+        if self.state == 'idle':
+            for magic in self.magics:
+                if data.startswith(magic):
+                    self.respond(ACK)
+                    self.state = 'magic'
+                    return len(magic)
+                elif magic.startswith(data):
+                    return 0
+            LOG.debug('Ignoring %r before magic' % data[:1])
+            return 1
+        elif self.state == 'magic' and data[:1] == b'\x02':
+            self.respond(self.ident)
+            self.state = 'ident'
+            return 1
+        elif self.state == 'ident' and data[:1] == ACK:
+            self.respond(ACK)
+            self.state = 'clone'
+            return 1
+        elif self.state != 'clone':
+            LOG.debug('Unexpected %r in state %s' % (data[:1], self.state))
+            return 1
+
+        if data[:1] == ACK:
+            if self.ack_block:
+                self.respond(ACK)
+            return 1
+        elif data[:1] == b'S':
+            if len(data) < 4:
+                return 0
+            cmd, addr, size = struct.unpack('>BHB', data[:4])
+            self.respond(struct.pack('>BHB', ord('X'), addr, size) +
+                         self.read_memory(addr, size))
+            return 4
+        elif data[:1] == b'X':
+            if len(data) < 4:
+                return 0
+            cmd, addr, size = struct.unpack('>BHB', data[:4])
+            if len(data) < 4 + size:
+                return 0
+            self.write_memory(addr, data[4:4 + size])
+            self.respond(ACK)
+            return 4 + size
+        LOG.debug('Unknown command %r' % data[:1])
+        return 1
+
+
+class UV5RRadio(BaofengRadio):
+    """The UV-5R flavour, with an eight byte ident at the start of the
+    image and the aux block after the main one"""
+    MAGIC_ATTR = '_idents'
+
+    def layout(self):
+        return [(0x0000, 0x0008, 0x1800),
+                (0x1EC0, 0x1808, 0x0140)]
+
+    @property
+    def ident(self):
+        return bytes(self.image[:8])
+
+    @property
+    def ack_block(self):
+        return True
+
+
+class UVK5Radio(BlockMemoryRadio):
+    """The UV-K5's obfuscated, CRC-protected command frames"""
+    LAYOUT = [(0, 0, uvk5.MEM_SIZE)]
+
+    def __init__(self, *a, **k):
+        self.firmware = k.pop('firmware', 'k5_2.01.26')
+        super().__init__(*a, **k)
+
+    def reply(self, body):
+        self.respond(struct.pack('>HBB', 0xabcd, len(body), 0) +
+                     uvk5.xorarr(body) + b'\x00\x00\xdc\xba')
+
+    def handle(self, data):
+        if len(data) < 4:
+            return 0
+        if data[:2] != b'\xab\xcd':
+            LOG.debug('Bad frame start %r' % data[:2])
+            return 1
+        length = data[2]
+        total = 4 + length + 2 + 2
+        if len(data) < total:
+            return 0
+        body = uvk5.xorarr(data[4:4 + length + 2])
+        body, crc = body[:length], body[length:]
+        if struct.pack('<H', uvk5.calculate_crc16_xmodem(body)) != crc:
+            LOG.debug('Bad CRC, ignoring frame')
+            return total
+
+        cmd = struct.unpack('<H', body[:2])[0]
+        if cmd == 0x0514:
+            self.reply(b'\x15\x05\x24\x00' +
+                       self.firmware.encode().ljust(16, b'\x00') +
+                       b'\x00' * 16)
+        elif cmd == 0x051B:
+            offset, size = struct.unpack('<HB', body[4:7])
+            self.reply(b'\x1c\x05' +
+                       struct.pack('<HHBB', size + 4, offset, size, 0) +
+                       self.read_memory(offset, size))
+        elif cmd == 0x051D:
+            offset, size = struct.unpack('<HB', body[4:7])
+            self.write_memory(offset, body[12:12 + size])
+            self.reply(b'\x1e\x05\x01\x00' + struct.pack('<H', offset))
+        elif cmd == 0x05DD:
+            LOG.debug('Radio reset')
+        else:
+            LOG.debug('Unknown command %04x' % cmd)
+        return total
+
+
+class TKx180Radio(BlockMemoryRadio):
+    """The Kenwood TK-x180 numbered and addressed block protocol"""
+    LAYOUT = [(0, 0, 0xD100)]
+
+    def __init__(self, *a, **k):
+        super().__init__(*a, **k)
+        self.ident = self.rclass._model.ljust(8, b'\x00')
+
+    @staticmethod
+    def _address(block_addr):
+        return block_addr - 0x0100 + 0xC000
+
+    def handle(self, data):
+        if data.startswith(b'PROGRAM'):
+            self.respond(b'\x16' + ACK)
+            return 7
+        elif b'PROGRAM'.startswith(data):
+            return 0
+        cmd = data[:1]
+        if cmd == b'\x02':
+            self.respond(self.ident)
+            return 1
+        elif cmd in (ACK, b'E'):
+            self.respond(ACK)
+            return 1
+        elif cmd == b'R':
+            if len(data) < 3:
+                return 0
+            block = struct.unpack('>H', data[1:3])[0]
+            chunk = self.read_memory(block * 0x100, 0x100)
+            if chunk == b'\xff' * 0x100:
+                self.respond(b'Z\xff')
+            else:
+                self.respond(b'W' + chunk +
+                             bytes([tk8180.checksum_data(chunk)]))
+            return 3
+        elif cmd == b'S':
+            if len(data) < 4:
+                return 0
+            addr = self._address(struct.unpack('>H', data[1:3])[0])
+            self.respond(b'X' + self.read_memory(addr, data[3]))
+            return 4
+        elif cmd == b'W':
+            if len(data) < 260:
+                return 0
+            block = struct.unpack('>H', data[1:3])[0]
+            self.write_memory(block * 0x100, data[3:259])
+            self.respond(ACK)
+            return 260
+        elif cmd == b'Z':
+            if len(data) < 4:
+                return 0
+            block = struct.unpack('>H', data[1:3])[0]
+            self.write_memory(block * 0x100, b'\xff' * 0x100)
+            self.respond(ACK)
+            return 4
+        elif cmd == b'X':
+            if len(data) < 4 or len(data) < 4 + data[3]:
+                return 0
+            addr = self._address(struct.unpack('>H', data[1:3])[0])
+            self.write_memory(addr, data[4:4 + data[3]])
+            self.respond(ACK)
+            return 4 + data[3]
+        LOG.debug('Unknown command %r' % cmd)
+        return 1
+
+
+class YaesuRadio(SimulatedRadio):
+    """The Yaesu clone mode ACK stream used by yaesu_clone.
+
+    On download the radio sends each of the radio's _block_lengths in
+    turn, waiting for an ACK between them. On upload it ACKs each block
+    but the last, which is streamed.
+    """
+    def __init__(self, *a, **k):
+        super().__init__(*a, **k)
+        self.block_lengths = self.rclass._block_lengths
+        self.operation = None
+        self._block = 0
+        self._received = 0
+
+    def _block_start(self, index):
+        return sum(self.block_lengths[:index])
+
+    def _send_block(self):
+        start = self._block_start(self._block)
+        end = start + self.block_lengths[self._block]
+        self.respond(bytes(self.image[start:end]))
+        self._block += 1
+
+    def prepare(self, operation):
+        super().prepare(operation)
+        self.operation = operation
+        self._block = 0
+        self._received = 0
+        if operation == 'download':
+            self._send_block()
+
+    def handle(self, data):
+        if self.operation == 'download':
+            if data[:1] == ACK and self._block < len(self.block_lengths):
+                self._send_block()
+            return 1
+
+        if self._block >= len(self.block_lengths):
+            LOG.debug('Ignoring %i bytes after the image' % len(data))
+            return len(data)
+        end = self._block_start(self._block + 1)
+        count = min(len(data), end - self._received)
+        self.image[self._received:self._received + count] = data[:count]
+        self._received += count
+        if self._received == end:
+            # Every block but the last is acknowledged
+            if self._block + 1 < len(self.block_lengths):
+                self.respond(ACK)
+            self._block += 1
+        return count
+
+
+# (radio base class, simulator), most specific first
+SIMULATORS = [
+    (uv5r.BaofengUV5R, UV5RRadio),
+    (baofeng_common.BaofengCommonHT, BaofengRadio),
+    (uvk5.UVK5RadioBase, UVK5Radio),
+    (tk8180.KenwoodTKx180Radio, TKx180Radio),
+    (yaesu_clone.YaesuCloneModeRadio, YaesuRadio),
+]
+
+
+def _uses_clone_of(rclass, base):
+    """Return True if @rclass clones the way @base does.
+
+    Subclasses often swap in their own protocol by overriding sync_in or
+    sync_out; one that only adjusts things and calls up to @base is fine.
+    """
+    for name in ('sync_in', 'sync_out'):
+        method = getattr(rclass, name)
+        if (method is not getattr(base, name) and
+                'super' not in method.__code__.co_names):
+            return False
+    return True
+
+
+def simulator_for(radio, **kwargs):
+    """Return a simulator serving @radio's image for its protocol"""
+    rclass = radio.__class__
+    if isinstance(radio, yaesu_clone.YaesuCloneModeRadio):
+        # Some test images have been edited without fixing the checksums,
+        # which a real radio would never send
+        radio.update_checksums()
+    image = radio.get_mmap().get_packed()
+    for base, simulator in SIMULATORS:
+        if issubclass(rclass, base) and _uses_clone_of(rclass, base):
+            if simulator is UVK5Radio and 'uvk5_firmware' in radio.metadata:
+                kwargs.setdefault('firmware',
+                                  radio.metadata['uvk5_firmware'])
+            return simulator(rclass, image, **kwargs)
+    raise NotImplementedError('No simulator for %s' % rclass.__name__)
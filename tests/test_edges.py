@@ -141,11 +141,11 @@ class TestCaseEdges(base.DriverTest):
 
     def test_check_regular_not_special(self):
         lo, hi = self.rf.memory_bounds
-        for i in range(lo, hi + 1):
-            m = self.radio.get_memory(i)
+        for m in self.radio.get_memories(lo, hi):
             self.assertEqual('', m.extd_number,
                              'Non-special memory %i should not have '
-                             'extd_number set to %r' % (i, m.extd_number))
+                             'extd_number set to %r' % (
+                                 m.number, m.extd_number))
 
     def test_get_memory_name_trailing_whitespace(self):
         if self.radio.MODEL == 'KG-UV8E':
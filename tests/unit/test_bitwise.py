@@ -15,11 +15,19 @@
 
 from builtins import bytes
 
+import os
+import tempfile
+import timeit
 import unittest
 from unittest import mock
 
 import six
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 from chirp import bitwise
 from chirp import memmap
 
@@ -388,3 +396,466 @@ class TestPath(BaseTest):
         obj.structure[1].child.childitem = 456
         self.assertEqual(123, obj.get_path('.structure[0].bar[1]'))
         self.assertEqual(456, obj.get_path('structure[1].child.childitem'))
+
+
+class TestBitwiseLazy(BaseTest):
+    fmt = ("struct {"
+           "  u16 foo;"
+           "  u8 bar:4,"
+           "     baz:4;"
+           "  struct {"
+           "    char name[2];"
+           "  } child;"
+           "  #seek 1;"
+           "} memory[4];"
+           "u8 tail;")
+
+    def _parse(self, lazy, fmt=None):
+        data = memmap.MemoryMapBytes(bytes(range(32)))
+        return data, bitwise.parse(fmt or self.fmt, data, lazy=lazy)
+
+    def test_lazy_matches_eager(self):
+        _, eager = self._parse(False)
+        _, lazy = self._parse(True)
+        self.assertEqual(eager.size(), lazy.size())
+        self.assertEqual(eager.memory.size(), lazy.memory.size())
+        self.assertEqual(eager.memory.get_raw(), lazy.memory.get_raw())
+        self.assertEqual(int(eager.tail), int(lazy.tail))
+        for a, b in zip(eager.memory, lazy.memory):
+            self.assertEqual(a.get_offset(), b.get_offset())
+            self.assertEqual(int(a.foo), int(b.foo))
+            self.assertEqual(int(a.baz), int(b.baz))
+            self.assertEqual(str(a.child.name), str(b.child.name))
+        self.assertEqual(repr(eager.memory), repr(lazy.memory))
+
+    def test_lazy_elements_on_demand(self):
+        _, obj = self._parse(True)
+        self.assertIs(obj.memory[2], obj.memory[2])
+        self.assertIs(obj.memory[-1], obj.memory[3])
+        self.assertEqual(2, len(obj.memory[1:3]))
+        self.assertEqual(4, len(list(obj.memory)))
+
+    def test_lazy_set_raw(self):
+        data, obj = self._parse(True)
+        obj.memory[3].set_raw(b'\xAA' * 5)
+        obj.memory[3].child.name = 'AB'
+        self.assertEqual(b'\xAA\xAA\xAAAB', data[18:23])
+        self.assertEqual(b'\xAA\xAA\xAAAB', obj.memory[3].get_raw())
+
+    def test_lazy_seekto_is_eager(self):
+        fmt = 'struct { #seekto 2; u8 foo; } memory[2];'
+        _, obj = self._parse(True, fmt)
+        self.assertEqual(2, obj.memory[0].foo)
+        self.assertEqual(2, obj.memory[1].foo)
+
+
+class TestBitwiseTemplates(BaseTest):
+    fmt = ("struct {"
+           "  u8 foo;"
+           "  struct {"
+           "    u8 a:4,"
+           "       b:4;"
+           "  } sub[3];"
+           "  char name[2];"
+           "} memory[100];")
+
+    def test_parsed_once(self):
+        data = memmap.MemoryMapBytes(bytes(600))
+        for lazy in (True, False):
+            with mock.patch.object(
+                    bitwise.Processor, 'parse_block',
+                    autospec=True,
+                    side_effect=bitwise.Processor.parse_block) as parse:
+                obj = bitwise.parse(self.fmt, data, lazy=lazy)
+                list(obj.memory)
+                # Once for the top level, once for the first memory and once
+                # for its first sub
+                self.assertEqual(3, parse.call_count)
+
+    def test_clones(self):
+        raw = bytes(range(256)) * 3
+        for lazy in (True, False):
+            data = memmap.MemoryMapBytes(raw)
+            obj = bitwise.parse(self.fmt, data, lazy=lazy)
+            self.assertEqual(600 * 8, obj.memory.size())
+            for i, mem in enumerate(obj.memory):
+                self.assertEqual(i * 6, mem.get_offset())
+                self.assertEqual(i * 6 + 1, mem.sub[0].get_offset())
+                self.assertEqual(i * 6 + 3, mem.sub[2].get_offset())
+                self.assertEqual(raw[i * 6 + 2] & 0xF, mem.sub[1].b)
+                self.assertEqual(raw[i * 6:i * 6 + 6], mem.get_raw())
+            obj.memory[50].sub[2].a = 1
+            obj.memory[51].name = 'AB'
+            self.assertEqual(b'\x1f', data[303])
+            self.assertEqual(b'AB', data[310:312])
+            self.assertEqual(raw[306], obj.memory[51].foo)
+            self.assertEqual(raw[297] >> 4, obj.memory[49].sub[2].a)
+            self.assertIsNot(obj.memory[1].sub[0], obj.memory[2].sub[0])
+
+
+class TestBitwiseFieldIndex(BaseTest):
+    fmt = ("struct {"
+           "  lbcd freq[4];"
+           "  u8 a:4,"
+           "     b:4;"
+           "  ul16 tone;"
+           "  u8 unknown[2];"
+           "  struct {"
+           "    u8 c;"
+           "  } sub[2];"
+           "} memory[50];"
+           "#seekto 0x400;"
+           "struct {"
+           "  char name[4];"
+           "  bit flags[8];"
+           "} settings;"
+           "#seekto 0x404;"
+           "u8 alias;")
+
+    def _index(self, lazy=True):
+        data = memmap.MemoryMapBytes(b'\x00' * 0x410)
+        return bitwise.FieldIndex(bitwise.parse(self.fmt, data, lazy=lazy))
+
+    def test_lookup(self):
+        for lazy in (True, False):
+            index = self._index(lazy)
+            self.assertEqual(['memory[0].freq'], index.lookup(0))
+            self.assertEqual(['memory[12].freq'], index.lookup(12 * 11 + 3))
+            self.assertEqual(['memory[12].a', 'memory[12].b'],
+                             index.lookup(12 * 11 + 4))
+            self.assertEqual(['memory[12].tone'], index.lookup(12 * 11 + 6))
+            self.assertEqual(['memory[12].unknown[1]'],
+                             index.lookup(12 * 11 + 8))
+            self.assertEqual(['memory[49].sub[1].c'],
+                             index.lookup(49 * 11 + 10))
+            self.assertEqual([], index.lookup(50 * 11))
+            self.assertEqual(['settings.name'], index.lookup(0x402))
+            self.assertEqual(['settings.flags[%i]' % i for i in range(8)] +
+                             ['alias'], index.lookup(0x404))
+            self.assertEqual([], index.lookup(0x405))
+
+    def test_lookup_range(self):
+        index = self._index()
+        self.assertEqual(['memory[1].sub[1].c', 'memory[2].freq',
+                          'memory[2].a', 'memory[2].b'],
+                         index.lookup_range(21, 27))
+        self.assertEqual(80, len(index.lookup_range(0, 110)))
+        self.assertEqual(['settings.name'], index.lookup_range(0x3F0, 0x401))
+
+    def test_lazy_not_materialized(self):
+        data = memmap.MemoryMapBytes(b'\x00' * 0x410)
+        obj = bitwise.parse(self.fmt, data)
+        with mock.patch.object(bitwise.structDataElement, '_clone') as clone:
+            index = bitwise.FieldIndex(obj)
+            index.lookup_range(0, 0x410)
+            clone.assert_not_called()
+
+
+class TestBitwiseSpecCache(BaseTest):
+    spec = ('struct foo { u8 bar; };\n'
+            'struct {\n'
+            '  u8 a:4, b:4; // comment\n'
+            '  struct foo foo;\n'
+            '} baz[2];\n'
+            '#seekto 0x10;\n'
+            'char name[2];\n')
+
+    def test_memory_cache(self):
+        cache = bitwise.SpecCache()
+        ast = cache.parse(self.spec)
+        self.assertIs(ast, cache.parse(self.spec))
+        self.assertEqual({'hits': 1, 'disk_hits': 0, 'misses': 1, 'size': 1},
+                         cache.stats())
+        cache.parse('u8 foo;')
+        self.assertEqual(2, cache.stats()['misses'])
+
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as d:
+            cache = bitwise.SpecCache()
+            cache.set_path(d)
+            ast = cache.parse(self.spec)
+            cache.clear()
+            with mock.patch.object(bitwise.bitwise_grammar,
+                                   'parse') as mock_parse:
+                cached = cache.parse(self.spec)
+                mock_parse.assert_not_called()
+            self.assertEqual(1, cache.stats()['disk_hits'])
+            self.assertEqual(cache._encode(ast), cache._encode(cached))
+
+            data = memmap.MemoryMapBytes(b'\x12\x34' + (b'\x00' * 14) + b'AB')
+            obj = bitwise.Processor(data, 0, self.spec).parse(cached)
+            self.assertEqual(1, obj.baz[0].a)
+            self.assertEqual(0x34, obj.baz[0].foo.bar)
+            self.assertEqual('AB', str(obj.name))
+
+    def test_disk_cache_corrupt(self):
+        with tempfile.TemporaryDirectory() as d:
+            cache = bitwise.SpecCache()
+            cache.set_path(d)
+            key = cache._key(self.spec)
+            with open(os.path.join(d, '%s.json' % key), 'w') as f:
+                f.write('{')
+            cache.parse(self.spec)
+            self.assertEqual(1, cache.stats()['misses'])
+
+    def test_key_includes_grammar(self):
+        cache = bitwise.SpecCache()
+        key = cache._key(self.spec)
+        self.assertEqual(key, bitwise.SpecCache()._key(self.spec))
+        with mock.patch.object(bitwise.SpecCache, '_grammar_digest',
+                               return_value='changed'):
+            self.assertNotEqual(key, bitwise.SpecCache()._key(self.spec))
+
+    def test_disk_cache_pruned(self):
+        with tempfile.TemporaryDirectory() as d:
+            cache = bitwise.SpecCache()
+            cache.MAX_FILES = 3
+            cache.set_path(d)
+            for i in range(5):
+                cache.parse('u8 foo%i;' % i)
+                # Make sure each one is newer than the last
+                fn = os.path.join(d, '%s.json' % cache._key('u8 foo%i;' % i))
+                os.utime(fn, (i, i))
+            # Using one makes it recent again
+            cache.clear()
+            cache.parse('u8 foo2;')
+            cache.parse('u8 foo5;')
+            self.assertEqual(3, len(os.listdir(d)))
+            cache.clear()
+            for i in (2, 4, 5):
+                cache.parse('u8 foo%i;' % i)
+            self.assertEqual(3, cache.stats()['disk_hits'])
+
+
+class TestBitwiseCompiled(BaseTest):
+    spec = ('struct {'
+            '  ul32 freq;'
+            '  u16 a;'
+            '  il16 b;'
+            '  i24 c;'
+            '  u8 d:4,'
+            '     e:4;'
+            '  ul16 f:3,'
+            '       g:13;'
+            '} memory[500];')
+
+    def test_shared_bit_classes(self):
+        obj = bitwise.parse(self.spec,
+                            memmap.MemoryMapBytes(b'\x00' * 8000))
+        self.assertIs(type(obj.memory[0].d), type(obj.memory[1].d))
+        self.assertIs(type(obj.memory[0].g), type(obj.memory[499].g))
+        self.assertIsNot(type(obj.memory[0].d), type(obj.memory[0].e))
+
+    def test_signed_24(self):
+        data = memmap.MemoryMapBytes(b'\x00' * 3)
+        obj = bitwise.parse('i24 foo;', data)
+        obj.foo = -2
+        self.assertEqual(b'\xFF\xFF\xFE', data.get_packed())
+        self.assertEqual(-2, obj.foo)
+        obj = bitwise.parse('il24 foo;', data)
+        self.assertEqual(-65537, obj.foo)
+
+    def test_matches_uncompiled(self):
+        # The shared codecs and bit-field classes must give the same tree
+        # and values as processing a freshly parsed spec
+        data = memmap.MemoryMapBytes(b'\x00' * 8000)
+        obj = bitwise.parse(self.spec, data)
+        for i, mem in enumerate(obj.memory):
+            mem.freq = 14652000 + i
+            mem.a = i
+            mem.b = -i
+            mem.c = -i
+            mem.d = i % 16
+            mem.g = i
+        ref = bitwise.Processor(data, 0, self.spec).parse(
+            bitwise.bitwise_grammar.parse(self.spec))
+
+        def values(tree):
+            return [[(name, int(field), field.get_offset(), field.size())
+                     for name, field in mem.items()]
+                    for mem in tree.memory]
+
+        self.assertEqual(values(ref), values(obj))
+        self.assertEqual((14652499, 499, -499, -499, 3, 0, 0, 499),
+                         tuple(int(v[1]) for v in obj.memory[499].items()))
+        for mem in obj.memory:
+            raw = bitwise.ul16DataElement(data, mem.g.get_offset()).get_value()
+            self.assertEqual(raw & bitwise.bits_between(0, 13), int(mem.g))
+        self.assertEqual(bitwise.parse(self.spec, data).get_raw(),
+                         obj.get_raw())
+
+
+class TestBitwiseArrayFastPaths(BaseTest):
+    def test_bcd_all_bytes(self):
+        # The tables must match the per-element arithmetic, even for
+        # invalid digits
+        data = memmap.MemoryMapBytes(bytes(range(256)))
+        obj = bitwise.parse('bbcd b[128]; lbcd lb[128];', data)
+        for i in range(128):
+            tens, ones = obj.b[i].get_value()
+            self.assertEqual(tens * 10 + ones, int(obj.b[i]))
+        b = 0
+        for item in obj.b:
+            b = b * 100 + int(item)
+        self.assertEqual(b, int(obj.b))
+        lb = 0
+        for item in reversed(list(obj.lb)):
+            lb = lb * 100 + int(item)
+        self.assertEqual(lb, int(obj.lb))
+
+    def test_bcd_set(self):
+        data = memmap.MemoryMapBytes(b'\x00' * 8)
+        obj = bitwise.parse('bbcd b[4]; lbcd lb[4];', data)
+        obj.b = 146520001
+        obj.lb = 44625000
+        self.assertEqual(b'\x46\x52\x00\x01\x00\x50\x62\x44',
+                         data.get_packed())
+        self.assertEqual(46520001, int(obj.b))
+        self.assertEqual(44625000, int(obj.lb))
+        data.clear_dirty()
+        obj.lb = 44625000
+        self.assertEqual([], data.get_dirty_ranges())
+
+    def test_char_all_bytes(self):
+        data = memmap.MemoryMapBytes(bytes(range(256)))
+        obj = bitwise.parse('char name[256];', data)
+        self.assertEqual(''.join(str(c) for c in obj.name), str(obj.name))
+        obj.name = str(obj.name)[::-1]
+        self.assertEqual(bytes(reversed(range(256))), data.get_packed())
+        obj.name = bytes(range(256))
+        self.assertEqual(bytes(range(256)), data.get_packed())
+        self.assertRaises(ValueError, setattr, obj, 'name', 'short')
+
+    def test_benchmark(self):
+        data = memmap.MemoryMapBytes(b'\x00' * 16 * 500)
+        obj = bitwise.parse('struct { lbcd freq[4]; char name[12]; } '
+                            'memory[500];', data)
+
+        def fast():
+            for mem in obj.memory:
+                mem.freq = 14652000
+                mem.name = 'CALLING     '
+                int(mem.freq), str(mem.name)
+
+        def per_item():
+            for mem in obj.memory:
+                bitwise.int_to_bcd(list(reversed(list(mem.freq))), 14652000)
+                bitwise.set_string(mem.name, 'CALLING     ')
+                bitwise.bcd_to_int(reversed(list(mem.freq)))
+                bitwise.get_string(mem.name)
+
+        bitwise.LOG.info('500 frequencies and names: %.4fs (%.4fs per item)',
+                         timeit.timeit(fast, number=5),
+                         timeit.timeit(per_item, number=5))
+
+
+@unittest.skipUnless(numpy, 'numpy is not available')
+class TestBitwiseRecords(BaseTest):
+    spec = ('struct {'
+            '  lbcd freq[4];'
+            '  bbcd offset[3];'
+            '  ul16 rtone;'
+            '  il24 shift;'
+            '  u8 unknown1:3,'
+            '     skip:1,'
+            '     power:4;'
+            '  char name[6];'
+            '  u8 unknown2[2];'
+            '  bit flags[8];'
+            '  struct {'
+            '    u16 a;'
+            '  } sub[2];'
+            '} memory[100];')
+
+    def _parse(self, lazy=True):
+        data = memmap.MemoryMapBytes(b'\xFF' * 2600)
+        obj = bitwise.parse(self.spec, data, lazy=lazy)
+        for i in range(0, 100, 3):
+            mem = obj.memory[i]
+            mem.freq = 14652000 + i
+            mem.offset = 600000
+            mem.rtone = 885
+            mem.shift = -i
+            mem.skip = i % 2
+            mem.power = 2
+            mem.name = 'CH%04i' % i
+            mem.flags[1] = 0
+            mem.sub[1].a = 0x1234
+        return data, obj
+
+    def _check(self, obj, records):
+        self.assertEqual(100, len(records))
+        for i, mem in enumerate(obj.memory):
+            rec = records[i]
+            self.assertEqual(int(mem.freq), rec['freq'])
+            self.assertEqual(int(mem.offset), rec['offset'])
+            self.assertEqual(int(mem.rtone), rec['rtone'])
+            self.assertEqual(int(mem.shift), rec['shift'])
+            self.assertEqual(int(mem.skip), rec['skip'])
+            self.assertEqual(int(mem.power), rec['power'])
+            self.assertEqual(str(mem.name).encode('latin-1'), rec['name'])
+            self.assertEqual([int(x) for x in mem.unknown2],
+                             list(rec['unknown2']))
+            self.assertEqual([int(x) for x in mem.flags], list(rec['flags']))
+            self.assertEqual(int(mem.sub[1].a), rec['sub[1].a'])
+
+    def test_to_records(self):
+        for lazy in (True, False):
+            data, obj = self._parse(lazy)
+            records = obj.memory.to_records()
+            self._check(obj, records)
+            self.assertEqual(14652003, records['freq'][3])
+            self.assertEqual(b'CH0003', records['name'][3])
+            self.assertEqual(-3, records['shift'][3])
+            # Empty detection without creating any memory objects
+            self.assertEqual(
+                list(range(0, 100, 3)),
+                list(numpy.flatnonzero(records['rtone'] != 0xFFFF)))
+
+    def test_from_records(self):
+        data, obj = self._parse()
+        records = obj.memory.to_records()
+        data.clear_dirty()
+        obj.memory.from_records(records)
+        self.assertEqual([], data.get_dirty_ranges())
+
+        records['freq'][4] = 44625000
+        records['power'][4] = 1
+        records['shift'][4] = -100000
+        records['name'][5] = b'HELLO!'
+        records['flags'][5][0] = 0
+        records['sub[0].a'][5] = 0xABCD
+        obj.memory.from_records(records)
+        self.assertEqual([(4 * 26, 6 * 26)], data.get_dirty_ranges())
+        self.assertEqual(44625000, int(obj.memory[4].freq))
+        self.assertEqual(1, obj.memory[4].power)
+        self.assertEqual(-100000, obj.memory[4].shift)
+        self.assertEqual('HELLO!', str(obj.memory[5].name))
+        self.assertEqual(0, obj.memory[5].flags[0])
+        self.assertEqual(0xABCD, obj.memory[5].sub[0].a)
+        self._check(obj, obj.memory.to_records())
+
+    def test_from_records_columns(self):
+        data, obj = self._parse()
+        records = numpy.zeros(100, dtype=[('power', 'u1')])
+        obj.memory.from_records(records)
+        self.assertEqual(0, obj.memory[1].power)
+        self.assertEqual(0x7, obj.memory[1].unknown1)
+        self.assertRaises(ValueError, obj.memory.from_records, records[:5])
+        records = numpy.zeros(100, dtype=[('bogus', 'u1')])
+        self.assertRaises(ValueError, obj.memory.from_records, records)
+
+    def test_not_structs(self):
+        obj = bitwise.parse('u8 foo[4];', memmap.MemoryMapBytes(b'1234'))
+        self.assertRaises(TypeError, obj.foo.to_records)
+
+    def test_benchmark(self):
+        data, obj = self._parse()
+        per_field = timeit.timeit(
+            lambda: [int(mem.freq) for mem in bitwise.parse(
+                self.spec, data).memory], number=5)
+        bulk = timeit.timeit(
+            lambda: bitwise.parse(self.spec, data).memory.to_records(),
+            number=5)
+        bitwise.LOG.info('100 frequencies: %.4fs per field, %.4fs bulk',
+                         per_field, bulk)
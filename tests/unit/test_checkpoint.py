@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from chirp import checkpoint
+from tests.unit import base
+
+
+class FakeRadio:
+    VENDOR = 'Baofeng'
+    MODEL = 'UV-5R'
+    VARIANT = ''
+
+    def __init__(self, port='/dev/ttyUSB0'):
+        self.pipe = mock.MagicMock()
+        self.pipe.port = port
+
+
+class TestDownloadCheckpoint(base.BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.ckptdir = os.path.join(self.tempdir, 'checkpoints')
+        patcher = mock.patch.object(checkpoint, 'checkpoint_dir',
+                                    return_value=self.ckptdir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _interrupted(self, radio, ident=b'ID', memory=None):
+        memory = memory or self._memory()
+        with self.assertRaises(ZeroDivisionError):
+            with checkpoint.DownloadCheckpoint(radio, ident) as ckpt:
+                for addr in range(0, 64, 16):
+                    ckpt.put(addr, memory[addr])
+                1 / 0
+        return ckpt.path
+
+    @staticmethod
+    def _memory(fill=b'\x01'):
+        return {addr: bytes([fill[0] + i]) * 16
+                for i, addr in enumerate(range(0, 96, 16))}
+
+    def _download(self, radio, memory):
+        reads = []
+
+        def read(addr):
+            reads.append(addr)
+            return memory[addr]
+
+        with checkpoint.DownloadCheckpoint(radio, b'ID') as ckpt:
+            data = b''.join(ckpt.fetch(addr, 16, lambda: read(addr))
+                            for addr in range(0, 96, 16))
+            ckpt.complete()
+        return data, reads, ckpt
+
+    def test_resume(self):
+        radio = FakeRadio()
+        memory = self._memory()
+        path = self._interrupted(radio)
+        self.assertTrue(os.path.exists(path))
+
+        data, reads, ckpt = self._download(radio, memory)
+        self.assertEqual(b''.join(memory[a] for a in sorted(memory)), data)
+        # Two blocks are read again to check the checkpoint
+        self.assertEqual([0, 16, 64, 80], reads)
+        self.assertEqual(2, ckpt.resumed)
+        self.assertFalse(os.path.exists(path))
+
+    def test_same_model_other_radio(self):
+        radio = FakeRadio()
+        self._interrupted(radio)
+        memory = self._memory()
+        memory[16] = b'\x55' * 16
+        data, reads, ckpt = self._download(radio, memory)
+        self.assertEqual(b''.join(memory[a] for a in sorted(memory)), data)
+        self.assertEqual(list(range(0, 96, 16)), reads)
+        self.assertEqual(0, ckpt.resumed)
+
+    def test_blank_blocks_do_not_count(self):
+        radio = FakeRadio()
+        memory = self._memory()
+        memory[0] = memory[16] = b'\xff' * 16
+        self._interrupted(radio, memory=memory)
+        data, reads, ckpt = self._download(radio, memory)
+        self.assertEqual([0, 16, 32, 48, 64, 80], reads)
+        self.assertEqual(0, ckpt.resumed)
+
+    def test_private(self):
+        path = self._interrupted(FakeRadio())
+        self.assertEqual(0o700, os.stat(self.ckptdir).st_mode & 0o777)
+        self.assertEqual(0o600, os.stat(path).st_mode & 0o777)
+
+    def test_different_radio(self):
+        self._interrupted(FakeRadio())
+        for radio, ident in ((FakeRadio('/dev/ttyUSB1'), b'ID'),
+                             (FakeRadio(), b'XX')):
+            ckpt = checkpoint.DownloadCheckpoint(radio, ident)
+            self.assertEqual({}, ckpt.blocks)
+            self.assertIsNone(ckpt.get(0, 16))
+
+    def test_wrong_size(self):
+        self._interrupted(FakeRadio())
+        ckpt = checkpoint.DownloadCheckpoint(FakeRadio(), b'ID')
+        ckpt.put(0, b'\x01' * 16)
+        ckpt.put(16, b'\x02' * 16)
+        self.assertIsNone(ckpt.get(32, 8))
+        self.assertEqual(b'\x03' * 16, ckpt.get(32, 16))
+
+    def test_stale(self):
+        path = self._interrupted(FakeRadio())
+        old = time.time() - checkpoint.MAX_AGE - 1
+        os.utime(path, (old, old))
+        ckpt = checkpoint.DownloadCheckpoint(FakeRadio(), b'ID')
+        self.assertEqual({}, ckpt.blocks)
+        self.assertFalse(os.path.exists(path))
+
+    def test_partial_record(self):
+        path = self._interrupted(FakeRadio())
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 4)
+        with checkpoint.DownloadCheckpoint(FakeRadio(), b'ID') as ckpt:
+            self.assertEqual([0, 16, 32], list(ckpt.blocks))
+            ckpt.put(48, b'\x04' * 16)
+        ckpt = checkpoint.DownloadCheckpoint(FakeRadio(), b'ID')
+        self.assertEqual(b'\x04' * 16, ckpt.blocks[48])
+
+    def test_no_port(self):
+        radio = FakeRadio()
+        radio.pipe = object()
+        with checkpoint.DownloadCheckpoint(radio) as ckpt:
+            self.assertEqual(b'\x01', ckpt.fetch(0, 1, lambda: b'\x01'))
+            ckpt.complete()
+        self.assertIsNone(ckpt.path)
+        self.assertFalse(os.path.exists(self.ckptdir))
@@ -12,6 +12,7 @@ from chirp import CHIRP_VERSION
 from chirp import chirp_common
 from chirp import directory
 from chirp import errors
+from chirp import memmap
 from chirp import settings
 
 
@@ -520,6 +521,31 @@ class TestStepFunctions(base.BaseTest):
         self.assertEqual(146118750,
                          chirp_common.fix_rounded_step(146118000))
 
+    def test_fix_rounded_step_keeps_type(self):
+        self.assertIsInstance(chirp_common.fix_rounded_step(146520000), int)
+        self.assertIsInstance(chirp_common.fix_rounded_step(146520000.0),
+                              float)
+        self.assertIsInstance(chirp_common.fix_rounded_step(146118000),
+                              float)
+
+    def test_step_cache(self):
+        chirp_common.step_cache_clear()
+        for i in range(3):
+            self.assertEqual(12.5, chirp_common.required_step(
+                self._125[0], [6.25, 12.5]))
+            self.assertEqual(12.5, chirp_common.required_step(
+                self._125[0], (6.25, 12.5)))
+        info = chirp_common.step_cache_info()
+        self.assertEqual(1, info['required_step'].misses)
+        self.assertEqual(5, info['required_step'].hits)
+
+        for i in range(3):
+            self.assertRaises(errors.InvalidDataError,
+                              chirp_common.fix_rounded_step, 146520100)
+        info = chirp_common.step_cache_info()
+        self.assertEqual(1, info['fix_rounded_step'].misses)
+        self.assertEqual(2, info['fix_rounded_step'].hits)
+
 
 class TestImageMetadata(base.BaseTest):
     def test_make_metadata(self):
@@ -666,6 +692,36 @@ class TestImageMetadata(base.BaseTest):
         }
         self.assertEqual(expected, newr.metadata)
 
+    def test_load_mmap_mapped(self):
+        class TestRadio(chirp_common.CloneModeRadio):
+            VENDOR = 'Dan'
+            MODEL = 'Foomaster 9000'
+            NEEDS_COMPAT_SERIAL = False
+
+        with tempfile.NamedTemporaryFile(suffix='.img') as f:
+            fn = f.name
+        r = TestRadio(memmap.MemoryMapBytes(b'thisisrawdata'))
+        r._metadata['someextra'] = 'foo'
+        r.save(fn)
+        self.addCleanup(os.remove, fn)
+
+        with mock.patch('chirp.memmap.MAP_THRESHOLD', 0):
+            newr = TestRadio(fn)
+        self.assertIsInstance(newr._mmap, memmap.MappedMemoryMap)
+        self.assertTrue(newr._mmap.mapped)
+        self.assertEqual(b'thisisrawdata', newr._mmap.get_packed())
+        self.assertEqual('foo', newr.metadata['someextra'])
+
+        # Saving over the file we are mapping must not corrupt it
+        newr._mmap[0] = b'T'
+        newr.save(fn)
+        self.assertFalse(newr._mmap.mapped)
+        with open(fn, 'rb') as f:
+            data, metadata = chirp_common.CloneModeRadio._strip_metadata(
+                f.read())
+        self.assertEqual(b'Thisisrawdata', data)
+        self.assertEqual('foo', metadata['someextra'])
+
     def test_sub_devices_linked_metadata(self):
         class FakeRadio(chirp_common.CloneModeRadio):
             def get_sub_devices(self):
@@ -750,6 +806,39 @@ class TestCloneModeExtras(base.BaseTest):
         self.assertNotIn('0000_comment', r.metadata['mem_extra'])
 
 
+class TestBulkMemories(base.BaseTest):
+    def _make_memories(self, *numbers):
+        mems = []
+        for number in numbers:
+            m = chirp_common.Memory(number)
+            m.freq = 146520000 + number * 10000
+            mems.append(m)
+        return mems
+
+    def test_set_get_memories(self):
+        r = FakeRadio(None)
+        r.set_memories(self._make_memories(0, 1))
+        mems = r.get_memories()
+        self.assertEqual([0, 1], [m.number for m in mems])
+        self.assertEqual([146520000, 146530000], [m.freq for m in mems])
+        self.assertEqual([1], [m.number for m in r.get_memories(1)])
+        self.assertEqual([0], [m.number for m in r.get_memories(hi=0)])
+
+    def test_set_memories_stops_on_error(self):
+        r = FakeRadio(None)
+        mems = self._make_memories(0, 1, 2)
+        with mock.patch.object(r, 'set_memory') as mock_set:
+            mock_set.side_effect = [None, errors.RadioError('fail'), None]
+            self.assertRaises(errors.RadioError, r.set_memories, mems)
+            self.assertEqual(2, mock_set.call_count)
+
+    def test_get_memories_errors(self):
+        r = FakeRadio(None)
+        r.set_memories(self._make_memories(0))
+        # Errors from get_memory() are not hidden
+        self.assertRaises(KeyError, r.get_memories, 0, 1)
+
+
 class TestOverrideRules(base.BaseTest):
     # You should not need to add your radio to this list. If you think you do,
     # please ask permission first.
@@ -896,6 +985,92 @@ class TestMemory(base.BaseTest):
             "empty=False,immutable=[],extra.test1='False',extra.test2='foo'>",
             repr(m))
 
+    def test_slots(self):
+        m = chirp_common.Memory(1)
+        self.assertFalse(hasattr(m, '__dict__'))
+        self.assertEqual([], m.extra)
+        with self.assertRaises(ValueError):
+            m.foo = 1
+        with self.assertRaises(AttributeError):
+            m.foo
+
+    def test_dupe(self):
+        m = chirp_common.DVMemory(1)
+        m.freq = 146520000
+        m.dv_rpt1call = 'W1AW  B'
+        n = m.dupe()
+        self.assertIsInstance(n, chirp_common.DVMemory)
+        self.assertEqual(m.to_dict(), n.to_dict())
+        # Unset fields stay unset, and still read as their defaults
+        self.assertNotIn('dv_urcall', n.to_dict())
+        self.assertEqual('CQCQCQ', n.dv_urcall)
+        # Validation still applies to the copy
+        with self.assertRaises(ValueError):
+            n.duplex = 'foo'
+        n.freq = 446000000
+        self.assertEqual(146520000, m.freq)
+
+    def test_clone_other_class(self):
+        m = chirp_common.DVMemory(1)
+        m.freq = 146520000
+        m.dv_code = 5
+        n = chirp_common.Memory()
+        n.clone(m)
+        self.assertEqual(146520000, n.freq)
+        self.assertNotIn('dv_code', n.to_dict())
+
+    def test_copy_subclass_with_dict(self):
+        class MyMemory(chirp_common.Memory):
+            foo = None
+
+        m = MyMemory(1)
+        m.foo = 'bar'
+        n = m.dupe()
+        self.assertEqual('bar', n.foo)
+        self.assertEqual('bar', copy.deepcopy(m).foo)
+        self.assertEqual(1, copy.deepcopy(m).number)
+
+    def test_fingerprint(self):
+        m1 = chirp_common.Memory(1)
+        m1.freq = 146520000
+        m2 = m1.dupe()
+        self.assertEqual(m1.fingerprint(), m2.fingerprint())
+
+        # Location and mutability do not matter
+        m2.number = 2
+        m2.extd_number = 'Call'
+        m2.immutable = ['freq']
+        self.assertEqual(m1.fingerprint(), m2.fingerprint())
+        self.assertEqual(m1.fingerprint(),
+                         chirp_common.FrozenMemory(m1).fingerprint())
+
+        # Setting a default is the same as leaving it unset
+        m2 = m1.dupe()
+        m2.offset = 600000
+        self.assertEqual(m1.fingerprint(), m2.fingerprint())
+
+        m2.tmode = 'TSQL'
+        self.assertNotEqual(m1.fingerprint(), m2.fingerprint())
+
+    def test_fingerprint_extra(self):
+        m1 = chirp_common.Memory(1)
+        m1.extra = settings.RadioSettingGroup('extra', 'Extra')
+        m1.extra.append(
+            settings.RadioSetting('test1', 'Test Setting 1',
+                                  settings.RadioSettingValueBoolean(False)))
+        m2 = copy.deepcopy(m1)
+        self.assertEqual(m1.fingerprint(), m2.fingerprint())
+        m2.extra['test1'].value = True
+        self.assertNotEqual(m1.fingerprint(), m2.fingerprint())
+        self.assertNotEqual(m1.fingerprint(),
+                            chirp_common.Memory(1).fingerprint())
+
+    def test_fingerprint_dv(self):
+        m1 = chirp_common.DVMemory(1)
+        m2 = m1.dupe()
+        m2.dv_rpt1call = 'W1AW  B'
+        self.assertNotEqual(m1.fingerprint(), m2.fingerprint())
+
     def test_debug_diff(self):
         m1 = chirp_common.Memory(1)
         m2 = chirp_common.Memory(1)
@@ -930,6 +1105,105 @@ class TestMemory(base.BaseTest):
 
 
 class TestRadioFeatures(base.BaseTest):
+    def _make_memories(self):
+        mems = []
+        for i, freq in enumerate([146520000, 146525000, 222000000,
+                                  446000000, 460000000]):
+            m = chirp_common.Memory(i)
+            m.freq = freq
+            mems.append(m)
+        mems[1].name = 'ab*CD'
+        mems[2].rtone = 67.0
+        mems[3].duplex = '+'
+        mems[3].offset = 5000000
+        mems[4].dtcs = 17
+        return mems
+
+    def test_validate_memories(self):
+        rf = chirp_common.RadioFeatures()
+        rf.memory_bounds = (0, 3)
+        rf.valid_bands = [(144000000, 148000000),
+                          (420000000, 450000000),
+                          (430000000, 465000000)]
+        rf.valid_tones = [88.5, 100.0]
+        rf.valid_dtcs_codes = [23, 25]
+        mems = self._make_memories()
+        results = rf.validate_memories(mems)
+        self.assertEqual([rf.validate_memory(m) for m in mems], results)
+        self.assertEqual([], results[0])
+        self.assertEqual(["Name character `a' not supported"], results[1])
+        self.assertEqual(['Tone 67.0 not supported',
+                          'Frequency 222.000000 is out of supported range'],
+                         results[2])
+        self.assertEqual([], results[3])
+        self.assertEqual(['Location 4 is out of range',
+                          'DTCS Code 017 not supported'],
+                         results[4])
+        self.assertIsInstance(results[4][0], chirp_common.ValidationWarning)
+        self.assertIsInstance(results[4][1], chirp_common.ValidationError)
+
+    def test_validate_memory_index_cached(self):
+        rf = chirp_common.RadioFeatures()
+        rf.valid_tuning_steps = []
+        rf.valid_bands = [(144000000, 148000000)]
+        m = chirp_common.Memory()
+        m.freq = 222000000
+        with mock.patch.object(chirp_common, '_FeatureIndex',
+                               wraps=chirp_common._FeatureIndex) as mock_idx:
+            self.assertNotEqual([], rf.validate_memory(m))
+            self.assertNotEqual([], rf.validate_memory(m))
+            mock_idx.assert_called_once_with(rf)
+            # Changing a feature must not use the stale index
+            rf.valid_bands = [(144000000, 148000000),
+                              (220000000, 225000000)]
+            self.assertEqual([], rf.validate_memory(m))
+            self.assertEqual(2, mock_idx.call_count)
+
+    def test_validate_memories_band_edges(self):
+        rf = chirp_common.RadioFeatures()
+        rf.valid_tuning_steps = []
+        rf.valid_bands = [(144000000, 146000000),
+                          (146000000, 148000000),
+                          (200000000, 100000000)]
+        mems = []
+        for freq in (143999999, 144000000, 146000000, 147999999, 148000000,
+                     150000000):
+            m = chirp_common.Memory()
+            m.freq = freq
+            mems.append(m)
+        self.assertEqual([True, False, False, False, True, True],
+                         [bool(x) for x in rf.validate_memories(mems)])
+
+    def test_radio_validate_memories(self):
+        class TestRadio(chirp_common.Radio):
+            def get_features(self):
+                rf = chirp_common.RadioFeatures()
+                rf.memory_bounds = (0, 10)
+                rf.valid_characters = chirp_common.CHARSET_ASCII
+                rf.valid_bands = [(144000000, 148000000)]
+                return rf
+
+        class TestRadioWithChecks(TestRadio):
+            def validate_memory(self, mem):
+                msgs = super().validate_memory(mem)
+                if mem.number == 1:
+                    msgs.append(chirp_common.ValidationError('one'))
+                return msgs
+
+        mems = self._make_memories()[:3]
+        with mock.patch.object(TestRadio, 'get_features',
+                               wraps=TestRadio(None).get_features) as gf:
+            results = TestRadio(None).validate_memories(mems)
+            gf.assert_called_once_with()
+        self.assertEqual(
+            [[], [], ['Frequency 222.000000 is out of supported range']],
+            results)
+
+        results = TestRadioWithChecks(None).validate_memories(mems)
+        self.assertEqual(
+            [[], ['one'], ['Frequency 222.000000 is out of supported range']],
+            results)
+
     def test_valid_tones(self):
         rf = chirp_common.RadioFeatures()
         # These are valid tones
@@ -34,6 +34,16 @@ class TestCLI(unittest.TestCase):
     def stdout(self):
         return '\n'.join(self.stdout_lines)
 
+    def test_profile_before_drivers(self):
+        calls = mock.Mock()
+        with mock.patch.object(main.startup_profile, 'start_from_argv',
+                               calls.start), \
+                mock.patch.object(main.directory, 'import_drivers',
+                                  calls.import_drivers):
+            main.main(args=['--mmap', self.testfile, '--get-mem', '0'])
+        self.assertEqual(['start', 'import_drivers'],
+                         [c[0] for c in calls.mock_calls])
+
     def test_cli_simple(self):
         # Super simple, just print the first memory and make sure it
         # works
@@ -3,6 +3,7 @@ import tempfile
 import unittest
 
 from chirp import chirp_common
+from chirp import errors
 from chirp.drivers import generic_csv
 
 CHIRP_CSV_LEGACY = (
@@ -186,3 +187,24 @@ class TestCSV(unittest.TestCase):
         # its internal state and the following assertion will fail.
         m.name = 'bar'
         self.assertEqual('foo', radio.get_memory(0).name)
+
+    def test_csv_get_memories(self):
+        radio = generic_csv.CSVRadio(None)
+        for i in range(3):
+            radio.set_memory(chirp_common.Memory(i, name='mem%i' % i))
+        mems = radio.get_memories(1, 2)
+        self.assertEqual(['mem1', 'mem2'], [m.name for m in mems])
+        self.assertEqual(radio.get_features().memory_bounds[1] + 1,
+                         len(radio.get_memories()))
+        # These must be copies too
+        mems[0].name = 'foo'
+        self.assertEqual('mem1', radio.get_memory(1).name)
+
+    def test_csv_get_memories_out_of_range(self):
+        radio = generic_csv.CSVRadio(None)
+        lo, hi = radio.get_features().memory_bounds
+        self.assertRaises(errors.InvalidMemoryLocation,
+                          radio.get_memories, hi - 1, hi + 1)
+        self.assertRaises(errors.InvalidMemoryLocation,
+                          radio.get_memories, lo - 1, lo + 1)
+        self.assertEqual(2, len(radio.get_memories(hi - 1, hi)))
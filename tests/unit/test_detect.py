@@ -0,0 +1,144 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from chirp import chirp_common
+from chirp import detect
+from chirp import errors
+
+
+class FakeRadio(chirp_common.LiveRadio):
+    VENDOR = 'Icom'
+    MODEL = 'IC-Fake'
+
+
+class TestMultiPortDetector(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.answer = {}
+        self.delay = 0.2
+        self.cancelled = []
+        self.useFixture(mock.patch.dict(detect.PROBE_FUNCTIONS,
+                                        {'Icom': self.fake_probe,
+                                         'Kenwood': self.fake_probe}))
+        self.useFixture(mock.patch.object(detect, 'LAST_DETECTED', None))
+        # The fake probes do not need any drivers
+        self.useFixture(mock.patch.object(detect.directory.DRV_TO_RADIO,
+                                          'load_all'))
+
+    def useFixture(self, patcher):
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fake_probe(self, port, baudrate, cancel):
+        self.calls.append((port, baudrate))
+        if port in self.answer:
+            return FakeRadio, self.answer[port]
+        # Simulate a probe that steps through baud rates until told to
+        # give up
+        for i in range(5):
+            if cancel.is_set():
+                self.cancelled.append(port)
+                raise detect.DetectCancelled('Detection cancelled')
+            time.sleep(self.delay / 5)
+        raise errors.RadioError('No response')
+
+    def test_parallel(self):
+        ports = ['/dev/ttyUSB%i' % i for i in range(8)]
+        detector = detect.MultiPortDetector(ports, vendors=['Icom'])
+        start = time.monotonic()
+        self.assertRaises(errors.RadioError, detector.detect)
+        # Serially this would take 8 * delay
+        self.assertLess(time.monotonic() - start, self.delay * 4)
+        self.assertEqual(sorted(ports), sorted(p.port
+                                               for p in detector.probes))
+        for probe in detector.probes:
+            self.assertIsNone(probe.rclass)
+            self.assertGreater(probe.elapsed, 0)
+        self.assertIsNone(detect.LAST_DETECTED)
+
+    def test_found_cancels_others(self):
+        self.delay = 1
+        self.answer['/dev/ttyUSB3'] = 19200
+        ports = ['/dev/ttyUSB%i' % i for i in range(4)]
+        detector = detect.MultiPortDetector(ports)
+        start = time.monotonic()
+        result = detector.detect()
+        # Without waiting for the others to notice
+        self.assertLess(time.monotonic() - start, self.delay / 5)
+        deadline = time.monotonic() + self.delay
+        while len(self.cancelled) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual('/dev/ttyUSB3', result.port)
+        self.assertEqual('Icom', result.vendor)
+        self.assertIs(FakeRadio, result.rclass)
+        self.assertEqual(19200, result.baudrate)
+        self.assertEqual(sorted(ports[:3]), sorted(self.cancelled))
+        # Nobody went on to probe for a Kenwood
+        self.assertEqual(4, len(self.calls))
+        self.assertEqual(result, detect.LAST_DETECTED)
+
+    def test_kenwood_cancelled(self):
+        cancel = threading.Event()
+
+        def command(ser, cmd):
+            # Another port answers while we are still trying
+            cancel.set()
+            return ''
+
+        with mock.patch.object(detect, '_open_port'), \
+                mock.patch.object(detect.kenwood_live, 'command',
+                                  side_effect=command) as mock_command:
+            self.assertRaises(detect.DetectCancelled,
+                              detect._probe_kenwoodlive, '/dev/ttyUSB0',
+                              None, cancel)
+        mock_command.assert_called_once_with(mock.ANY, 'ID')
+
+    def test_last_detected_first(self):
+        self.answer['/dev/ttyUSB1'] = 4800
+        detect.LAST_DETECTED = detect.DetectResult(
+            '/dev/ttyUSB1', 'Kenwood', FakeRadio, 4800, 1, None)
+        detector = detect.MultiPortDetector(['/dev/ttyUSB0', '/dev/ttyUSB1'])
+        result = detector.detect()
+        self.assertEqual('/dev/ttyUSB1', result.port)
+        self.assertEqual('Kenwood', result.vendor)
+        self.assertEqual([('/dev/ttyUSB1', 4800)], self.calls)
+
+    def test_last_detected_gone(self):
+        self.delay = 0
+        self.answer['/dev/ttyUSB0'] = 9600
+        detect.LAST_DETECTED = detect.DetectResult(
+            '/dev/ttyUSB1', 'Icom', FakeRadio, 4800, 1, None)
+        result = detect.detect_radio(['/dev/ttyUSB0', '/dev/ttyUSB1'],
+                                     vendors=['Icom'])
+        self.assertEqual('/dev/ttyUSB0', result.port)
+        self.assertEqual(('/dev/ttyUSB1', 4800), self.calls[0])
+        self.assertEqual(result, detect.LAST_DETECTED)
+
+
+class TestDetectIcom(unittest.TestCase):
+    def test_civ_baudrate_hint(self):
+        ser = mock.MagicMock()
+        rates = []
+
+        def fake_probe_model(ser):
+            rates.append(ser.baudrate)
+            if ser.baudrate == 19200:
+                return FakeRadio
+            raise errors.RadioError('No response')
+
+        with mock.patch.object(detect.icf, 'get_model_data',
+                               side_effect=errors.RadioError('no')), \
+                mock.patch.object(detect.icomciv, 'probe_model',
+                                  side_effect=fake_probe_model):
+            self.assertIs(FakeRadio, detect._detect_icom_radio(ser))
+            self.assertEqual([9600, 4800, 19200], rates)
+            del rates[:]
+            self.assertIs(FakeRadio, detect._detect_icom_radio(ser, 19200))
+            self.assertEqual([19200], rates)
+
+            cancel = threading.Event()
+            cancel.set()
+            self.assertRaises(detect.DetectCancelled,
+                              detect._detect_icom_radio, ser, None, cancel)
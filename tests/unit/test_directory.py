@@ -1,15 +1,18 @@
 import base64
+import copy
 import glob
 import json
 import os
 import shutil
 import tempfile
+from unittest import mock
 
 import yaml
 
 from tests.unit import base
 from chirp import chirp_common
 from chirp import directory
+from chirp import errors
 
 
 class TestDirectory(base.BaseTest):
@@ -78,6 +81,165 @@ class TestDirectory(base.BaseTest):
         self.assertEqual('Barmaster 2000', radio.MODEL)
         self.assertEqual('A', radio.VARIANT)
 
+    def test_detect_with_metadata_unknown_model(self):
+        fn = os.path.join(self.tempdir, 'testfile')
+        with open(fn, 'wb') as f:
+            f.write(b'thisisrawdata')
+            f.write(self.test_class.MAGIC + b'-')
+            f.write(base64.b64encode(json.dumps(
+                {'vendor': 'Dan', 'model': 'Foomaster 9001'}).encode()))
+        self.assertRaises(errors.ImageMetadataInvalidModel,
+                          directory.get_radio_by_image, fn)
+
+    def test_detect_cached_by_content(self):
+        fn = os.path.join(self.tempdir, 'testfile')
+        with open(fn, 'wb') as f:
+            f.write(b'thisisrawdata')
+        with mock.patch.object(self.test_class, 'match_model',
+                               return_value=True) as mock_match:
+            self._test_detect_finds_our_class(fn)
+            self._test_detect_finds_our_class(fn)
+            mock_match.assert_called_once_with(b'thisisrawdata', fn)
+
+    def test_detect_size_candidates(self):
+        @directory.register
+        class SizeRadio(chirp_common.CloneModeRadio):
+            VENDOR = 'Dan'
+            MODEL = 'Sizemaster'
+            _memsize = 17
+
+        self.addCleanup(directory.DRV_TO_RADIO.__delitem__, 'Dan_Sizemaster')
+        index = directory._detection_index()
+        self.assertIn('Dan_Sizemaster', index.candidates(17))
+        self.assertNotIn('Dan_Sizemaster', index.candidates(18))
+        self.assertIn('Dan_Foomaster_9000_R', index.candidates(18))
+        fn = os.path.join(self.tempdir, 'testfile')
+        with open(fn, 'wb') as f:
+            f.write(b'\x00' * 17)
+        with mock.patch.object(SizeRadio, 'load_mmap'):
+            radio = directory.get_radio_by_image(fn)
+        self.assertIsInstance(radio, SizeRadio)
+
+
+class TestDriverIndex(base.BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.index = directory.load_driver_index()
+        self.assertIsNotNone(self.index)
+        directory.enable_reregistrations()
+
+    def _use_registry(self):
+        # Only use this with fake drivers, real modules imported while it
+        # is in place would never register with the real directory
+        self.registry = directory.DriverRegistry()
+        patcher = mock.patch.object(directory, 'DRV_TO_RADIO', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _fake_class(self):
+        class FakeRadio(chirp_common.CloneModeRadio):
+            VENDOR = 'Dan'
+            MODEL = 'Lazymaster'
+            VARIANT = ''
+            ALIASES = []
+        return FakeRadio
+
+    def test_index_matches_drivers(self):
+        # Every driver in an up-to-date module must be described correctly
+        directory.import_drivers()
+        chirp_base = os.path.dirname(directory.__file__)
+        for ident, entry in self.index['drivers'].items():
+            info = self.index['modules'][entry['module']]
+            path = os.path.join(chirp_base, 'drivers',
+                                entry['module'] + '.py')
+            if info['checksum'] != directory._module_checksum(path):
+                continue
+            rclass = directory.get_radio(ident)
+            # This may have been imported directly by another test
+            for module in entry['requires']:
+                __import__('chirp.drivers.%s' % module)
+            self.assertEqual(entry, directory.driver_entry(rclass))
+
+    def test_lazy_load(self):
+        self._use_registry()
+        fake = self._fake_class()
+        entry = directory.driver_entry(fake)
+        entry['module'] = 'fakemodule'
+        self.registry.defer('Dan_Lazymaster', entry)
+        self.assertIn('Dan_Lazymaster', self.registry)
+        self.assertEqual(['Dan_Lazymaster'], self.registry.keys())
+        self.assertEqual(1, len(self.registry))
+        self.assertFalse(self.registry.is_loaded('Dan_Lazymaster'))
+
+        with mock.patch('importlib.import_module') as mock_import:
+            mock_import.side_effect = lambda m: directory.register(fake)
+            self.assertIs(fake, self.registry['Dan_Lazymaster'])
+            mock_import.assert_called_once_with('chirp.drivers.fakemodule')
+            self.assertTrue(self.registry.is_loaded('Dan_Lazymaster'))
+            self.assertIs(fake, self.registry['Dan_Lazymaster'])
+            mock_import.assert_called_once_with('chirp.drivers.fakemodule')
+
+    def test_lazy_load_not_registered(self):
+        self._use_registry()
+        entry = directory.driver_entry(self._fake_class())
+        entry['module'] = 'fakemodule'
+        self.registry.defer('Dan_Lazymaster', entry)
+        with mock.patch('importlib.import_module'):
+            self.assertRaises(KeyError,
+                              self.registry.__getitem__, 'Dan_Lazymaster')
+        self.assertNotIn('Dan_Lazymaster', self.registry)
+
+    def test_driver_info_alias(self):
+        self._use_registry()
+        fake = self._fake_class()
+        fake.ALIASES = [type('FakeAlias', (chirp_common.Alias,),
+                             {'VENDOR': 'Taylor', 'MODEL': 'Lazy2',
+                              'VARIANT': 'B'})]
+        directory.register(fake)
+        infos = directory.get_driver_infos()
+        self.assertEqual([('Dan', 'Lazymaster', ''),
+                          ('Taylor', 'Lazy2', 'B')],
+                         [(i.VENDOR, i.MODEL, i.VARIANT) for i in infos])
+        self.assertIs(fake, infos[0].get_class())
+        alias = infos[1].get_class()
+        self.assertTrue(issubclass(alias, fake))
+        self.assertIs(fake, alias._orig_rclass)
+        self.assertEqual('Lazy2', alias.MODEL)
+        self.assertIs(alias, infos[1].get_class())
+
+    def test_import_drivers_stale(self):
+        self._use_registry()
+        # A changed module, and anything built on it, must be imported
+        index = copy.deepcopy(self.index)
+        index['modules']['baofeng_common']['checksum'] = 0
+        dependents = {m for m, info in index['modules'].items()
+                      if 'baofeng_common' in info['depends']}
+        self.assertNotEqual(set(), dependents)
+        fn = os.path.join(tempfile.mkdtemp(), 'index.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(fn))
+        with open(fn, 'w') as f:
+            json.dump(index, f)
+
+        with mock.patch.object(directory, 'DRIVER_INDEX', fn), \
+                mock.patch('importlib.import_module') as mock_import:
+            directory.import_drivers()
+        imported = {c[0][0].split('.')[-1]
+                    for c in mock_import.call_args_list}
+        self.assertEqual(dependents | {'baofeng_common'}, imported)
+        for ident in self.registry.keys():
+            self.assertNotIn(self.registry.get_entry(ident)['module'],
+                             imported)
+        self.assertIn('Baofeng_UV-5R', self.registry)
+
+    def test_import_drivers_no_index(self):
+        self._use_registry()
+        with mock.patch.object(directory, 'DRIVER_INDEX', '/nonexistent'), \
+                mock.patch('importlib.import_module') as mock_import:
+            directory.import_drivers()
+        self.assertEqual(len(self.index['modules']),
+                         mock_import.call_count)
+        self.assertEqual(0, len(self.registry))
+
 
 class TestDetectBruteForce(base.BaseTest):
     def test_detect_all(self):
@@ -93,7 +255,7 @@ class TestDetectBruteForce(base.BaseTest):
         for image in test_images:
             detections = []
             filedata = open(image, 'rb').read()
-            for cls in directory.RADIO_TO_DRV:
+            for cls in directory.DRV_TO_RADIO.values():
                 if not hasattr(cls, 'match_model'):
                     continue
                 if cls.match_model(filedata, image):
@@ -102,6 +264,53 @@ class TestDetectBruteForce(base.BaseTest):
                 raise Exception('Detection of %s failed: %s' % (image,
                                                                 detections))
 
+    def test_detect_without_metadata(self):
+        # Images without metadata must detect as the first driver to
+        # register that claims them, just like a linear scan would
+        directory.import_drivers()
+        order = [directory.DRV_TO_RADIO[ident]
+                 for ident in directory.DRV_TO_RADIO.registration_order()]
+        path = os.path.join(os.path.dirname(__file__), '..', 'images')
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        detected = {}
+        for image in sorted(glob.glob(os.path.join(path, '*.img'))):
+            with open(image, 'rb') as f:
+                filedata, _ = chirp_common.CloneModeRadio._strip_metadata(
+                    f.read())
+            fn = os.path.join(tempdir, os.path.basename(image))
+            with open(fn, 'wb') as f:
+                f.write(filedata)
+            expected = None
+            for rclass in order:
+                try:
+                    if rclass.match_model(filedata, fn):
+                        expected = rclass
+                        break
+                except Exception:
+                    pass
+            found = directory._match_image(filedata, fn)
+            self.assertIs(expected, found, os.path.basename(image))
+            detected[os.path.basename(image)] = getattr(found, '__name__',
+                                                        None)
+
+        for model in ('FT-4XR', 'FT-4VR', 'FT-4XE', 'FT-65E', 'FT-65R',
+                      'FT-25R'):
+            self.assertEqual('YaesuFT4XRRadio',
+                             detected['Yaesu_%s.img' % model])
+        self.assertEqual('KTWP12', detected['Anysecu_WP-9900.img'])
+
+    def test_registration_order(self):
+        registry = directory.DriverRegistry()
+        for ident in ('Dan_A', 'Dan_B', 'Dan_C'):
+            registry.defer(ident, {'module': 'fakemodule'})
+        registry.set_order(['Dan_C', 'Dan_A', 'Dan_B'])
+        self.assertEqual(['Dan_C', 'Dan_A', 'Dan_B'],
+                         registry.registration_order())
+        # Drivers missing from the index go last
+        registry.defer('Dan_0', {'module': 'fakemodule'})
+        self.assertEqual('Dan_0', registry.registration_order()[-1])
+
 
 class TestAliasMap(base.BaseTest):
     def test_uniqueness(self):
@@ -355,7 +355,7 @@ class ImportFieldTests(base.BaseTest):
         src_rf = chirp_common.RadioFeatures()
         mem = chirp_common.Memory()
 
-        with mock.patch.object(mem, 'dupe') as mock_dupe:
+        with mock.patch.object(chirp_common.Memory, 'dupe') as mock_dupe:
             mock_dupe.return_value = mem
             with mock.patch.object(radio, 'validate_memory') as mock_val:
                 mock_val.return_value = errors
@@ -374,7 +374,7 @@ class ImportFieldTests(base.BaseTest):
         radio = FakeRadio(None)
         src_rf = chirp_common.RadioFeatures()
         mem = chirp_common.Memory()
-        with mock.patch.object(mem, 'dupe') as mock_dupe:
+        with mock.patch.object(chirp_common.Memory, 'dupe') as mock_dupe:
             mock_dupe.return_value = mem
             import_logic.import_mem(radio, src_rf, mem)
             mock_check.assert_called_once_with(mock_get.return_value, mem)
@@ -426,6 +426,14 @@ class ImportFieldTests(base.BaseTest):
                           self._test_import_mem,
                           [chirp_common.ValidationError('Test')])
 
+    def test_import_mem_no_validate(self):
+        radio = FakeRadio(None)
+        src_rf = chirp_common.RadioFeatures()
+        mem = chirp_common.Memory()
+        with mock.patch.object(radio, 'validate_memory') as mock_val:
+            import_logic.import_mem(radio, src_rf, mem, validate=False)
+            mock_val.assert_not_called()
+
     def test_import_bank(self):
         dst_mem = chirp_common.Memory()
         dst_mem.number = 1
@@ -0,0 +1,263 @@
+import itertools
+import shutil
+import tempfile
+from unittest import mock
+
+from chirp import chirp_common
+from chirp.drivers import kenwood_live
+from tests.unit import base
+
+
+class FakeKenwood(object):
+    """A live-mode Kenwood that answers each command as it arrives"""
+    def __init__(self, radio_id='TM-D710', delimiter='\r', memories=None,
+                 port=None):
+        self.radio_id = radio_id
+        self.delimiter = delimiter
+        self.memories = memories or {}
+        self.port = port
+        self.baudrate = 9600
+        self.timeout = 0.1
+        self.commands = []
+        self.most_queued = 0
+        self.drop = set()
+        self.busy = set()
+        self._in = ''
+        self._out = bytearray()
+
+    def _respond(self, cmd):
+        if cmd == 'ID':
+            if self.delimiter == ';':
+                return self.radio_id
+            return 'ID %s' % self.radio_id
+        elif cmd == 'AI 0':
+            return 'AI 0'
+        elif cmd.startswith('ME '):
+            number = int(cmd[3:6])
+            if number not in self.memories:
+                return 'N'
+            if ',' in cmd:
+                self.memories[number] = (cmd[7:], self.memories[number][1])
+            return 'ME %03i,%s' % (number, self.memories[number][0])
+        elif cmd.startswith('MN '):
+            number = int(cmd[3:6])
+            if ',' in cmd:
+                self.memories[number] = (self.memories[number][0], cmd[7:])
+            return 'MN %03i,%s' % (number, self.memories[number][1])
+        return '?'
+
+    def write(self, data):
+        self._in += data.decode()
+        while self.delimiter in self._in:
+            cmd, self._in = self._in.split(self.delimiter, 1)
+            self.commands.append(cmd)
+            if cmd in self.drop:
+                self.drop.remove(cmd)
+                continue
+            if cmd in self.busy:
+                self.busy.remove(cmd)
+                self._out += ('?' + self.delimiter).encode()
+                continue
+            self._out += (self._respond(cmd) + self.delimiter).encode()
+        self.most_queued = max(self.most_queued,
+                               self._out.count(self.delimiter.encode()))
+
+    def read(self, size=1):
+        data = bytes(self._out[:size])
+        del self._out[:size]
+        return data
+
+    def reset_input_buffer(self):
+        del self._out[:]
+
+
+def make_memories(count):
+    radio = kenwood_live.TMD710Radio(None)
+    memories = {}
+    for i in range(0, count, 2):
+        mem = chirp_common.Memory()
+        mem.number = i
+        mem.freq = 146000000 + i * 25000
+        mem.duplex = '+' if i % 4 else ''
+        mem.offset = 600000
+        spec = ','.join(radio._make_mem_spec(mem))
+        memories[i] = (spec, 'CH%i' % i)
+    return memories
+
+
+class TestKenwoodLive(base.BaseTest):
+    def setUp(self):
+        super().setUp()
+        # Make timeouts pass quickly
+        clock = itertools.count(step=0.01)
+        self.mocks.append(mock.patch('time.monotonic',
+                                     side_effect=lambda: next(clock)))
+        self.mocks.append(mock.patch('time.sleep'))
+        for m in self.mocks:
+            m.start()
+
+    def test_pipeline(self):
+        fake = FakeKenwood(memories=make_memories(20))
+        results = kenwood_live.pipeline(
+            fake, [('ME', '%03i' % i) for i in range(20)], depth=3)
+        self.assertEqual(20, len(results))
+        self.assertEqual('N', results[1])
+        self.assertTrue(results[2].startswith('ME 002,'))
+        self.assertEqual(3, fake.most_queued)
+
+    def test_pipeline_lost_response(self):
+        fake = FakeKenwood(memories=make_memories(10))
+        fake.drop.add('ME 004')
+        results = kenwood_live.pipeline(
+            fake, [('ME', '%03i' % i) for i in range(10)], depth=4)
+        self.assertTrue(results[4].startswith('ME 004,'))
+        self.assertTrue(results[6].startswith('ME 006,'))
+        self.assertEqual(['ME 000', 'N', 'ME 002', 'N', 'ME 004'],
+                         [r.split(',')[0] for r in results[:5]])
+        # Everything from the lost one on is sent again
+        self.assertEqual(2, fake.commands.count('ME 005'))
+
+    def test_ports_are_independent(self):
+        old = FakeKenwood()
+        new = FakeKenwood(radio_id='ID019', delimiter=';')
+        self.assertEqual('TM-D710', kenwood_live.get_id(old))
+        self.assertEqual('TS-2000', kenwood_live.get_id(new))
+        # Each port keeps the delimiter its radio answered to
+        self.assertEqual('ID TM-D710', kenwood_live.command(old, 'ID'))
+        self.assertEqual('ID019', kenwood_live.command(new, 'ID'))
+
+    def test_get_memories(self):
+        memories = make_memories(30)
+        radio = kenwood_live.TMD710Radio(FakeKenwood(memories=memories))
+        single = kenwood_live.TMD710Radio(FakeKenwood(memories=memories))
+        bulk = radio.get_memories(0, 29)
+        self.assertEqual(30, len(bulk))
+        for mem in bulk:
+            self.assertEqual(single.get_memory(mem.number).fingerprint(),
+                             mem.fingerprint())
+        self.assertEqual('CH4', bulk[4].name)
+        self.assertTrue(bulk[5].empty)
+        # Not pipelined unless the model has been tested with it
+        self.assertEqual(1, radio.pipe.most_queued)
+
+        # Everything is cached now
+        count = len(radio.pipe.commands)
+        radio.get_memories(0, 29)
+        radio.get_memory(12)
+        self.assertEqual(count, len(radio.pipe.commands))
+
+    def test_get_memories_pipelined(self):
+        memories = make_memories(30)
+        radio = kenwood_live.TMD710Radio(FakeKenwood(memories=memories))
+        radio._pipeline_depth = 4
+        bulk = radio.get_memories(0, 29)
+        self.assertEqual(4, radio.pipe.most_queued)
+        self.assertEqual(['CH%i' % i if i % 2 == 0 else ''
+                          for i in range(30)],
+                         [m.name for m in bulk])
+
+    def test_pipeline_busy(self):
+        fake = FakeKenwood(memories=make_memories(10))
+        fake.busy.update(['ME 002', 'MN 004'])
+        results = kenwood_live.pipeline(
+            fake, [('ME', '%03i' % i) for i in range(4)] +
+            [('MN', '004')], depth=5)
+        self.assertTrue(results[2].startswith('ME 002,'))
+        self.assertEqual('MN 004,CH4', results[4])
+        self.assertEqual(2, fake.commands.count('ME 002'))
+        # Errors that are the real answer stay that way
+        self.assertEqual('N', results[1])
+
+    def test_persistent_cache(self):
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        self.mocks.append(mock.patch.object(kenwood_live, 'cache_dir',
+                                            return_value=tempdir))
+        self.mocks.append(mock.patch.object(kenwood_live, 'PERSIST_CACHE',
+                                            True))
+        for m in self.mocks[-2:]:
+            m.start()
+
+        memories = make_memories(40)
+        radio = kenwood_live.TMD710Radio(FakeKenwood(memories=memories,
+                                                     port='/dev/ttyUSB0'))
+        first = radio.get_memories(0, 39)
+
+        radio = kenwood_live.TMD710Radio(FakeKenwood(memories=memories,
+                                                     port='/dev/ttyUSB0'))
+        second = radio.get_memories(0, 39)
+        self.assertEqual([m.fingerprint() for m in first],
+                         [m.fingerprint() for m in second])
+        # Only a sample is read again to check the cache
+        reads = [c for c in radio.pipe.commands if c.startswith('ME ')]
+        self.assertEqual(kenwood_live.CACHE_CHECK_COUNT, len(reads))
+
+        # Another port is another radio
+        other = kenwood_live.TMD710Radio(FakeKenwood(memories=memories,
+                                                     port='/dev/ttyUSB1'))
+        other.get_memory(0)
+        self.assertIn('ME 000', other.pipe.commands)
+
+        # Changing a memory means reading it from the radio again
+        mem = second[2]
+        mem.name = 'NEW'
+        radio.set_memory(mem)
+        radio = kenwood_live.TMD710Radio(FakeKenwood(memories=memories,
+                                                     port='/dev/ttyUSB0'))
+        self.assertEqual('NEW', radio.get_memory(2).name)
+        self.assertIn('MN 002', radio.pipe.commands)
+
+    def test_persistent_cache_errors(self):
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        self.mocks.append(mock.patch.object(kenwood_live, 'cache_dir',
+                                            return_value=tempdir))
+        self.mocks.append(mock.patch.object(kenwood_live, 'PERSIST_CACHE',
+                                            True))
+        for m in self.mocks[-2:]:
+            m.start()
+
+        memories = make_memories(10)
+        radio = kenwood_live.TMD710Radio(FakeKenwood(memories=memories,
+                                                     port='/dev/ttyUSB0'))
+        radio.pipe.busy.add('MN 002')
+        radio.get_memories(0, 9)
+        # A name the radio was too busy to give is not cached
+        self.assertNotIn(2, radio._persistent.entries)
+        self.assertIn(4, radio._persistent.entries)
+
+    def test_persistent_cache_front_panel(self):
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        self.mocks.append(mock.patch.object(kenwood_live, 'cache_dir',
+                                            return_value=tempdir))
+        self.mocks.append(mock.patch.object(kenwood_live, 'PERSIST_CACHE',
+                                            True))
+        for m in self.mocks[-2:]:
+            m.start()
+
+        memories = make_memories(10)
+        radio = kenwood_live.TMD710Radio(FakeKenwood(memories=memories,
+                                                     port='/dev/ttyUSB0'))
+        radio.get_memories(0, 9)
+
+        # Another radio of the same model on the same port, or this one
+        # changed from the front panel
+        memories = make_memories(10)
+        memories[2] = (memories[2][0], 'PANEL')
+        memories[9] = memories[8]
+        radio = kenwood_live.TMD710Radio(FakeKenwood(memories=memories,
+                                                     port='/dev/ttyUSB0'))
+        mems = radio.get_memories(0, 9)
+        self.assertEqual('PANEL', mems[2].name)
+        self.assertFalse(mems[9].empty)
+        self.assertIn('ME 009', radio.pipe.commands)
+
+    def test_pipeline_no_flush(self):
+        fake = FakeKenwood(memories=make_memories(10))
+        fake.drop.add('ME 004')
+        with mock.patch.object(fake, 'reset_input_buffer',
+                               side_effect=OSError):
+            results = kenwood_live.pipeline(
+                fake, [('ME', '%03i' % i) for i in range(10)], depth=4)
+        self.assertTrue(results[4].startswith('ME 004,'))
@@ -0,0 +1,173 @@
+import copy
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from chirp import memmap
+
+
+class TestMemoryMapBytes(unittest.TestCase):
+    def test_get_set(self):
+        mmap = memmap.MemoryMapBytes(b'\x00' * 8)
+        mmap[1] = 0x101
+        mmap[2] = b'AB'
+        mmap.set(4, bytearray(b'CD'))
+        self.assertEqual(b'\x00\x01ABCD\x00\x00', mmap.get_packed())
+        self.assertEqual(b'AB', mmap[2:4])
+        self.assertEqual(b'AB', mmap.get(2, 2))
+        self.assertEqual(b'D\x00\x00', mmap.get(5, -1))
+        self.assertEqual(b'\x00\x01', mmap[:2])
+        self.assertEqual(b'\x00\x00', mmap[6:])
+        self.assertEqual(8, len(mmap))
+
+    def test_set_out_of_bounds(self):
+        mmap = memmap.MemoryMapBytes(b'\x00' * 4)
+        self.assertRaises(IndexError, mmap.set, 3, b'AB')
+        self.assertRaises(IndexError, mmap.set, 4, 1)
+        self.assertEqual(4, len(mmap))
+        mmap[-2] = b'AB'
+        self.assertEqual(b'\x00\x00AB', mmap.get_packed())
+
+    def test_view(self):
+        mmap = memmap.MemoryMapBytes(b'\x01\x02\x03\x04')
+        view = mmap.get_view(1, 2)
+        self.assertEqual(5, sum(view))
+        self.assertTrue(view.readonly)
+        mmap[1] = 0x10
+        self.assertEqual(b'\x10\x03', bytes(view))
+        self.assertEqual(b'\x01\x10\x03\x04', bytes(mmap.get_view()))
+
+    def test_truncate(self):
+        mmap = memmap.MemoryMapBytes(b'\x01\x02\x03\x04')
+        mmap.truncate(2)
+        self.assertEqual(b'\x01\x02', mmap.get_packed())
+        self.assertEqual(b'\x02', mmap[1:4])
+
+    def test_copy(self):
+        mmap = memmap.MemoryMapBytes(b'\x01\x02')
+        other = copy.deepcopy(mmap)
+        other[0] = 5
+        self.assertEqual(b'\x01\x02', mmap.get_packed())
+        self.assertEqual(b'\x05\x02', other.get_packed())
+
+    def test_compat_shares_data(self):
+        mmap = memmap.MemoryMap('ab')
+        mmb = mmap.get_byte_compatible()
+        mmb[0] = b'c'
+        self.assertEqual('cb', mmap.get_packed())
+        self.assertEqual('b', mmap[1])
+
+
+class TestMemoryMapDirty(unittest.TestCase):
+    def test_new_map_is_dirty(self):
+        mmap = memmap.MemoryMapBytes(b'\x00' * 16)
+        self.assertEqual([(0, 16)], mmap.get_dirty_ranges())
+        self.assertTrue(mmap.is_dirty(15))
+
+    def test_track_writes(self):
+        mmap = memmap.MemoryMapBytes(b'\x00' * 16)
+        mmap.clear_dirty()
+        self.assertEqual([], mmap.get_dirty_ranges())
+        mmap[2] = b'\x00\x00'
+        mmap[3] = 0
+        self.assertEqual([], mmap.get_dirty_ranges())
+        mmap[2] = b'\x01\x02'
+        mmap[4] = 3
+        mmap[10] = b'AB'
+        mmap[-1] = 1
+        self.assertEqual([(2, 5), (10, 12), (15, 16)],
+                         mmap.get_dirty_ranges())
+        self.assertTrue(mmap.is_dirty(0, 3))
+        self.assertFalse(mmap.is_dirty(5, 5))
+        self.assertTrue(mmap.is_dirty(11))
+        mmap.clear_dirty()
+        self.assertFalse(mmap.is_dirty(0, 16))
+        mmap.mark_dirty(8)
+        self.assertEqual([(8, 16)], mmap.get_dirty_ranges())
+
+    def test_clear_range(self):
+        mmap = memmap.MemoryMapBytes(b'\x00' * 16)
+        mmap.clear_dirty(4, 8)
+        self.assertEqual([(0, 4), (12, 16)], mmap.get_dirty_ranges())
+        mmap.clear_dirty(10)
+        self.assertEqual([(0, 4)], mmap.get_dirty_ranges())
+        mmap.mark_dirty(6, 2)
+        mmap.clear_dirty(2, 5)
+        self.assertEqual([(0, 2), (7, 8)], mmap.get_dirty_ranges())
+
+    def test_many_writes_compact(self):
+        mmap = memmap.MemoryMapBytes(b'\x00' * 1024)
+        mmap.clear_dirty()
+        for i in range(0, 1024, 2):
+            mmap[i] = 1
+        for i in range(0, 1024, 2):
+            mmap[i] = 2
+        self.assertLess(len(mmap._dirty), 1024)
+        self.assertEqual(512, len(mmap.get_dirty_ranges()))
+        self.assertFalse(mmap.is_dirty(1001))
+
+    def test_compat_shares_dirty(self):
+        mmap = memmap.MemoryMap('abcd')
+        mmap.clear_dirty()
+        mmap.get_byte_compatible()[1] = b'x'
+        self.assertEqual([(1, 2)], mmap.get_dirty_ranges())
+
+
+class TestMappedMemoryMap(unittest.TestCase):
+    def setUp(self):
+        fd, self.fn = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b'\x01\x02\x03\x04trailer')
+        threshold = mock.patch('chirp.memmap.MAP_THRESHOLD', 0)
+        threshold.start()
+        self.addCleanup(threshold.stop)
+        self.addCleanup(os.remove, self.fn)
+
+    def test_map_file_threshold(self):
+        with mock.patch('chirp.memmap.MAP_THRESHOLD', 1024):
+            self.assertIsNone(memmap.map_file(self.fn))
+        mapping = memmap.map_file(self.fn)
+        self.assertEqual(11, len(mapping))
+        mapping.close()
+
+    def test_copy_on_write(self):
+        mmap = memmap.MappedMemoryMap(memmap.map_file(self.fn), 4)
+        self.assertTrue(mmap.mapped)
+        self.assertEqual(4, len(mmap))
+        self.assertEqual(b'\x01\x02\x03\x04', mmap.get_packed())
+        mmap.clear_dirty()
+        mmap[1] = 0x10
+        mmap[2] = b'AB'
+        self.assertEqual(b'\x01\x10AB', mmap.get_packed())
+        self.assertEqual([(1, 4)], mmap.get_dirty_ranges())
+        with open(self.fn, 'rb') as f:
+            self.assertEqual(b'\x01\x02\x03\x04trailer', f.read())
+
+    def test_detach(self):
+        mmap = memmap.MappedMemoryMap(memmap.map_file(self.fn), 4)
+        mmap[0] = 0x10
+        mapping = mmap._mapping
+        mmap.detach()
+        self.assertFalse(mmap.mapped)
+        self.assertTrue(mapping.closed)
+        self.assertEqual(b'\x10\x02\x03\x04', mmap.get_packed())
+        mmap[3] = 0x40
+        self.assertEqual(b'\x10\x02\x03\x40', mmap.get_packed())
+
+    def test_detach_with_view(self):
+        mmap = memmap.MappedMemoryMap(memmap.map_file(self.fn), 4)
+        view = mmap.get_view()
+        mmap.detach()
+        self.assertEqual(b'\x01\x02\x03\x04', bytes(view))
+        self.assertEqual(b'\x01\x02\x03\x04', mmap.get_packed())
+
+    def test_copy(self):
+        mmap = memmap.MappedMemoryMap(memmap.map_file(self.fn), 4)
+        mmap[0] = 0x10
+        copied = copy.deepcopy(mmap)
+        self.assertFalse(copied.mapped)
+        self.assertTrue(mmap.mapped)
+        copied[1] = 0x20
+        self.assertEqual(b'\x10\x20\x03\x04', copied.get_packed())
+        self.assertEqual(b'\x10\x02\x03\x04', mmap.get_packed())
@@ -0,0 +1,133 @@
+import os
+from unittest import mock
+
+from chirp import directory
+from chirp.drivers import ft1802
+from chirp.drivers import uv5r
+from chirp.drivers import uv6r
+from chirp.drivers import uvk5
+from chirp.drivers import yaesu_clone
+from tests import clone_benchmark
+from tests import radio_simulator
+from tests.unit import base
+
+IMAGES = os.path.join(os.path.dirname(__file__), '..', 'images')
+
+
+class TestRadioSimulator(base.BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.mocks.append(mock.patch('time.sleep'))
+        self.mocks[-1].start()
+
+    def _radio(self, rclass, image):
+        return rclass(os.path.join(IMAGES, image))
+
+    def _download(self, radio, **kwargs):
+        sim = radio_simulator.simulator_for(radio, **kwargs)
+        sim.prepare('download')
+        downloaded = radio.__class__(sim)
+        downloaded.sync_in()
+        return sim, downloaded
+
+    def _upload(self, radio, **kwargs):
+        sim = radio_simulator.simulator_for(radio, **kwargs)
+        sim.prepare('upload')
+        radio.set_pipe(sim)
+        radio.sync_out()
+        return sim
+
+    def _test_round_trip(self, rclass, image, differential=True):
+        radio = self._radio(rclass, image)
+        sim, downloaded = self._download(radio)
+        self.assertEqual(radio.get_mmap().get_packed(),
+                         downloaded.get_mmap().get_packed())
+
+        target = downloaded
+        if downloaded.get_features().has_sub_devices:
+            target = downloaded.get_sub_devices()[0]
+        rf = target.get_features()
+        mem = [m for m in (target.get_memory(i)
+                           for i in range(rf.memory_bounds[0],
+                                          rf.memory_bounds[1] + 1))
+               if not m.empty][0]
+        mem.name = 'SIMTEST'[:rf.valid_name_length]
+        target.set_memory(mem)
+        sim = self._upload(downloaded)
+
+        if differential:
+            # Everything was sent, so uploading again sends nothing
+            with mock.patch.object(radio_simulator.BlockMemoryRadio,
+                                   'write_memory') as mock_write:
+                self._upload(downloaded)
+            mock_write.assert_not_called()
+
+        sim.prepare('download')
+        again = rclass(sim)
+        again.sync_in()
+        if again.get_features().has_sub_devices:
+            again = again.get_sub_devices()[0]
+        self.assertEqual(mem.name, again.get_memory(mem.number).name)
+        return sim
+
+    def test_uv5r(self):
+        self._test_round_trip(uv5r.BaofengUV5R, 'Baofeng_UV-5R.img')
+
+    def test_baofeng_common(self):
+        self._test_round_trip(uv6r.UV6R, 'Baofeng_UV-6R.img')
+
+    def test_uvk5(self):
+        self._test_round_trip(uvk5.UVK5Radio, 'Quansheng_UV-K5.img')
+
+    def test_tk8180(self):
+        self._test_round_trip(directory.get_radio('Kenwood_TK-8180'),
+                              'Kenwood_TK-8180.img')
+
+    def test_yaesu(self):
+        self._test_round_trip(ft1802.FT1802Radio, 'Yaesu_FT-1802M.img',
+                              differential=False)
+
+    def test_link_time(self):
+        radio = self._radio(ft1802.FT1802Radio, 'Yaesu_FT-1802M.img')
+        slow, _ = self._download(radio, baudrate=9600)
+        fast, _ = self._download(radio, baudrate=19200)
+        self.assertEqual(slow.bytes_out, fast.bytes_out)
+        self.assertAlmostEqual(slow.link_time, fast.link_time * 2)
+        self.assertAlmostEqual((slow.bytes_in + slow.bytes_out) * 10 / 9600,
+                               slow.link_time)
+
+        late, _ = self._download(radio, baudrate=9600, latency=0.1)
+        self.assertGreater(late.link_time, slow.link_time)
+
+    def test_realtime(self):
+        radio = self._radio(ft1802.FT1802Radio, 'Yaesu_FT-1802M.img')
+        with mock.patch.object(radio_simulator, '_sleep') as mock_sleep:
+            sim, _ = self._download(radio, realtime=True)
+        self.assertAlmostEqual(sim.link_time,
+                               sum(c[0][0] for c in mock_sleep.call_args_list))
+
+    def test_echo(self):
+        radio = self._radio(ft1802.FT1802Radio, 'Yaesu_FT-1802M.img')
+        sim = radio_simulator.simulator_for(radio, echo=True)
+        sim.prepare('upload')
+        sim.write(b'\x01\x02')
+        self.assertEqual(b'\x01\x02', sim.read(2))
+        self.assertEqual(b'', sim.read(1))
+
+    def test_unsupported(self):
+        class Custom(yaesu_clone.YaesuCloneModeRadio):
+            def sync_in(self):
+                pass
+
+        radio = self._radio(ft1802.FT1802Radio, 'Yaesu_FT-1802M.img')
+        radio.__class__ = Custom
+        self.assertRaises(NotImplementedError,
+                          radio_simulator.simulator_for, radio)
+
+    def test_benchmark(self):
+        radio = self._radio(uvk5.UVK5Radio, 'Quansheng_UV-K5.img')
+        result = clone_benchmark.benchmark(radio, 'download',
+                                           skip_sleeps=True)
+        self.assertEqual('download', result.operation)
+        self.assertGreater(result.bytes, len(radio.get_mmap()))
+        self.assertGreater(result.link, 0)
@@ -0,0 +1,117 @@
+import os
+import shutil
+import tempfile
+
+from chirp.drivers import ft60
+from chirp import serial_session
+from tests.unit import base
+from tests.unit.test_yaesu_clone import FakeFT60
+
+IMAGE = os.path.join(os.path.dirname(__file__), '..', 'images',
+                     'Yaesu_FT-60.img')
+
+
+class TestSerialSession(base.BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.filename = os.path.join(self.tempdir, 'session.bin')
+
+    def _record_download(self):
+        fake = FakeFT60()
+        fake.start_download()
+        pipe = serial_session.RecordingSerial(fake, self.filename)
+        radio = ft60.FT60Radio(pipe)
+        radio.sync_in()
+        pipe._file.close()
+        return radio
+
+    def _record_upload(self):
+        radio = ft60.FT60Radio(IMAGE)
+        radio.set_pipe(serial_session.RecordingSerial(FakeFT60(),
+                                                      self.filename))
+        radio.sync_out()
+        radio.pipe._file.close()
+        return radio
+
+    def test_record_replay_download(self):
+        recorded = self._record_download()
+        session = serial_session.SerialSession.load(self.filename)
+        self.assertEqual(recorded.pipe.session.events, session.events)
+
+        pipe = serial_session.ReplaySerial(self.filename)
+        radio = ft60.FT60Radio(pipe)
+        radio.sync_in()
+        self.assertEqual(recorded.get_mmap().get_packed(),
+                         radio.get_mmap().get_packed())
+        self.assertTrue(pipe.finished)
+        self.assertEqual(b'\x06' * 449, b''.join(
+            e.data for e in session.events
+            if e.kind == serial_session.WRITE))
+
+    def test_replay_upload(self):
+        self._record_upload()
+        radio = ft60.FT60Radio(IMAGE)
+        pipe = serial_session.ReplaySerial(self.filename)
+        radio.set_pipe(pipe)
+        radio.sync_out()
+        self.assertTrue(pipe.finished)
+
+    def test_replay_upload_differs(self):
+        self._record_upload()
+        radio = ft60.FT60Radio(IMAGE)
+        radio.get_mmap()[0x100] = b'\x42'
+        radio.set_pipe(serial_session.ReplaySerial(self.filename))
+        self.assertRaisesRegex(Exception, 'differs from recording',
+                               radio.sync_out)
+
+    def test_replay_chunking(self):
+        session = serial_session.SerialSession([
+            serial_session.SerialEvent(serial_session.READ, 0, 2, b'HI'),
+            serial_session.SerialEvent(serial_session.WRITE, 0, 0, b'AB'),
+            serial_session.SerialEvent(serial_session.WRITE, 0, 0, b'CD'),
+            serial_session.SerialEvent(serial_session.READ, 0, 4, b'OK'),
+            serial_session.SerialEvent(serial_session.WRITE, 0, 0, b'E'),
+            serial_session.SerialEvent(serial_session.READ, 0, 1, b'!'),
+        ])
+        self.assertEqual([(b'', b'HI'), (b'ABCD', b'OK'), (b'E', b'!')],
+                         session.exchanges())
+        pipe = serial_session.ReplaySerial(session)
+        self.assertEqual(b'HI', pipe.read(10))
+        pipe.write(b'A')
+        self.assertEqual(b'', pipe.read(1))
+        pipe.write(b'BCDE')
+        self.assertEqual(3, pipe.in_waiting)
+        self.assertEqual(b'OK!', pipe.read(10))
+        self.assertTrue(pipe.finished)
+        self.assertRaises(serial_session.ReplayError, pipe.write, b'F')
+
+    def test_replay_not_strict(self):
+        session = serial_session.SerialSession([
+            serial_session.SerialEvent(serial_session.WRITE, 0, 0, b'AB'),
+            serial_session.SerialEvent(serial_session.READ, 0, 2, b'OK'),
+        ])
+        pipe = serial_session.ReplaySerial(session, strict=False)
+        pipe.write(b'XY')
+        self.assertEqual(b'OK', pipe.read(2))
+        pipe.write(b'Z')
+        self.assertTrue(pipe.finished)
+
+    def test_stats_settings(self):
+        fake = FakeFT60()
+        fake.readbuf = b'\x00' * 72
+        pipe = serial_session.RecordingSerial(fake)
+        pipe.baudrate = 9600
+        self.assertEqual(9600, fake.baudrate)
+        self.assertEqual(8, len(pipe.read(8)))
+        pipe.write(b'\x06')
+        pipe.read(100)
+        self.assertEqual((serial_session.SET, b'baudrate=9600'),
+                         pipe.session.events[0][::3])
+        stats = pipe.session.stats()
+        self.assertEqual(1, stats['writes'])
+        self.assertEqual(2, stats['reads'])
+        self.assertEqual(1, stats['short_reads'])
+        # Plus the echo of our ACK
+        self.assertEqual(73, stats['bytes_read'])
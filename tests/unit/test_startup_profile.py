@@ -0,0 +1,86 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from chirp import startup_profile
+
+
+class TestStartupProfile(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.addCleanup(startup_profile.finish)
+
+    def _make_module(self, name):
+        with open(os.path.join(self.tempdir, name + '.py'), 'w') as f:
+            f.write('import json\nVALUE = 1\n')
+        sys.path.insert(0, self.tempdir)
+        self.addCleanup(sys.path.remove, self.tempdir)
+        self.addCleanup(sys.modules.pop, name, None)
+
+    def test_start_from_argv(self):
+        self.assertIsNone(startup_profile.start_from_argv(['--foo', 'bar']))
+        self.assertIsNone(startup_profile.PROFILER)
+        # Missing the argument is left for argparse to complain about
+        self.assertIsNone(
+            startup_profile.start_from_argv(['--profile-startup']))
+        output = os.path.join(self.tempdir, 'out.txt')
+        profiler = startup_profile.start_from_argv(
+            ['foo.img', '--profile-startup=%s' % output])
+        self.assertEqual(output, profiler.output)
+        self.assertIs(profiler, startup_profile.PROFILER)
+        startup_profile.finish()
+        self.assertTrue(os.path.exists(output))
+
+    def test_text_report(self):
+        output = os.path.join(self.tempdir, 'profile.txt')
+        self._make_module('fake_startup_module')
+        profiler = startup_profile.start(output)
+        with startup_profile.span('phase'):
+            import fake_startup_module  # noqa
+        startup_profile.finish('done')
+        self.assertIsNone(startup_profile.PROFILER)
+        self.assertNotIn(profiler._finder, sys.meta_path)
+        self.assertEqual(1, fake_startup_module.VALUE)
+
+        with open(output) as f:
+            report = f.read()
+        self.assertIn('fake_startup_module\n', report)
+        self.assertIn('[phase]\n', report)
+        self.assertIn('ms  done\n', report)
+
+    def test_chrome_trace(self):
+        output = os.path.join(self.tempdir, 'profile.json')
+        self._make_module('fake_startup_module')
+        startup_profile.start(output)
+        import fake_startup_module  # noqa
+        startup_profile.mark('first output')
+        startup_profile.finish()
+
+        with open(output) as f:
+            trace = json.load(f)
+        events = {e['name']: e for e in trace['traceEvents']}
+        self.assertEqual('X', events['fake_startup_module']['ph'])
+        self.assertEqual('import', events['fake_startup_module']['cat'])
+        self.assertEqual('i', events['first output']['ph'])
+
+    def test_span_self_time(self):
+        profiler = startup_profile.start(os.path.join(self.tempdir, 'x'))
+        with startup_profile.span('outer'):
+            with startup_profile.span('inner'):
+                sum(range(100000))
+        events = {e[0]: e for e in profiler.events}
+        name, cat, start, duration, self_time, thread = events['outer']
+        self.assertLess(self_time, duration)
+        self.assertAlmostEqual(duration - events['inner'][3], self_time)
+
+    def test_disabled(self):
+        with startup_profile.span('nothing'):
+            startup_profile.mark('nothing')
+        startup_profile.watch_output()
+        self.assertIsNone(startup_profile.PROFILER)
+        self.assertFalse(isinstance(sys.stdout,
+                                    startup_profile._FirstOutput))
@@ -17,3 +17,83 @@ class TestUtils(base.BaseTest):
     def test_hexprint_even(self):
         expected = '000: 00 00 00 00 00 00 00 00   ........\n'
         self.assertEqual(expected, util.hexprint(b'\x00' * 8))
+
+
+class FakePipe(object):
+    def __init__(self, *chunks):
+        self.chunks = list(chunks)
+        self.reads = []
+
+    def read(self, size):
+        self.reads.append(size)
+        if not self.chunks:
+            return b''
+        chunk = self.chunks.pop(0)
+        if len(chunk) > size:
+            self.chunks.insert(0, chunk[size:])
+            chunk = chunk[:size]
+        return chunk
+
+
+class TestPipeReader(base.BaseTest):
+    def test_read_exact(self):
+        reader = util.PipeReader(FakePipe(b'AB', b'', b'CDEF'))
+        self.assertEqual(b'ABC', reader.read_exact(3, attempts=5))
+        self.assertEqual([3, 1, 1], reader.pipe.reads)
+        self.assertEqual(b'DEF', reader.read_exact(3, attempts=5))
+        self.assertEqual(b'', reader.read_exact(3, attempts=5))
+
+    def test_read_exact_short(self):
+        reader = util.PipeReader(FakePipe(b'AB'))
+        self.assertEqual(b'AB', reader.read_exact(4, attempts=3))
+        self.assertEqual([4, 2, 2], reader.pipe.reads)
+
+    def test_read_exact_chunk_progress(self):
+        progress = []
+        reader = util.PipeReader(FakePipe(b'ABCDEFGHIJ'))
+        self.assertEqual(b'ABCDEFGHI',
+                         reader.read_exact(9, idle_timeout=1, chunk=4,
+                                           progress=progress.append))
+        self.assertEqual([4, 4, 1], reader.pipe.reads)
+        self.assertEqual([4, 8, 9], progress)
+
+    def test_read_exact_idle_timeout(self):
+        reader = util.PipeReader(FakePipe(b'AB'))
+        self.assertEqual(b'AB', reader.read_exact(4, idle_timeout=0.01))
+
+    def test_skip_echo(self):
+        reader = util.PipeReader(FakePipe(b'\x06', b'AB', b'\x06CD'))
+        reader.skip_echo(b'\x06')
+        self.assertEqual(b'AB', reader.read_exact(2, attempts=5))
+        reader.skip_echo(b'\x06')
+        self.assertEqual(b'CD', reader.read_exact(2, attempts=5))
+
+    def test_skip_echo_absent(self):
+        reader = util.PipeReader(FakePipe(b'\x07ABC'))
+        reader.skip_echo(b'\x06')
+        self.assertEqual(b'\x07AB', reader.read_exact(3, attempts=5))
+        # We never asked for more than the data we wanted
+        self.assertEqual([3], reader.pipe.reads)
+
+    def test_skip_echo_multibyte(self):
+        reader = util.PipeReader(FakePipe(b'I', b'D\rID', b'123\r'))
+        reader.skip_echo(b'ID\r')
+        self.assertEqual(b'ID123\r',
+                         reader.read_until(b'\r', timeout=1, chunk=4))
+
+    def test_read_until(self):
+        reader = util.PipeReader(FakePipe(b'FO', b'O;BA', b'R;'))
+        self.assertEqual(b'FOO;', reader.read_until(b';', timeout=1,
+                                                    chunk=8))
+        self.assertEqual(b'BAR;', reader.read_until(b';', timeout=1))
+
+    def test_read_until_split_delimiter(self):
+        reader = util.PipeReader(FakePipe(b'AB\r', b'\nC'))
+        self.assertEqual(b'AB\r\n',
+                         reader.read_until(b'\r\n', timeout=1, chunk=3))
+
+    def test_read_until_timeout(self):
+        reader = util.PipeReader(FakePipe(b'FOO'))
+        self.assertEqual(b'FOO', reader.read_until(b';', timeout=0.01))
+        reader = util.PipeReader(FakePipe(b'FOOBAR'))
+        self.assertEqual(b'FOOB', reader.read_until(b';', max_size=4))
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from chirp import checkpoint
+from chirp import errors
+from chirp.drivers import uvk5
+from tests.unit import base
+
+
+class TestUVK5Upload(base.BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.radio = uvk5.UVK5Radio(os.path.join(
+            os.path.dirname(__file__), '..', 'images', 'Quansheng_UV-K5.img'))
+        self.radio.status_fn = lambda s: None
+        self.radio.pipe = mock.MagicMock()
+
+    def _upload(self):
+        with mock.patch.object(uvk5, '_sayhello', return_value='k5_2.01.26'):
+            with mock.patch.object(uvk5, '_resetradio'):
+                with mock.patch.object(uvk5, '_writemem') as mock_write:
+                    uvk5.do_upload(self.radio)
+        return [c[0][2] for c in mock_write.call_args_list]
+
+    def test_upload_loaded_image_sends_everything(self):
+        addrs = self._upload()
+        self.assertEqual(list(range(0, uvk5.PROG_SIZE, uvk5.MEM_BLOCK)),
+                         addrs)
+
+    def test_upload_only_changed_blocks(self):
+        self.radio.get_mmap().clear_dirty()
+        self.assertEqual([], self._upload())
+
+        mem = self.radio.get_memory(1)
+        mem.freq += 12500
+        self.radio.set_memory(mem)
+        # The channel itself and its attribute byte
+        self.assertEqual([0x0000, 0x0D00], self._upload())
+
+
+class TestUVK5Download(base.BaseTest):
+    def setUp(self):
+        super().setUp()
+        self.radio = uvk5.UVK5Radio(None)
+        self.radio.status_fn = lambda s: None
+        self.radio.pipe = mock.MagicMock()
+        self.radio.pipe.port = '/dev/ttyUSB0'
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        patcher = mock.patch.object(checkpoint, 'checkpoint_dir',
+                                    return_value=tempdir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _download(self, fail_at=None):
+        addrs = []
+
+        def fake_readmem(serport, addr, length):
+            if addr == fail_at:
+                return b''
+            addrs.append(addr)
+            return bytes([addr // length % 256]) * length
+
+        with mock.patch.object(uvk5, '_sayhello', return_value='k5_2.01.26'):
+            with mock.patch.object(uvk5, '_readmem',
+                                   side_effect=fake_readmem):
+                return addrs, uvk5.do_download(self.radio)
+
+    def test_resume_download(self):
+        fail_at = uvk5.MEM_SIZE // 2
+        with self.assertRaises(errors.RadioError):
+            self._download(fail_at=fail_at)
+        addrs, mmap = self._download()
+        # The first block is blank, so it takes two more to check the
+        # checkpoint against the radio
+        self.assertEqual([0, uvk5.MEM_BLOCK, 2 * uvk5.MEM_BLOCK] +
+                         list(range(fail_at, uvk5.MEM_SIZE, uvk5.MEM_BLOCK)),
+                         addrs)
+        expected = b''.join(bytes([i % 256]) * uvk5.MEM_BLOCK
+                            for i in range(uvk5.MEM_SIZE // uvk5.MEM_BLOCK))
+        self.assertEqual(expected, mmap.get_packed())
+
+        # Completed, so the next download starts from scratch
+        addrs, mmap = self._download()
+        self.assertEqual(0, addrs[0])
@@ -2,6 +2,7 @@ from builtins import bytes
 import os
 import tempfile
 import unittest
+from unittest import mock
 
 from chirp import directory
 from chirp.drivers import ft60
@@ -78,6 +79,103 @@ class FakeFT60:
         return buf
 
 
+class FakeBlockRadio:
+    """Sends blocks, waiting for an ACK after each but the last"""
+    def __init__(self, blocks, echo=False):
+        self.blocks = blocks
+        self.echo = echo
+        self.readbuf = blocks[0]
+        self.writebuf = b''
+
+    def write(self, data):
+        self.writebuf += data
+        if self.echo:
+            self.readbuf += data
+        sent = self.writebuf.count(b'\x06')
+        self.readbuf += self.blocks[sent]
+
+    def read(self, n):
+        buf = self.readbuf[:n]
+        self.readbuf = self.readbuf[n:]
+        return buf
+
+
+class TestCloneIn(unittest.TestCase):
+    def _test_clone_in(self, echo):
+        blocks = [b'ID\x06\x00', b'\x01' * 64, b'\x02' * 200]
+        radio = yaesu_clone.YaesuCloneModeRadio(None)
+        radio._block_lengths = [len(b) for b in blocks]
+        radio._memsize = sum(radio._block_lengths)
+        radio.pipe = FakeBlockRadio(blocks, echo)
+        status = []
+        radio.status_fn = lambda s: status.append(s.cur)
+        mmap = yaesu_clone._clone_in(radio)
+        self.assertEqual(b''.join(blocks), mmap.get_packed())
+        self.assertEqual(b'\x06\x06', radio.pipe.writebuf)
+        self.assertIn(200, status)
+
+    def test_clone_in(self):
+        self._test_clone_in(False)
+
+    def test_clone_in_echo(self):
+        self._test_clone_in(True)
+
+
+class FakeSerial:
+    baudrate = 9600
+
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(data)
+
+
+class TestClonePacer(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(yaesu_clone.time, 'sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_fixed_delay(self):
+        pacer = yaesu_clone.ClonePacer(FakeSerial(), 0.03)
+        self.assertIsNone(pacer.rate)
+        pacer.write(b'12345678')
+        self.sleep.assert_not_called()
+        pacer.write(b'12345678')
+        self.assertAlmostEqual(0.03, self.sleep.call_args[0][0], places=2)
+        self.assertEqual(16, pacer.written)
+        self.assertIsNotNone(pacer.rate)
+
+    def test_gap_already_passed(self):
+        pacer = yaesu_clone.ClonePacer(FakeSerial(), 0.03)
+        with mock.patch.object(yaesu_clone.time, 'monotonic') as monotonic:
+            monotonic.side_effect = [0.0, 0.0, 0.05, 0.05]
+            pacer.write(b'1')
+            pacer.write(b'2')
+        self.sleep.assert_not_called()
+
+    def test_clone_out(self):
+        pipe = FakeSerial()
+        pipe.read = lambda n: b'\x06'
+        radio = yaesu_clone.YaesuCloneModeRadio(None)
+        radio._block_lengths = [8, 64]
+        radio._mmap = memmap.MemoryMapBytes(bytes(range(72)))
+        radio.pipe = pipe
+        status = []
+        radio.status_fn = status.append
+        yaesu_clone._clone_out(radio)
+        self.assertEqual(bytes(range(72)), b''.join(pipe.writes))
+        self.assertEqual(9, len(pipe.writes))
+        self.assertEqual(64, status[-1].cur)
+        self.assertIsNotNone(status[-1].rate)
+        self.assertIn('B/s', str(status[-1]))
+        self.assertEqual(7, len(self.sleep.call_args_list))
+        for call in self.sleep.call_args_list:
+            self.assertAlmostEqual(radio._block_delay, call[0][0],
+                                   places=2)
+
+
 class TestFT60(unittest.TestCase):
     def test_download(self):
         f = FakeFT60()